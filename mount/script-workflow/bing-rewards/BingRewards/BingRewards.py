@@ -1,36 +1,24 @@
 import sys
 import os
-import logging
 import base64
 import json
+import signal
+import threading
+from datetime import timedelta
 from options import parse_search_args
-from src.rewards import Rewards
-from src.log import HistLog, StatsJsonLog
+from src import api
+from src.driver import SharedBrowser
+from src.display import DisplayManager
+from src.prewarm import Prewarmer
+from src.run_log import LogSink
+from src.scheduler import Scheduler
 from src.messengers import TelegramMessenger, DiscordMessenger, BaseMessenger
 from src.google_sheets_reporting import GoogleSheetsReporting
 
 LOG_DIR = "logs"
-ERROR_LOG = "error.log"
-RUN_LOG = "run.json"
-SEARCH_LOG = "search.json"
-STATS_LOG = "stats.json"
 CONFIG_FILE_PATH = "config/config.json"
 DEBUG = True
 
-emailCr = os.environ['MICROSOFT_EMAIL']
-passwordCr = os.environ['MICROSOFT_PASSWORD']
-telegramAPI = os.environ['TELEGRAM_API']
-telegramUSERID = os.environ['TELEGRAM_USERID']
-
-def _log_hist_log(hist_log):
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(message)s',
-        filename=os.path.join(LOG_DIR, ERROR_LOG)
-    )
-    logging.exception(hist_log.get_timestamp())
-    logging.debug("")
-
 
 def __decode(encoded):
     if encoded:
@@ -52,8 +40,8 @@ def get_config():
 
 
 def get_telegram_messenger(config, args):
-    telegram_api_token = telegramAPI
-    telegram_userid = telegramUSERID
+    telegram_api_token = os.environ.get('TELEGRAM_API')
+    telegram_userid = os.environ.get('TELEGRAM_USERID')
     telegram_messenger = None
 
     if not args.telegram or not telegram_api_token or not telegram_userid:
@@ -90,12 +78,15 @@ def get_google_sheets_reporting(config, args):
     return google_sheets_reporting
 
 
-def complete_search(rewards, completion, search_type, search_hist):
-    print(f"\nYou selected {search_type}")
-    if not completion.is_search_type_completed(search_type):
-        rewards.complete_search_type(search_type, completion, search_hist)
-    else:
-        print(f'{search_type.capitalize()} already completed\n')
+def get_accounts(config, email, password):
+    """
+    The main account, plus any additional accounts stored in the config file as
+    `"accounts": [{"email": <base64>, "password": <base64>}, ...]`
+    """
+    accounts = [(email, password)]
+    for account in config.get('accounts', []):
+        accounts.append((__decode(account['email']), __decode(account['password'])))
+    return accounts
 
 
 def main():
@@ -109,22 +100,21 @@ def main():
 
     args = parse_search_args()
     if args.email and args.password:
-        email = emailCr
-        password = passwordCr
+        email = os.environ['MICROSOFT_EMAIL']
+        password = os.environ['MICROSOFT_PASSWORD']
         args.cookies = False
     else:
-        email = emailCr
-        password = passwordCr
+        email = os.environ['MICROSOFT_EMAIL']
+        password = os.environ['MICROSOFT_PASSWORD']
 
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
 
-    stats_log = StatsJsonLog(os.path.join(LOG_DIR, STATS_LOG), email)
-    hist_log = HistLog(email,
-                       os.path.join(LOG_DIR, RUN_LOG), os.path.join(LOG_DIR, SEARCH_LOG))
-
-    completion = hist_log.get_completion()
-    search_hist = hist_log.get_search_hist()
+    if args.virtual_display and not args.headless:
+        if DisplayManager.is_supported():
+            args.driver.display_manager = DisplayManager(vnc=args.vnc, vnc_password=os.environ.get('VNC_PASSWORD'))
+        else:
+            print('Virtual displays need Linux and Xvfb, using the current display')
 
     # telegram credentials
     telegram_messenger = get_telegram_messenger(config, args)
@@ -132,51 +122,103 @@ def main():
     messengers: list[BaseMessenger] = [messenger for messenger in [
         telegram_messenger, discord_messenger] if messenger is not None]
     google_sheets_reporting = get_google_sheets_reporting(config, args)
-    rewards = Rewards(email, password, DEBUG, args.headless, args.cookies,
-                      args.driver, args.nosandbox, args.google_trends_geo, messengers)
 
+    # prints and logs every account's run log off the hot path
+    log_sink = LogSink(args.log_file).start()
     try:
-        complete_search(rewards, completion, args.search_type, search_hist)
-        hist_log.write(rewards.completion)
-        completion = hist_log.get_completion()
-
-        if hasattr(rewards, 'stats'):
-            formatted_stat_str = "; ".join(rewards.stats.stats_str)
-            stats_log.add_entry_and_write(formatted_stat_str, email)
-
-            run_hist_str = hist_log.get_run_hist()[-1].split(': ')[1]
-
-            for messenger in messengers:
-                messenger.send_reward_message(
-                    rewards.stats.stats_str, run_hist_str, email)
+        if args.schedule:
+            schedule_accounts(config, email, password, args, messengers, google_sheets_reporting, log_sink)
+        elif not args.multi_tenant:
+            run_account(email, password, args, messengers, google_sheets_reporting, log_sink=log_sink)
+        else:
+            run_accounts(config, email, password, args, messengers, google_sheets_reporting, log_sink)
+    finally:
+        log_sink.stop()
+
+
+def schedule_accounts(config, email, password, args, messengers, google_sheets_reporting, log_sink):
+    """ Runs every account once a day after the daily reset, until interrupted """
+    # overlapping accounts need their own profile/screenshot/driver files
+    if args.schedule_concurrency > 1:
+        args.workspaces = True
+
+    # the next account's browser is launched while the current one finishes
+    prewarmer = Prewarmer() if args.prewarm else None
+
+    def scheduled_run(account_email, account_password):
+        run_account(
+            account_email, account_password, args, messengers, google_sheets_reporting, log_sink=log_sink,
+            prewarmer=prewarmer, next_account=lambda: scheduler.peek_next(Prewarmer.MAX_IDLE)
+        )
+
+    scheduler = Scheduler(
+        get_accounts(config, email, password), scheduled_run,
+        os.path.join(LOG_DIR, api.RUN_LOG), os.path.join(LOG_DIR, api.SEARCH_LOG), args.search_type,
+        window=timedelta(minutes=args.schedule_window), max_concurrent=args.schedule_concurrency
+    )
+    # docker stop sends SIGTERM, handled like Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print('\nWaiting for the accounts running to finish')
+        scheduler.join()
+
+
+def run_accounts(config, email, password, args, messengers, google_sheets_reporting, log_sink):
+    """
+    One browser for all accounts, each account runs in its own browser context
+    and needs its own screenshot/driver files
+    """
+    args.workspaces = True
+    accounts = get_accounts(config, email, password)
+    if args.prewarm:
+        run_accounts_back_to_back(accounts, args, messengers, google_sheets_reporting, log_sink)
+        return
+    shared_browser = None if args.driver.shares_browser else SharedBrowser(args.driver, args.headless, args.nosandbox)
+    try:
+        threads = [
+            threading.Thread(
+                target=run_account,
+                args=(account_email, account_password, args, messengers, google_sheets_reporting, shared_browser, log_sink),
+                name=account_email
+            )
+            for account_email, account_password in accounts
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if shared_browser:
+            shared_browser.quit()
+
+
+def run_accounts_back_to_back(accounts, args, messengers, google_sheets_reporting, log_sink):
+    """ One account at a time in its own browser, the next account's browser is launched while the current one finishes """
+    prewarmer = Prewarmer()
+    for i, (account_email, account_password) in enumerate(accounts):
+        next_email = accounts[i + 1][0] if i + 1 < len(accounts) else None
+        try:
+            run_account(
+                account_email, account_password, args, messengers, google_sheets_reporting, log_sink=log_sink,
+                prewarmer=prewarmer, next_account=lambda next_email=next_email: next_email
+            )
+        except Exception as e:
+            # like a failed thread of run_accounts, the other accounts still run
+            print(f'\n{account_email} failed: {e!r}')
 
-            if google_sheets_reporting:
-                google_sheets_reporting.add_row(rewards.stats, email)
 
-        # check again, log if any failed
-        if not completion.is_search_type_completed(args.search_type):
-            logging.basicConfig(
-                level=logging.DEBUG,
-                format='%(message)s',
-                filename=os.path.join(LOG_DIR, ERROR_LOG)
-            )
-            logging.debug(hist_log.get_timestamp())
-            for line in rewards.stdout:
-                logging.debug(line)
-            logging.debug("")
-
-    except:  # catch *all* exceptions
-        _log_hist_log(hist_log)
-        hist_log.write(rewards.completion)
-
-        if len(messengers):
-            # send error msg to telegram
-            import traceback
-            error_msg = traceback.format_exc()
-
-        for messenger in messengers:
-            messenger.send_message(error_msg)
-        raise
+def run_account(email, password, args, messengers, google_sheets_reporting, shared_browser=None, log_sink=None, prewarmer=None, next_account=None):
+    options = api.RunOptions.from_args(
+        args, debug=DEBUG, log_dir=LOG_DIR, messengers=messengers, google_sheets_reporting=google_sheets_reporting,
+        shared_browser=shared_browser, log_sink=log_sink, prewarmer=prewarmer, next_account=next_account
+    )
+    result = api.run_account(api.AccountConfig(email, password), options)
+    if result.error:
+        raise result.error
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+"""
+Offline benchmark: runs complete_search_type against the local stand-ins in src/fake_bing.py
+(login, rewards dashboard, bing search, quizzes, Google Trends) under headless Chrome, no network needed.
+
+Reports per phase wall-clock time, WebDriver command count and peak browser memory,
+and writes them to logs/benchmark.json so runs before/after a change can be compared.
+
+python BingRewards/benchmark.py -st web mobile offers -r 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from options import DriverAction
+from src.driver import ChromeDriverFactory
+from src.rewards import Rewards
+from src.log import Completion
+from src.endpoints import Endpoints
+from src.fake_bing import FakeBingServer, FakeBingState
+from src.metrics import Metrics
+from src.profiler import CommandProfiler
+from src.processes import ProcessSupervisor
+
+LOG_DIR = "logs"
+BENCHMARK_LOG = "benchmark.json"
+PROCESS_REGISTRY_DIR = "processes"
+BENCHMARK_EMAIL = "benchmark@example.com"
+
+
+def parse_benchmark_args():
+    parser = argparse.ArgumentParser(description='Offline benchmark against local fake Bing, login and rewards servers')
+    parser.add_argument(
+        '-st',
+        '--search-types',
+        dest='search_types',
+        nargs='+',
+        choices=['web', 'mobile', 'both', 'offers', 'punch card', 'remaining', 'all'],
+        default=['web', 'mobile', 'offers'],
+        help="search types to run, each one a full complete_search_type flow on a fresh server"
+    )
+    parser.add_argument(
+        '-r',
+        '--repeat',
+        dest='repeat',
+        type=int,
+        default=1,
+        help="number of runs per search type"
+    )
+    parser.add_argument(
+        '-d',
+        '--driver',
+        dest='driver',
+        default=ChromeDriverFactory,
+        choices=['chrome', 'msedge', 'uchrome', 'cdp'],
+        action=DriverAction,
+        help="browser driver"
+    )
+    parser.add_argument(
+        '-nhl',
+        '--no-headless',
+        dest='headless',
+        action='store_false',
+        help="show the browser"
+    )
+    parser.add_argument(
+        '-ns',
+        '--nosandbox',
+        dest='nosandbox',
+        action='store_true',
+        help="run the browser with --no-sandbox, i.e as root in a container"
+    )
+    parser.add_argument(
+        '--pc-searches',
+        dest='pc_searches',
+        type=int,
+        default=3,
+        help="searches the fake dashboard asks for on pc, and separately for the Edge bonus"
+    )
+    parser.add_argument(
+        '--mobile-searches',
+        dest='mobile_searches',
+        type=int,
+        default=2,
+        help="searches the fake dashboard asks for on mobile"
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        dest='output',
+        default=os.path.join(LOG_DIR, BENCHMARK_LOG),
+        help="where to write the results"
+    )
+    return parser.parse_args()
+
+
+def run_benchmark(search_type, args):
+    server = FakeBingServer(FakeBingState(args.pc_searches, args.mobile_searches)).start()
+    metrics = Metrics(BENCHMARK_EMAIL)
+    profiler = CommandProfiler(metrics)
+    supervisor = ProcessSupervisor(os.path.join(LOG_DIR, PROCESS_REGISTRY_DIR))
+    supervisor.reap_orphans()
+
+    rewards = Rewards(
+        BENCHMARK_EMAIL, 'password', debug=False, headless=args.headless, driver_factory=args.driver,
+        nosandbox=args.nosandbox, supervisor=supervisor, metrics=metrics, profiler=profiler,
+        endpoints=Endpoints.local(server.url)
+    )
+    # the fake servers count a search immediately, nothing to wait out
+    rewards.MOBILE_SEARCH_DELAY = 0
+
+    start = time.monotonic()
+    error = None
+    try:
+        rewards.complete_search_type(search_type, Completion(), [])
+    except Exception as e:
+        error = repr(e)
+        try:
+            rewards.driver.quit()
+        except Exception:
+            pass
+    finally:
+        duration = time.monotonic() - start
+        supervisor.stop()
+        server.stop()
+
+    commands = defaultdict(int)
+    for (phase, _, _), (count, _, _) in profiler.entries.items():
+        commands[phase] += count
+
+    phases = {
+        phase: {
+            'duration': round(phase_duration, 3),
+            'commands': commands.get(phase, 0),
+            'peak_rss_mb': supervisor.phase_usage.get(phase, {}).get('peak_rss_mb'),
+        }
+        for phase, phase_duration in metrics.get_phase_durations().items()
+    }
+    return {
+        'search_type': search_type,
+        'duration': round(duration, 3),
+        'commands': profiler.get_command_count(),
+        'queries': len(server.state.queries),
+        'points': server.state.earned_today,
+        'error': error,
+        'phases': phases,
+    }
+
+
+def print_result(result):
+    status = f"error {result['error']}" if result['error'] else 'ok'
+    print(
+        f"\n{result['search_type']}: {result['duration']:.1f}s, {result['commands']} commands, "
+        f"{result['queries']} queries, {result['points']} points, {status}"
+    )
+    print(f'{"seconds":>9} {"commands":>9} {"peak MB":>8}  phase')
+    for phase, usage in sorted(result['phases'].items(), key=lambda item: item[1]['duration'], reverse=True):
+        peak_rss_mb = usage['peak_rss_mb'] if usage['peak_rss_mb'] is not None else '-'
+        print(f"{usage['duration']:9.2f} {usage['commands']:9d} {peak_rss_mb:>8}  {phase}")
+
+
+def main():
+    args = parse_benchmark_args()
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    results = []
+    for search_type in args.search_types:
+        for _ in range(args.repeat):
+            result = run_benchmark(search_type, args)
+            print_result(result)
+            results.append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': time.time(),
+            'driver': args.driver.__name__,
+            'headless': args.headless,
+            'results': results,
+        }, f, indent=4)
+    print(f'\nResults written to {args.output}')
+
+    if any(result['error'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,25 @@ class PasswordAction(argparse.Action):
 
 class DriverAction(argparse.Action):
     def __call__(self, parser, namespace, value, option_string=None):
+        if value == 'cdp':
+            # needs websockets, which the other drivers don't
+            try:
+                from src.cdp import CdpDriverFactory
+            except ImportError as e:
+                parser.error(f'-d cdp needs the websockets package, pip install websockets ({e})')
+            setattr(namespace, self.dest, CdpDriverFactory)
+            return
         mapping = {"chrome": ChromeDriverFactory, "msedge": MsEdgeDriverFactory, 'uchrome': UChromeDriverFactory}
         setattr(namespace, self.dest, mapping[value])
 
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive number')
+    return number
+
+
 def print_args(args):
     protected_fields = ('password', 'telegram_api_token')
     d_args = vars(args).copy()
@@ -197,8 +212,9 @@ def parse_search_args():
         '--driver',
         dest='driver',
         type=str.lower,
-        choices=['chrome', 'msedge', 'uchrome'],
-        action=DriverAction
+        choices=['chrome', 'msedge', 'uchrome', 'cdp'],
+        action=DriverAction,
+        help="browser driver, `cdp` drives Chrome directly over the DevTools protocol without chromedriver"
     )
 
     headless_group = search_parser.add_mutually_exclusive_group()
@@ -307,6 +323,159 @@ def parse_search_args():
         help="two-letter country code to use for Google Trends API 'geo' argument. Please note: not all country codes are supported by the API. Default is 'US'."
     )
 
+    search_parser.add_argument(
+        '-mt',
+        '--multi-tenant',
+        dest='multi_tenant',
+        action='store_true',
+        help="run the main account and every account listed under `accounts` in config.json concurrently, each in its own isolated context of one shared browser"
+    )
+
+    search_parser.add_argument(
+        '-ct',
+        '--command-timeout',
+        dest='command_timeout',
+        type=int,
+        help="seconds a single WebDriver command may take before the browser is killed, relaunched and the task resumed. Disabled by default."
+    )
+
+    search_parser.add_argument(
+        '-pb',
+        '--phase-budget',
+        dest='phase_budget',
+        type=int,
+        help="wall-clock seconds a single task (login, each search type, offers, punch card) may take before the browser is killed, relaunched and the task resumed. Disabled by default."
+    )
+
+    search_parser.add_argument(
+        '-ws',
+        '--workspaces',
+        dest='workspaces',
+        action='store_true',
+        help="give each account its own browser profile, screenshot and driver files under workspaces/, required to safely run accounts in parallel. Always on with -mt."
+    )
+
+    search_parser.add_argument(
+        '-tmpfs',
+        '--profile-tmpfs',
+        dest='profile_tmpfs',
+        help="with -ws, keep the browser profile in this tmpfs directory (i.e /dev/shm) during the run and sync it back to disk afterwards"
+    )
+
+    search_parser.add_argument(
+        '-cs',
+        '--cache-size',
+        dest='cache_size',
+        type=int,
+        help="with -ws, cap in MB of the browser disk cache, profile caches are deleted once they grow larger"
+    )
+
+    search_parser.add_argument(
+        '-me',
+        '--metrics-export',
+        dest='metrics_export',
+        choices=['prometheus', 'jsonl', 'both'],
+        help="export per phase timings and counters to logs/bing_rewards.prom (Prometheus textfile collector), logs/metrics.jsonl, or both"
+    )
+
+    search_parser.add_argument(
+        '-prof',
+        '--profile',
+        dest='profile',
+        action='store_true',
+        help="record every WebDriver command with its latency, calling method and phase. Writes a ranked report to logs/*hot_commands.txt and a flamegraph input to logs/*commands.folded"
+    )
+
+    search_parser.add_argument(
+        '-lf',
+        '--log-file',
+        dest='log_file',
+        help="also write the run log to this file, rotated and gzip compressed once it reaches 5MB, i.e logs/bing_rewards.log"
+    )
+
+    search_parser.add_argument(
+        '-pf',
+        '--preflight',
+        dest='preflight',
+        action='store_true',
+        help="check the rewards dashboard without a browser first, using the session saved by the last run (logs/sessions/), and only launch the browser for what is still pending"
+    )
+
+    search_parser.add_argument(
+        '-cms',
+        '--concurrent-mobile-search',
+        dest='concurrent_mobile_search',
+        action='store_true',
+        help="run mobile search in a second browser alongside the web device tasks instead of after them, a run takes about as long as its longest task. The second browser signs in 30 seconds after the first one, without the profile of -c"
+    )
+
+    search_parser.add_argument(
+        '-nav',
+        '--navigate-search',
+        dest='navigate_search',
+        choices=['web', 'mobile', 'both'],
+        help="on these device types, search by navigating straight to the results page of each query instead of typing it in the search box. Falls back to typing if those searches aren't counted"
+    )
+
+    search_parser.add_argument(
+        '-sbs',
+        '--search-batch-size',
+        dest='search_batch_size',
+        type=positive_int,
+        default=1,
+        help="with -nav, queries submitted per browser command, all but the last are requested from within the page. Capped at what fits in the 30s script timeout and -ct. Default 1"
+    )
+
+    search_parser.add_argument(
+        '-vd',
+        '--virtual-display',
+        dest='virtual_display',
+        action='store_true',
+        help="with -nhl on Linux, give each browser a private, minimal Xvfb display started and stopped with it, so headed browsers can run in parallel. Requires Xvfb"
+    )
+
+    search_parser.add_argument(
+        '-vnc',
+        '--vnc',
+        dest='vnc',
+        action='store_true',
+        help="with -vd, serve each display over VNC (x11vnc) on port 5900 + its display number, password from the VNC_PASSWORD environment variable. Without a password, VNC only listens on localhost"
+    )
+
+    search_parser.add_argument(
+        '-sch',
+        '--schedule',
+        dest='schedule',
+        action='store_true',
+        help="keep running and run every configured account once a day, shortly after the daily points reset. Replaces a cron job"
+    )
+
+    search_parser.add_argument(
+        '-sw',
+        '--schedule-window',
+        dest='schedule_window',
+        type=int,
+        default=30,
+        help="with -sch, minutes after the reset over which accounts are spread out. Default 30"
+    )
+
+    search_parser.add_argument(
+        '-sc',
+        '--schedule-concurrency',
+        dest='schedule_concurrency',
+        type=positive_int,
+        default=1,
+        help="with -sch, max accounts (browsers) running at once. Default 1"
+    )
+
+    search_parser.add_argument(
+        '-pw',
+        '--prewarm',
+        dest='prewarm',
+        action='store_true',
+        help="with -sch or -mt, launch the next account's browser on the login page and fetch its queries while the current account finishes, when it is due within 2 minutes and 1GB of memory is available. With -mt, accounts then run back to back in browsers of their own. With -c, needs -ws without -tmpfs"
+    )
+
     search_parser.set_defaults(
         search_type='remaining',
         driver=UChromeDriverFactory,
@@ -314,7 +483,15 @@ def parse_search_args():
         cookies=False,
         nosandbox=False,
         telegram=False,
-        google_sheets=False
+        google_sheets=False,
+        multi_tenant=False,
+        workspaces=False,
+        preflight=False,
+        concurrent_mobile_search=False,
+        prewarm=False,
+        virtual_display=False,
+        vnc=False,
+        schedule=False
     )
     if is_notebook():
         args = search_parser.parse_args([])
@@ -0,0 +1,100 @@
+"""
+Efficiency report: points earned per browser second, by phase and by account,
+from the metrics every run keeps in logs/metrics.sqlite3 (see src/metrics_store.py).
+
+python BingRewards/report.py -a me@example.com -s 2024-05-01 -u 2024-06-01
+"""
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from src.metrics_store import MetricsStore
+
+LOG_DIR = "logs"
+METRICS_DB = "metrics.sqlite3"
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value} is not a YYYY-MM-DD date')
+
+
+def parse_report_args():
+    parser = argparse.ArgumentParser(description='Points per browser second by phase and by account')
+    parser.add_argument(
+        '-a',
+        '--account',
+        dest='accounts',
+        action='append',
+        help="only this account, can be given more than once. Default all"
+    )
+    parser.add_argument(
+        '-s',
+        '--since',
+        dest='since',
+        type=parse_date,
+        help="runs from this day on, YYYY-MM-DD"
+    )
+    parser.add_argument(
+        '-u',
+        '--until',
+        dest='until',
+        type=parse_date,
+        help="runs up to and including this day, YYYY-MM-DD"
+    )
+    parser.add_argument(
+        '-by',
+        '--group-by',
+        dest='group_by',
+        nargs='+',
+        choices=[MetricsStore.PHASE, MetricsStore.ACCOUNT],
+        default=[MetricsStore.PHASE, MetricsStore.ACCOUNT],
+        help="tables to print. Default both"
+    )
+    parser.add_argument(
+        '-db',
+        '--database',
+        dest='database',
+        default=os.path.join(LOG_DIR, METRICS_DB),
+        help="metrics database, default %(default)s"
+    )
+    return parser.parse_args()
+
+
+def print_totals(group_by, totals):
+    print(f'\nBy {group_by}')
+    print(f'{"runs":>6} {"seconds":>10} {"points":>8} {"points/s":>9} {"dashboard":>10} {"queries":>8} {"retries":>8}  {group_by}')
+    rows = []
+    for group, values in totals.items():
+        seconds = values.get(MetricsStore.DURATION, 0)
+        points = values.get(MetricsStore.POINTS, 0)
+        retries = sum(value for name, value in values.items() if name.endswith('_retries'))
+        rows.append((points / seconds if seconds else 0, values['runs'], seconds, points, values.get('dashboard_loads', 0), values.get('queries', 0), retries, group or '-'))
+    # most worth their browser time first
+    for points_per_second, runs, seconds, points, dashboard_loads, queries, retries, group in sorted(rows, reverse=True):
+        print(f'{runs:6d} {seconds:10.1f} {points:8.0f} {points_per_second:9.3f} {dashboard_loads:10.0f} {queries:8.0f} {retries:8.0f}  {group}')
+
+
+def main():
+    args = parse_report_args()
+    if not os.path.exists(args.database):
+        print(f'{args.database} does not exist yet, it is written at the end of every run')
+        sys.exit(1)
+
+    store = MetricsStore(args.database)
+    until = args.until + timedelta(days=1) if args.until else None
+    for group_by in args.group_by:
+        totals = store.get_totals(group_by, args.accounts, args.since, until)
+        if not totals:
+            print('No runs match')
+            return
+        print_totals(group_by, totals)
+
+
+if __name__ == "__main__":
+    main()
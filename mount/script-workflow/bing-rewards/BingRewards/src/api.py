@@ -0,0 +1,364 @@
+"""
+Library entry point: run one account without argv, environment variables or a particular working directory.
+
+    from src.api import AccountConfig, RunOptions, run_account
+    result = run_account(AccountConfig(email, password), RunOptions(search_type='web', log_dir='/var/log/bing-rewards'))
+
+Everything a run needs is passed in, so one interpreter can run many accounts back to back (see src.scheduler)
+instead of paying interpreter and import startup per account. BingRewards.py is a thin CLI over this.
+"""
+import os
+import traceback
+from datetime import datetime
+from requests.exceptions import HTTPError
+from src.rewards import Rewards, get_trending_queries
+from src.driver import BASE_DIR, UChromeDriverFactory
+from src.watchdog import Watchdog
+from src.processes import ProcessSupervisor
+from src.workspace import Workspace
+from src.metrics import Metrics, get_metrics_exporters
+from src.metrics_store import MetricsStore
+from src.task_planner import TaskPlanner
+from src.profiler import CommandProfiler
+from src.run_log import RunLog, get_error_logger
+from src.locators import SelectorRegistry
+from src.preflight import PreflightPlanner, SessionStore
+from src.concurrency import ConcurrencyPolicy
+from src.search_transport import SearchTransport
+from src.rate_limit import RateLimiter
+from src.endpoints import Endpoints
+from src.log import HistLog, StatsJsonLog, QuizAnswerJsonLog, PromotionCatalogJsonLog
+
+ERROR_LOG = "error.log"
+RUN_LOG = "run.json"
+SEARCH_LOG = "search.json"
+CHECKPOINT_LOG = "checkpoint.json"
+ANSWERS_LOG = "answers.json"
+PROMOTIONS_LOG = "promotions.json"
+STATS_LOG = "stats.json"
+SELECTORS_LOG = "selectors.json"
+SESSIONS_DIR = "sessions"
+RATE_LIMITS_DB = "rate_limits.sqlite3"
+METRICS_DB = "metrics.sqlite3"
+PROCESS_REGISTRY_DIR = "processes"
+PROFILE_REPORT = "hot_commands.txt"
+PROFILE_FOLDED = "commands.folded"
+SCREENSHOT_FILE = "error.png"
+
+
+class AccountConfig:
+    def __init__(self, email, password):
+        self.email = email
+        self.password = password
+
+
+class RunOptions:
+    """ Same defaults as the command line, see options.py for what each option does """
+    def __init__(
+        self, search_type='remaining', driver=UChromeDriverFactory, headless=True, cookies=False, nosandbox=False,
+        google_trends_geo='US', command_timeout=None, phase_budget=None, workspaces=False, profile_tmpfs=None,
+        cache_size=None, metrics_export=None, profile=False, preflight=False, concurrent_mobile_search=False, navigate_search=None,
+        search_batch_size=1, debug=True,
+        log_dir=os.path.join(BASE_DIR, "logs"), workspaces_dir=os.path.join(BASE_DIR, Workspace.ROOT_DIR),
+        messengers=None, google_sheets_reporting=None, shared_browser=None, log_sink=None, endpoints=None,
+        selectors=None, prewarmer=None, next_account=None
+    ):
+        self.search_type = search_type
+        self.driver = driver
+        self.headless = headless
+        self.cookies = cookies
+        self.nosandbox = nosandbox
+        self.google_trends_geo = google_trends_geo
+        self.command_timeout = command_timeout
+        self.phase_budget = phase_budget
+        self.workspaces = workspaces
+        self.profile_tmpfs = profile_tmpfs
+        self.cache_size = cache_size
+        self.metrics_export = metrics_export
+        self.profile = profile
+        self.preflight = preflight
+        self.concurrent_mobile_search = concurrent_mobile_search
+        self.navigate_search = navigate_search
+        self.search_batch_size = search_batch_size
+        self.debug = debug
+        self.log_dir = log_dir
+        self.workspaces_dir = workspaces_dir
+        self.messengers = messengers if messengers is not None else []
+        self.google_sheets_reporting = google_sheets_reporting
+        self.shared_browser = shared_browser
+        self.log_sink = log_sink
+        self.endpoints = endpoints
+        # src.locators.SelectorRegistry, by default the one remembered in log_dir
+        self.selectors = selectors
+        # src.prewarm.Prewarmer shared by the runs of the process, accounts run back to back are pre-warmed if set
+        self.prewarmer = prewarmer
+        # returns the email of the account to run next, if any, to pre-warm it once this run's tasks are done
+        self.next_account = next_account
+
+    @classmethod
+    def from_args(cls, args, **kwargs):
+        """ From parsed command line args, kwargs are the injected collaborators i.e messengers """
+        return cls(
+            search_type=args.search_type, driver=args.driver, headless=args.headless, cookies=args.cookies,
+            nosandbox=args.nosandbox, google_trends_geo=args.google_trends_geo, command_timeout=args.command_timeout,
+            phase_budget=args.phase_budget, workspaces=args.workspaces, profile_tmpfs=args.profile_tmpfs,
+            cache_size=args.cache_size, metrics_export=args.metrics_export, profile=args.profile,
+            preflight=args.preflight, concurrent_mobile_search=args.concurrent_mobile_search,
+            navigate_search=args.navigate_search, search_batch_size=args.search_batch_size, **kwargs
+        )
+
+
+class RunResult:
+    def __init__(self, email, completion, completed, stats, phase_durations, counters, process_usage, error=None):
+        self.email = email
+        # src.log.Completion, including what previous runs today completed
+        self.completion = completion
+        # whether the requested search type is complete
+        self.completed = completed
+        # src.rewards.RewardStats, None if the run didn't get that far
+        self.stats = stats
+        # seconds per phase
+        self.phase_durations = phase_durations
+        # {(phase, counter name): value}
+        self.counters = counters
+        self.process_usage = process_usage
+        # the exception that ended the run, if any
+        self.error = error
+
+
+def complete_search(rewards, completion, search_type, search_hist, plan=None):
+    print(f"\nYou selected {search_type}")
+    if plan and not plan.get_pending(search_type):
+        print(f'Nothing left to do for {search_type}, not launching the browser\n')
+    elif not completion.is_search_type_completed(search_type):
+        rewards.complete_search_type(search_type, completion, search_hist)
+    else:
+        print(f'{search_type.capitalize()} already completed\n')
+
+
+def preflight(email, completion, search_type, session_store, endpoints=None, rate_limiter=None, plan=None):
+    """
+    Marks what the dashboard shows complete in completion, see src.preflight.
+    plan: already fetched, i.e while pre-warming
+    Returns the src.preflight.PreflightPlan, None if the dashboard couldn't be read
+    """
+    # 'all' reruns everything regardless
+    if search_type == 'all':
+        return None
+    if plan is None:
+        plan = PreflightPlanner(session_store, endpoints, rate_limiter=rate_limiter).plan()
+    if plan is None:
+        print(f'\nPre-flight: no valid session for {email}, launching the browser')
+        return None
+    completion.update(plan.completion)
+    pending = plan.get_pending(search_type)
+    if pending:
+        print(f'\nPre-flight: {", ".join(pending)} pending for {email}, launching {" and ".join(plan.get_device_types(search_type))}')
+    else:
+        print(f'\nPre-flight: nothing pending for {email}, {plan.available_points:,} points available')
+    return plan
+
+
+def get_concurrency_policy(options):
+    return ConcurrencyPolicy(max_browsers=2 if options.concurrent_mobile_search else 1)
+
+
+def can_prewarm(options):
+    """ Whether a second browser can be launched while a run is going """
+    if not options.prewarmer or options.shared_browser:
+        return False
+    # the --cookies profile is shared by all accounts without workspaces,
+    # on tmpfs it is only copied there once the run opens its workspace
+    return not options.cookies or (options.workspaces and not options.profile_tmpfs)
+
+
+def prepare_warm_start(warm_start, options):
+    """ Fills in the src.prewarm.WarmStart of an account: pre-flight plan, browser on the login page and search queries """
+    email = warm_start.email
+    log_dir = options.log_dir
+    endpoints = options.endpoints if options.endpoints is not None else Endpoints()
+    hist_log = HistLog(email, os.path.join(log_dir, RUN_LOG), os.path.join(log_dir, SEARCH_LOG), checkpoint_path=os.path.join(log_dir, CHECKPOINT_LOG))
+    completion = hist_log.get_completion()
+    if completion.is_search_type_completed(options.search_type):
+        return
+    rate_limiter = RateLimiter.get(os.path.join(log_dir, RATE_LIMITS_DB))
+
+    if options.preflight and options.search_type != 'all':
+        session_store = SessionStore(os.path.join(log_dir, SESSIONS_DIR, f'{email}.json'))
+        warm_start.plan = PreflightPlanner(session_store, endpoints, rate_limiter=rate_limiter).plan()
+        if warm_start.plan:
+            completion.update(warm_start.plan.completion)
+            if not warm_start.plan.get_pending(options.search_type):
+                return
+
+    workspace = Workspace(email, options.workspaces_dir, options.profile_tmpfs, options.cache_size) if options.workspaces else None
+    device = Rewards.get_launch_device(options.search_type, completion, get_concurrency_policy(options))
+    warm_start.driver = Rewards.launch_driver(options.driver, device, options.headless, options.cookies, options.nosandbox, workspace)
+    warm_start.driver.get(endpoints.login)
+
+    rate_limiter.acquire(RateLimiter.TRENDS)
+    try:
+        warm_start.queries = get_trending_queries(endpoints.trends, options.google_trends_geo)
+    except HTTPError:  # the run fetches them itself
+        pass
+
+
+def prewarm_account(email, options):
+    """ Starts preparing the account's run on a thread, see src.prewarm. False if it can't be """
+    if not email or not can_prewarm(options):
+        return False
+    return options.prewarmer.start(email, lambda warm_start: prepare_warm_start(warm_start, options))
+
+
+def run_account(account: AccountConfig, options: RunOptions) -> RunResult:
+    email = account.email
+    log_dir = options.log_dir
+    os.makedirs(log_dir, exist_ok=True)
+    warm_start = options.prewarmer.take(email) if options.prewarmer else None
+
+    stats_log = StatsJsonLog(os.path.join(log_dir, STATS_LOG), email)
+    hist_log = HistLog(
+        email, os.path.join(log_dir, RUN_LOG), os.path.join(log_dir, SEARCH_LOG),
+        checkpoint_path=os.path.join(log_dir, CHECKPOINT_LOG)
+    )
+
+    completion = hist_log.get_completion()
+    search_hist = hist_log.get_search_hist()
+    # accounts of a market get the same promotions and quizzes, the google trends geo stands for the market
+    market, day = options.google_trends_geo, hist_log.get_next_reset().strftime("%Y-%m-%d")
+    answer_cache = QuizAnswerJsonLog(os.path.join(log_dir, ANSWERS_LOG), market, day)
+    promotion_catalog = PromotionCatalogJsonLog(os.path.join(log_dir, PROMOTIONS_LOG), market, day)
+
+    # every account and process using this log dir shares the request rate of the host
+    rate_limiter = RateLimiter.get(os.path.join(log_dir, RATE_LIMITS_DB))
+
+    session_store = None
+    plan = None
+    if options.preflight:
+        session_store = SessionStore(os.path.join(log_dir, SESSIONS_DIR, f'{email}.json'))
+        plan = preflight(
+            email, completion, options.search_type, session_store, options.endpoints, rate_limiter,
+            warm_start.plan if warm_start else None
+        )
+
+    watchdog = None
+    if options.command_timeout or options.phase_budget:
+        watchdog = Watchdog(options.command_timeout, options.phase_budget)
+
+    # reap browsers leaked by previous runs that crashed, e.g chrome children surviving with --no-sandbox
+    supervisor = ProcessSupervisor(os.path.join(log_dir, PROCESS_REGISTRY_DIR))
+    supervisor.reap_orphans()
+
+    workspace = None
+    if options.workspaces:
+        workspace = Workspace(email, options.workspaces_dir, options.profile_tmpfs, options.cache_size)
+        workspace.open()
+
+    metrics = Metrics(email)
+    profiler = CommandProfiler(metrics) if options.profile else None
+    run_log = RunLog(email, options.log_sink)
+    messengers = options.messengers
+    selectors = options.selectors or SelectorRegistry.get(os.path.join(log_dir, SELECTORS_LOG))
+    concurrency = get_concurrency_policy(options)
+    # tasks are ordered by the points per second of past runs, within the time left until the reset
+    history = MetricsStore(os.path.join(log_dir, METRICS_DB)).get_totals(MetricsStore.PHASE, since=datetime.now() - TaskPlanner.HISTORY)
+    task_planner = TaskPlanner(hist_log.get_next_reset(), history)
+    search_transport = SearchTransport(
+        web=SearchTransport.URL if options.navigate_search in ('web', 'both') else SearchTransport.FORM,
+        mobile=SearchTransport.URL if options.navigate_search in ('mobile', 'both') else SearchTransport.FORM,
+        batch_size=options.search_batch_size
+    )
+
+    rewards = Rewards(
+        email, account.password, debug=options.debug, headless=options.headless, cookies=options.cookies,
+        driver_factory=options.driver, nosandbox=options.nosandbox, google_trends_geo=options.google_trends_geo,
+        messengers=messengers, shared_browser=options.shared_browser, watchdog=watchdog, supervisor=supervisor,
+        workspace=workspace, metrics=metrics, profiler=profiler, endpoints=options.endpoints, run_log=run_log,
+        selectors=selectors, session_store=session_store, answer_cache=answer_cache, promotion_catalog=promotion_catalog,
+        concurrency=concurrency, search_transport=search_transport, rate_limiter=rate_limiter, task_planner=task_planner
+    )
+    if not workspace:
+        rewards.screenshot_path = os.path.join(BASE_DIR, SCREENSHOT_FILE)
+
+    if plan:
+        rewards.completion.update(plan.completion)
+
+    if warm_start:
+        rewards.prewarmed_driver = warm_start.driver
+        if warm_start.queries:
+            rewards.set_search_queries(warm_start.queries)
+    if options.next_account and can_prewarm(options):
+        rewards.on_tail = lambda: prewarm_account(options.next_account(), options)
+
+    error = None
+    try:
+        complete_search(rewards, completion, options.search_type, search_hist, plan)
+        hist_log.write(rewards.completion)
+        completion = hist_log.get_completion()
+
+        if hasattr(rewards, 'stats'):
+            formatted_stat_str = "; ".join(rewards.stats.stats_str + [supervisor.get_usage_str()])
+            stats_log.add_entry_and_write(formatted_stat_str, email)
+
+            run_hist_str = hist_log.get_run_hist()[-1].split(': ')[1]
+
+            for messenger in messengers:
+                messenger.send_reward_message(
+                    rewards.stats.stats_str, run_hist_str, email, rewards.screenshot_path)
+
+            if options.google_sheets_reporting:
+                options.google_sheets_reporting.add_row(rewards.stats, email)
+
+        # check again, log if any failed
+        if not completion.is_search_type_completed(options.search_type):
+            error_logger = get_error_logger(os.path.join(log_dir, ERROR_LOG))
+            error_logger.debug(hist_log.get_timestamp())
+            for line in run_log.get_lines():
+                error_logger.debug(line)
+            error_logger.debug("")
+
+    except BaseException as e:  # catch *all* exceptions, ctrl + c included
+        error = e
+        error_logger = get_error_logger(os.path.join(log_dir, ERROR_LOG))
+        error_logger.exception(hist_log.get_timestamp())
+        error_logger.debug("")
+        hist_log.write(rewards.completion)
+        completion = hist_log.get_completion()
+
+        # send error msg to telegram
+        error_msg = traceback.format_exc()
+        for messenger in messengers:
+            messenger.send_message(error_msg, rewards.screenshot_path)
+        if not isinstance(e, Exception):
+            raise
+
+    finally:
+        # launched ahead, but the run didn't need it
+        if rewards.prewarmed_driver is not None:
+            rewards.prewarmed_driver.quit()
+        if watchdog:
+            watchdog.stop()
+        supervisor.stop()
+        selectors.write()
+        if workspace:
+            try:
+                workspace.close()
+            except OSError as e:
+                # the metrics and reports below are still kept
+                print(f'\nCould not close workspace {workspace.name}: {e!r}')
+        # kept for every run, see report.py
+        MetricsStore(os.path.join(log_dir, METRICS_DB)).add_run(metrics)
+        for exporter in get_metrics_exporters(options.metrics_export, log_dir):
+            exporter.export(metrics)
+        if profiler:
+            profile_name = workspace.name if workspace else 'profile'
+            profiler.write(
+                os.path.join(log_dir, f'{profile_name}.{PROFILE_REPORT}'),
+                os.path.join(log_dir, f'{profile_name}.{PROFILE_FOLDED}')
+            )
+            print(f'\n{profiler.get_report(top=10)}')
+
+    return RunResult(
+        email, completion, completion.is_search_type_completed(options.search_type), getattr(rewards, 'stats', None),
+        metrics.get_phase_durations(), dict(metrics.counters), supervisor.get_usage_str(), error
+    )
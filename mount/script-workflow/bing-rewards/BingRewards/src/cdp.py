@@ -0,0 +1,725 @@
+"""
+Asyncio automation backend that talks to Chrome's DevTools protocol (CDP) directly over a websocket,
+instead of going through chromedriver.
+
+CdpBrowser owns one Chrome process and one event loop thread. Every page (one per account/device)
+is a flattened CDP session on the same websocket, so many sessions are multiplexed on a single event loop,
+and waits are push based (CDP events, in-page MutationObserver) instead of 0.5s WebDriver polling.
+
+CdpDriver is a synchronous, Selenium-like facade over a page so Rewards can target it through CdpDriverFactory,
+the async CdpPage API can be used directly from asyncio code.
+Drag and drop (quizzes) is dispatched as mouse input, CdpDriver.drag_and_drop stands in for Selenium's ActionChains.
+"""
+import asyncio
+import atexit
+import base64
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import websockets
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import NoSuchElementException, NoAlertPresentException, JavascriptException, TimeoutException, WebDriverException
+from src.driver import DriverFactory
+
+
+class CdpError(WebDriverException):
+    pass
+
+
+# returns the elements matching a Selenium (by, value) locator
+_LOCATE_JS = r"""
+function __locate(by, value, root) {
+    root = root || document;
+    switch (by) {
+        case 'id': { const el = document.getElementById(value); return el ? [el] : []; }
+        case 'class name': return Array.from(root.getElementsByClassName(value));
+        case 'name': return Array.from(document.getElementsByName(value));
+        case 'tag name': return Array.from(root.getElementsByTagName(value));
+        case 'css selector': return Array.from(root.querySelectorAll(value));
+        case 'xpath': {
+            const snapshot = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const els = [];
+            for (let i = 0; i < snapshot.snapshotLength; i++) els.push(snapshot.snapshotItem(i));
+            return els;
+        }
+    }
+    throw new Error('Unsupported locator ' + by);
+}
+function __is_displayed(el) {
+    const rect = el.getBoundingClientRect();
+    const style = getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+}
+"""
+
+# resolves with the first matching element as soon as it appears (and is visible), or null after timeout
+_WAIT_FOR_JS = _LOCATE_JS + r"""
+(function(by, value, visible, timeout) {
+    return new Promise((resolve) => {
+        const check = () => __locate(by, value).find((el) => !visible || __is_displayed(el)) || null;
+        const el = check();
+        if (el) return resolve(el);
+        const observer = new MutationObserver(() => {
+            const el = check();
+            if (el) { observer.disconnect(); clearTimeout(timer); resolve(el); }
+        });
+        observer.observe(document, {childList: true, subtree: true, attributes: true});
+        const timer = setTimeout(() => { observer.disconnect(); resolve(check()); }, timeout * 1000);
+    });
+})
+"""
+
+# body end of a function returning the viewport coordinates of the center of `this`
+_CENTER_JS = 'const rect = this.getBoundingClientRect(); return [rect.x + rect.width / 2, rect.y + rect.height / 2]; }'
+
+_KEY_EVENTS = {
+    Keys.RETURN: {'key': 'Enter', 'code': 'Enter', 'windowsVirtualKeyCode': 13, 'text': '\r'},
+    Keys.ENTER: {'key': 'Enter', 'code': 'Enter', 'windowsVirtualKeyCode': 13, 'text': '\r'},
+    Keys.TAB: {'key': 'Tab', 'code': 'Tab', 'windowsVirtualKeyCode': 9},
+}
+
+
+class CdpConnection:
+    """ One websocket to the browser, commands are matched to responses by id and events fan out to listeners """
+    def __init__(self, websocket):
+        self.__websocket = websocket
+        self.__next_id = 0
+        self.__pending = {}
+        self.__listeners = []
+        self.__reader = asyncio.ensure_future(self.__read_loop())
+
+    @classmethod
+    async def connect(cls, ws_url):
+        websocket = await websockets.connect(ws_url, max_size=None)
+        return cls(websocket)
+
+    async def send(self, method, params=None, session_id=None):
+        self.__next_id += 1
+        message = {'id': self.__next_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self.__pending[self.__next_id] = future
+        await self.__websocket.send(json.dumps(message))
+        return await future
+
+    async def __read_loop(self):
+        try:
+            async for raw_message in self.__websocket:
+                message = json.loads(raw_message)
+                if 'id' in message:
+                    future = self.__pending.pop(message['id'], None)
+                    if future is None or future.done():
+                        continue
+                    if 'error' in message:
+                        future.set_exception(CdpError(message['error'].get('message')))
+                    else:
+                        future.set_result(message.get('result', {}))
+                else:
+                    for listener in list(self.__listeners):
+                        listener(message)
+        finally:
+            for future in self.__pending.values():
+                if not future.done():
+                    future.set_exception(CdpError('DevTools connection closed'))
+            self.__pending = {}
+
+    def wait_for_event(self, method, session_id=None, predicate=None):
+        """ Returns a future resolved with the params of the next matching event, register it before triggering the event """
+        future = asyncio.get_running_loop().create_future()
+
+        def listener(message):
+            if message.get('method') == method and message.get('sessionId') == session_id \
+            and (predicate is None or predicate(message.get('params', {}))) and not future.done():
+                future.set_result(message.get('params', {}))
+
+        self.__listeners.append(listener)
+        future.add_done_callback(lambda _: self.__listeners.remove(listener))
+        return future
+
+    def add_listener(self, listener):
+        self.__listeners.append(listener)
+
+    async def close(self):
+        await self.__websocket.close()
+        self.__reader.cancel()
+
+
+class CdpPage:
+    """ Async API over one page target, attached as a flattened session """
+    def __init__(self, connection, target_id, session_id, context_id=None):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.context_id = context_id
+        self.dialog_open = False
+        connection.add_listener(self.__on_event)
+
+    def __on_event(self, message):
+        if message.get('sessionId') != self.session_id:
+            return
+        if message.get('method') == 'Page.javascriptDialogOpening':
+            self.dialog_open = True
+        elif message.get('method') == 'Page.javascriptDialogClosed':
+            self.dialog_open = False
+
+    async def send(self, method, params=None):
+        return await self.connection.send(method, params, self.session_id)
+
+    async def enable(self):
+        await self.send('Page.enable')
+        await self.send('Runtime.enable')
+
+    async def get(self, url, timeout=30):
+        load_event = self.connection.wait_for_event('Page.loadEventFired', self.session_id)
+        await self.send('Page.navigate', {'url': url})
+        try:
+            await asyncio.wait_for(load_event, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(f'Timed out loading {url}')
+
+    async def reload(self, timeout=30):
+        load_event = self.connection.wait_for_event('Page.loadEventFired', self.session_id)
+        await self.send('Page.reload')
+        try:
+            await asyncio.wait_for(load_event, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException('Timed out reloading page')
+
+    async def evaluate(self, expression, return_by_value=True):
+        result = await self.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': return_by_value,
+            'awaitPromise': True,
+            'userGesture': True,
+        })
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise JavascriptException(details.get('exception', {}).get('description', details.get('text')))
+        return result['result'].get('value') if return_by_value else result['result']
+
+    async def call_function_on(self, object_id, function_declaration, *args, return_by_value=True):
+        result = await self.send('Runtime.callFunctionOn', {
+            'objectId': object_id,
+            'functionDeclaration': function_declaration,
+            'arguments': [{'value': arg} for arg in args],
+            'returnByValue': return_by_value,
+            'awaitPromise': True,
+            'userGesture': True,
+        })
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise JavascriptException(details.get('exception', {}).get('description', details.get('text')))
+        return result['result'].get('value') if return_by_value else result['result']
+
+    async def __array_to_object_ids(self, remote_array):
+        if remote_array.get('subtype') != 'array':
+            return []
+        properties = await self.send('Runtime.getProperties', {
+            'objectId': remote_array['objectId'], 'ownProperties': True
+        })
+        object_ids = [
+            prop['value']['objectId'] for prop in properties['result']
+            if prop['name'].isdigit() and 'objectId' in prop.get('value', {})
+        ]
+        await self.send('Runtime.releaseObject', {'objectId': remote_array['objectId']})
+        return object_ids
+
+    async def find_elements(self, by, value, parent_object_id=None):
+        if parent_object_id:
+            remote_array = await self.call_function_on(
+                parent_object_id,
+                f'function(by, value) {{ {_LOCATE_JS} return __locate(by, value, this); }}',
+                by, value, return_by_value=False
+            )
+        else:
+            remote_array = await self.evaluate(
+                f'{_LOCATE_JS} __locate({json.dumps(by)}, {json.dumps(value)})', return_by_value=False
+            )
+        return [CdpElement(self, object_id) for object_id in await self.__array_to_object_ids(remote_array)]
+
+    async def wait_for(self, by, value, timeout, visible=False):
+        """ Push based wait, resolves as soon as the element is inserted (and visible) in the DOM """
+        expression = f'({_WAIT_FOR_JS})({json.dumps(by)}, {json.dumps(value)}, {json.dumps(visible)}, {timeout})'
+        try:
+            remote_object = await asyncio.wait_for(self.evaluate(expression, return_by_value=False), timeout + 5)
+        except (asyncio.TimeoutError, JavascriptException):  # i.e navigation destroyed the execution context
+            remote_object = {}
+        if 'objectId' not in remote_object:
+            raise TimeoutException(f'Timed out waiting for element {by}={value}')
+        return CdpElement(self, remote_object['objectId'])
+
+    async def wait_for_url(self, predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            url = await self.current_url()
+            if predicate(url):
+                return url
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException('Timed out waiting for url')
+            navigated = self.connection.wait_for_event('Page.frameNavigated', self.session_id)
+            try:
+                await asyncio.wait_for(navigated, remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def current_url(self):
+        history = await self.send('Page.getNavigationHistory')
+        return history['entries'][history['currentIndex']]['url']
+
+    async def press_keys(self, text):
+        """ Types text into the focused element, special Selenium keys are dispatched as key events """
+        chunk = ''
+        for char in text:
+            if char in _KEY_EVENTS:
+                if chunk:
+                    await self.send('Input.insertText', {'text': chunk})
+                    chunk = ''
+                key_event = _KEY_EVENTS[char]
+                await self.send('Input.dispatchKeyEvent', {'type': 'keyDown', **key_event})
+                await self.send('Input.dispatchKeyEvent', {'type': 'keyUp', **{k: v for k, v in key_event.items() if k != 'text'}})
+            else:
+                chunk += char
+        if chunk:
+            await self.send('Input.insertText', {'text': chunk})
+
+    async def screenshot(self):
+        result = await self.send('Page.captureScreenshot', {'format': 'png'})
+        return base64.b64decode(result['data'])
+
+    async def handle_dialog(self, accept):
+        await self.send('Page.handleJavaScriptDialog', {'accept': accept})
+
+    async def drag(self, source_object_id, target_object_id, steps=5):
+        """ Presses the mouse on the source element, moves it onto the target element in steps and releases it there """
+        source_x, source_y = await self.call_function_on(
+            source_object_id, 'function() { this.scrollIntoView({block: "center"}); ' + _CENTER_JS
+        )
+        target_x, target_y = await self.call_function_on(target_object_id, 'function() { ' + _CENTER_JS)
+        await self.send('Input.dispatchMouseEvent', {'type': 'mouseMoved', 'x': source_x, 'y': source_y})
+        await self.send('Input.dispatchMouseEvent', {
+            'type': 'mousePressed', 'x': source_x, 'y': source_y, 'button': 'left', 'buttons': 1, 'clickCount': 1
+        })
+        for step in range(1, steps + 1):
+            await self.send('Input.dispatchMouseEvent', {
+                'type': 'mouseMoved', 'button': 'left', 'buttons': 1,
+                'x': source_x + (target_x - source_x) * step / steps, 'y': source_y + (target_y - source_y) * step / steps,
+            })
+        await self.send('Input.dispatchMouseEvent', {
+            'type': 'mouseReleased', 'x': target_x, 'y': target_y, 'button': 'left', 'buttons': 0, 'clickCount': 1
+        })
+
+
+class CdpElement:
+    def __init__(self, page, object_id):
+        self.page = page
+        self.object_id = object_id
+
+
+class CdpBrowser:
+    """
+    One Chrome process driven over CDP plus the event loop thread all of its sessions run on.
+    Sync callers use run(), async callers can await the CdpPage API on `loop` directly
+    """
+    __CHROME_BINARIES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+    __LAUNCH_TIMEOUT = 30
+
+    def __init__(self, headless=True, nosandbox=False, user_data_dir=None, chrome_path=None):
+        self.loop = asyncio.new_event_loop()
+        self.__loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.__loop_thread.start()
+
+        self.__is_temp_user_data_dir = user_data_dir is None
+        self.user_data_dir = user_data_dir or tempfile.mkdtemp(prefix='bing-rewards-cdp-')
+        self.process = self.__launch(chrome_path, headless, nosandbox)
+        self.connection = self.run(CdpConnection.connect(self.__get_ws_url()))
+
+    def __launch(self, chrome_path, headless, nosandbox):
+        chrome_path = chrome_path or next(
+            (shutil.which(binary) for binary in self.__CHROME_BINARIES if shutil.which(binary)), None
+        )
+        if not chrome_path:
+            raise WebDriverException('Could not find a Chrome/Chromium binary for the CDP driver')
+
+        # stale port file from a previous launch
+        port_file = os.path.join(self.user_data_dir, 'DevToolsActivePort')
+        if os.path.exists(port_file):
+            os.remove(port_file)
+
+        args = [
+            chrome_path,
+            '--remote-debugging-port=0',
+            f'--user-data-dir={self.user_data_dir}',
+            '--no-first-run',
+            '--no-default-browser-check',
+            '--disable-extensions',
+            '--disable-notifications',
+            '--disable-gpu',
+            '--disable-dev-shm-usage',
+            '--window-size=1280,1024',
+            'about:blank',
+        ]
+        if headless:
+            args.append('--headless=new')
+        if nosandbox:
+            args.append('--no-sandbox')
+        return subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def __get_ws_url(self):
+        port_file = os.path.join(self.user_data_dir, 'DevToolsActivePort')
+        deadline = time.monotonic() + self.__LAUNCH_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise WebDriverException(f'Chrome exited with code {self.process.returncode} during launch')
+            if os.path.exists(port_file):
+                with open(port_file) as f:
+                    lines = f.read().split()
+                if len(lines) == 2:
+                    return f'ws://127.0.0.1:{lines[0]}{lines[1]}'
+            time.sleep(.1)
+        raise WebDriverException('Timed out waiting for Chrome DevTools to start')
+
+    def run(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def attach_page(self, target_id, context_id=None):
+        session_id = (await self.connection.send(
+            'Target.attachToTarget', {'targetId': target_id, 'flatten': True}
+        ))['sessionId']
+        page = CdpPage(self.connection, target_id, session_id, context_id)
+        await page.enable()
+        return page
+
+    async def new_page(self, isolated=True):
+        """ Opens a tab, in its own browser context (separate cookies and storage) when isolated """
+        params = {'url': 'about:blank'}
+        context_id = None
+        if isolated:
+            context_id = (await self.connection.send('Target.createBrowserContext'))['browserContextId']
+            params['browserContextId'] = context_id
+        target_id = (await self.connection.send('Target.createTarget', params))['targetId']
+        return await self.attach_page(target_id, context_id)
+
+    async def get_page_target_ids(self, context_id=None):
+        target_infos = (await self.connection.send('Target.getTargets'))['targetInfos']
+        return [
+            target_info['targetId'] for target_info in target_infos
+            if target_info['type'] == 'page' and (context_id is None or target_info.get('browserContextId') == context_id)
+        ]
+
+    def new_driver(self, device, cookies_path=None):
+        """ A page in a browser context of its own, with the cookies of cookies_path loaded and saved back on quit """
+        driver = CdpDriver(self, self.run(self.new_page()), device, cookies_path)
+        driver.load_cookies()
+        return driver
+
+    def quit(self):
+        try:
+            self.run(self.connection.close(), timeout=5)
+        except Exception:  # browser already gone
+            pass
+        self.process.terminate()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.__is_temp_user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class CdpWebElement:
+    """ Selenium WebElement look-alike, enough for WebDriverWait/expected_conditions and Rewards """
+    def __init__(self, driver, element):
+        self.driver = driver
+        self.element = element
+
+    @property
+    def wrapped_element(self):
+        return self
+
+    def __call_function(self, function_declaration, *args):
+        return self.driver.run(
+            self.element.page.call_function_on(self.element.object_id, function_declaration, *args)
+        )
+
+    @property
+    def text(self):
+        return self.__call_function('function() { return this.innerText; }')
+
+    def get_attribute(self, name):
+        return self.__call_function(
+            'function(name) { const prop = this[name]; return (prop === undefined || typeof prop === "object") ? this.getAttribute(name) : prop; }',
+            name
+        )
+
+    def is_displayed(self):
+        return self.__call_function(f'function() {{ {_LOCATE_JS} return __is_displayed(this); }}')
+
+    def is_enabled(self):
+        return self.__call_function('function() { return !this.disabled; }')
+
+    def click(self):
+        self.__call_function('function() { this.scrollIntoView({block: "center"}); this.click(); }')
+
+    def clear(self):
+        self.__call_function(
+            'function() { this.value = ""; this.dispatchEvent(new Event("input", {bubbles: true})); }'
+        )
+
+    def send_keys(self, *values):
+        self.__call_function('function() { this.focus(); }')
+        self.driver.run(self.element.page.press_keys(''.join(values)))
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f'Unable to locate element: {by}={value}')
+        return elements[0]
+
+    def find_elements(self, by=By.ID, value=None):
+        elements = self.driver.run(self.element.page.find_elements(by, value, self.element.object_id))
+        return [CdpWebElement(self.driver, element) for element in elements]
+
+
+class _CdpAlert:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __handle(self, accept):
+        if not self.driver.page.dialog_open:
+            raise NoAlertPresentException()
+        self.driver.run(self.driver.page.handle_dialog(accept))
+
+    def dismiss(self):
+        self.__handle(False)
+
+    def accept(self):
+        self.__handle(True)
+
+
+class _CdpSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def alert(self):
+        return _CdpAlert(self.driver)
+
+    @property
+    def active_element(self):
+        return self.driver.execute_script('return document.activeElement')
+
+    def window(self, handle):
+        self.driver.switch_to_handle(handle)
+
+
+class CdpDriver:
+    """
+    Synchronous, Selenium-like facade over a CdpPage, implements the subset of the Driver interface Rewards uses.
+    Calls from any thread are scheduled on the browser's event loop
+    """
+    # fields of Storage.getCookies that Storage.setCookies takes back
+    __COOKIE_PARAMS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires', 'priority', 'sourceScheme', 'sourcePort')
+
+    def __init__(self, browser, page, device, cookies_path=None):
+        self.browser = browser
+        self.page = page
+        self.device = device
+        self.context_id = page.context_id
+        # json file the context's cookies persist in (--cookies), the CDP counterpart of a browser profile
+        self.cookies_path = cookies_path
+        self.__pages = {page.target_id: page}
+        self.switch_to = _CdpSwitchTo(self)
+
+    def run(self, coroutine, timeout=None):
+        return self.browser.run(coroutine, timeout)
+
+    def enable_profiling(self, profiler):
+        """ Records the latency of every CDP call, see src.profiler """
+        run = self.run
+
+        def profiled_run(coroutine, timeout=None):
+            command = coroutine.__qualname__
+            start = time.perf_counter()
+            try:
+                return run(coroutine, timeout)
+            finally:
+                profiler.record(command, time.perf_counter() - start)
+        self.run = profiled_run
+
+    def get(self, url):
+        self.run(self.page.get(url))
+
+    def refresh(self):
+        self.run(self.page.reload())
+
+    @property
+    def current_url(self):
+        return self.run(self.page.current_url())
+
+    @property
+    def current_window_handle(self):
+        return self.page.target_id
+
+    @property
+    def window_handles(self):
+        return self.run(self.browser.get_page_target_ids(self.context_id))
+
+    def switch_to_handle(self, handle):
+        if handle not in self.__pages:
+            self.__pages[handle] = self.run(self.browser.attach_page(handle, self.context_id))
+        self.page = self.__pages[handle]
+
+    def switch_to_n_tab(self, n):
+        self.switch_to_handle(self.window_handles[n])
+
+    def switch_to_first_tab(self):
+        self.switch_to_n_tab(0)
+
+    def switch_to_last_tab(self):
+        self.switch_to_n_tab(-1)
+
+    def close(self):
+        self.run(self.browser.connection.send('Target.closeTarget', {'targetId': self.page.target_id}))
+        self.__pages.pop(self.page.target_id, None)
+
+    def close_other_tabs(self):
+        curr = self.current_window_handle
+        for handle in self.window_handles:
+            if handle != curr:
+                self.run(self.browser.connection.send('Target.closeTarget', {'targetId': handle}))
+                self.__pages.pop(handle, None)
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f'Unable to locate element: {by}={value}')
+        return elements[0]
+
+    def find_elements(self, by=By.ID, value=None):
+        return [CdpWebElement(self, element) for element in self.run(self.page.find_elements(by, value))]
+
+    def wait_for(self, by, value, timeout, visible=False):
+        """ Push based replacement for WebDriverWait(...).until(presence/visibility_of_element_located) """
+        return CdpWebElement(self, self.run(self.page.wait_for(by, value, timeout, visible)))
+
+    def wait_for_url(self, predicate, timeout):
+        """ Navigation event based replacement for WebDriverWait(...).until(url_contains) """
+        return self.run(self.page.wait_for_url(predicate, timeout))
+
+    def drag_and_drop(self, source, target):
+        """ Replacement for ActionChains(driver).drag_and_drop(source, target).perform() """
+        self.run(self.page.drag(source.element.object_id, target.element.object_id))
+
+    def execute_script(self, script, *args):
+        """ Same semantics as Selenium: `script` is a function body, `arguments` are JSON serializable values """
+        expression = f'(function() {{ {script} }}).apply(null, {json.dumps(args)})'
+        remote_object = self.run(self.page.evaluate(expression, return_by_value=False))
+        if remote_object.get('subtype') == 'node':
+            return CdpWebElement(self, CdpElement(self.page, remote_object['objectId']))
+        if 'objectId' in remote_object:
+            return self.run(self.page.call_function_on(remote_object['objectId'], 'function() { return this; }'))
+        return remote_object.get('value')
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self.run(self.page.send(cmd, cmd_args))
+
+    def get_cookies(self):
+        """ Cookies of the current page, in Selenium's format """
+        cookies = self.run(self.page.send('Network.getCookies', {'urls': [self.current_url]}))['cookies']
+        return [
+            {
+                'name': cookie['name'], 'value': cookie['value'], 'domain': cookie['domain'], 'path': cookie['path'],
+                'secure': cookie['secure'], 'httpOnly': cookie['httpOnly'],
+                # session cookies have expires -1
+                **({'expiry': int(cookie['expires'])} if cookie.get('expires', -1) > 0 else {}),
+            }
+            for cookie in cookies
+        ]
+
+    def save_screenshot(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.run(self.page.screenshot()))
+        return True
+
+    def load_cookies(self):
+        if not self.cookies_path or not os.path.exists(self.cookies_path):
+            return
+        with open(self.cookies_path) as f:
+            cookies = json.load(f)
+        self.run(self.browser.connection.send(
+            'Storage.setCookies', {'cookies': cookies, 'browserContextId': self.context_id}
+        ))
+
+    def save_cookies(self):
+        cookies = self.run(self.browser.connection.send(
+            'Storage.getCookies', {'browserContextId': self.context_id}
+        ))['cookies']
+        cookies = [{key: cookie[key] for key in self.__COOKIE_PARAMS if key in cookie} for cookie in cookies]
+        os.makedirs(os.path.dirname(self.cookies_path), exist_ok=True)
+        # write then rename, a crash mid-write must not lose the session
+        tmp_path = self.cookies_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(cookies, f)
+        os.replace(tmp_path, self.cookies_path)
+
+    def quit(self):
+        try:
+            if self.cookies_path:
+                self.save_cookies()
+        except Exception:  # browser gone or hung, the previous cookies are kept
+            pass
+        try:
+            self.run(self.browser.connection.send('Target.disposeBrowserContext', {'browserContextId': self.context_id}))
+        except WebDriverException:  # browser already gone
+            pass
+
+
+class CdpDriverFactory(DriverFactory):
+    """
+    Every driver is a page on one shared CdpBrowser (launched on first use), in a browser context of its own.
+    With cookies, the context's cookies are kept in the account's workspace profile between runs
+    """
+    COOKIES_FILE = 'cdp_cookies.json'
+    undetected_driver = False
+    shares_browser = True
+    driver_name = None
+    _browser = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def get_browser(cls, headless=True, nosandbox=False) -> CdpBrowser:
+        with cls.__lock:
+            # crashed, or killed from outside
+            if cls._browser is not None and cls._browser.process.poll() is not None:
+                cls._browser.quit()
+                cls._browser = None
+            if cls._browser is None:
+                cls._browser = CdpBrowser(headless, nosandbox)
+                atexit.register(cls.shutdown)
+            return cls._browser
+
+    @classmethod
+    def get_driver(cls, device, headless, cookies, nosandbox, workspace=None) -> CdpDriver:
+        cookies_path = None
+        if cookies:
+            profile_dir = workspace.profile_dir if workspace else DriverFactory.COOKIES_DIR
+            cookies_path = os.path.join(profile_dir, cls.COOKIES_FILE)
+        driver = cls.get_browser(headless, nosandbox).new_driver(device, cookies_path)
+        if device == cls.MOBILE_DEVICE:
+            cls.emulate_mobile(driver)
+        return driver
+
+    @classmethod
+    def shutdown(cls):
+        with cls.__lock:
+            if cls._browser is not None:
+                cls._browser.quit()
+                cls._browser = None
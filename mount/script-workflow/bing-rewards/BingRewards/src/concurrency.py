@@ -0,0 +1,47 @@
+"""
+Per account concurrency and pacing: how many browsers one account may drive at once and how they are spread out.
+
+    rewards = Rewards(email, password, concurrency=ConcurrencyPolicy(max_browsers=2))
+
+With more than one browser, mobile search runs in a second browser of the same account alongside
+the web device tasks (Edge and web search, punch card, offers) instead of after them,
+and the results are merged into the account's Completion. A run then takes about as long as its longest task.
+"""
+import threading
+
+
+class ConcurrencyPolicy:
+    # wait between the first browser's sign in and the second one's, an account signing in twice at once looks like a bot
+    STAGGER = 30
+
+    def __init__(self, max_browsers=1, stagger=STAGGER):
+        """
+        max_browsers: browsers the account may have open at once, 1 runs every task one after another
+        stagger: seconds after the first browser signed in before the second one is launched,
+            in place of Rewards.MOBILE_SEARCH_DELAY between the web device tasks and mobile search
+        """
+        self.max_browsers = max_browsers
+        self.stagger = stagger
+
+    @property
+    def is_concurrent(self):
+        return self.max_browsers > 1
+
+
+class SessionThread(threading.Thread):
+    """ Runs func on its own thread, keeping what it raised to be re-raised by whoever joins it """
+    def __init__(self, func, name=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.error = None
+
+    def run(self):
+        try:
+            self.func()
+        except BaseException as e:
+            self.error = e
+
+    def join_and_raise(self):
+        self.join()
+        if self.error is not None:
+            raise self.error
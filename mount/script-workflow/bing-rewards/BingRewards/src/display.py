@@ -0,0 +1,135 @@
+"""
+Private virtual displays for browsers that aren't headless (-nhl), Linux only.
+
+Each browser gets its own small Xvfb server, started when the browser is launched and stopped when it quits,
+instead of every browser sharing one full HD X server. Headed runs can then run in parallel.
+Optionally an x11vnc server is attached to each display, to watch or take over a run:
+display :N is served on port VNC_BASE_PORT + N. The browsers are signed in, so without a password
+the VNC server only listens on localhost (reach it through an ssh tunnel).
+
+    DriverFactory.display_manager = DisplayManager(vnc=True)
+"""
+import atexit
+import os
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+
+class DisplayError(Exception):
+    pass
+
+
+class VirtualDisplay:
+    # the browser window is 1280x1024, see DriverFactory.add_driver_options
+    SIZE = (1280, 1024)
+    # 16 bit color is plenty for automation, and a 24 bit framebuffer is half as large again
+    DEPTH = 16
+    START_TIMEOUT = 10
+    VNC_BASE_PORT = 5900
+
+    def __init__(self, size=SIZE, depth=DEPTH, vnc=False, vnc_password=None):
+        self.size = size
+        self.depth = depth
+        self.vnc = vnc
+        self.vnc_password = vnc_password
+        # display number, chosen by Xvfb once started
+        self.number = None
+        self.__xvfb = None
+        self.__vnc = None
+
+    @property
+    def name(self):
+        return f':{self.number}'
+
+    @property
+    def vnc_port(self):
+        return self.VNC_BASE_PORT + self.number if self.__vnc else None
+
+    def start(self):
+        # Xvfb picks a free display number itself and writes it once ready, no race with other processes picking one
+        read_fd, write_fd = os.pipe()
+        try:
+            width, height = self.size
+            self.__xvfb = subprocess.Popen(
+                ['Xvfb', '-displayfd', str(write_fd), '-screen', '0', f'{width}x{height}x{self.depth}', '-nolisten', 'tcp'],
+                pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            os.close(write_fd)
+            if not select.select([read_fd], [], [], self.START_TIMEOUT)[0]:
+                self.stop()
+                raise DisplayError(f'Xvfb did not start within {self.START_TIMEOUT}s')
+            number = os.read(read_fd, 16).strip()
+        finally:
+            os.close(read_fd)
+        if not number:
+            self.stop()
+            raise DisplayError('Xvfb exited on startup')
+        self.number = int(number)
+
+        if self.vnc:
+            self.__vnc = subprocess.Popen(
+                ['x11vnc', '-display', self.name, '-rfbport', str(self.VNC_BASE_PORT + self.number), '-forever', '-shared', '-quiet']
+                + self.__get_vnc_auth_args(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        return self
+
+    def __get_vnc_auth_args(self):
+        if not self.vnc_password:
+            return ['-nopw', '-localhost']
+        # in a file only we can read rather than on the command line for all to see in ps, x11vnc deletes it once read
+        fd, path = tempfile.mkstemp(prefix='x11vnc-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.vnc_password + '\n')
+        return ['-passwdfile', 'rm:' + path]
+
+    def stop(self):
+        for process in (self.__vnc, self.__xvfb):
+            if process is None or process.poll() is not None:
+                continue
+            process.terminate()
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.__vnc = self.__xvfb = None
+
+
+class DisplayManager:
+    """ Hands out a VirtualDisplay per browser and stops whatever is left at exit """
+    def __init__(self, size=VirtualDisplay.SIZE, depth=VirtualDisplay.DEPTH, vnc=False, vnc_password=None):
+        self.size = size
+        self.depth = depth
+        self.vnc = vnc
+        self.vnc_password = vnc_password
+        self.displays = []
+        self.__lock = threading.Lock()
+        atexit.register(self.stop)
+
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith('linux') and shutil.which('Xvfb') is not None
+
+    def allocate(self):
+        display = VirtualDisplay(self.size, self.depth, self.vnc, self.vnc_password).start()
+        with self.__lock:
+            self.displays.append(display)
+        if display.vnc_port:
+            print(f'\nBrowser display {display.name}, VNC on port {display.vnc_port}')
+        return display
+
+    def release(self, display):
+        display.stop()
+        with self.__lock:
+            if display in self.displays:
+                self.displays.remove(display)
+
+    def stop(self):
+        with self.__lock:
+            displays, self.displays = self.displays, []
+        for display in displays:
+            display.stop()
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 import os
 import platform
 from urllib.request import urlopen
+from urllib.error import URLError
 import ssl
 import zipfile
 import shutil
@@ -12,8 +13,14 @@ from selenium.common.exceptions import SessionNotCreatedException, WebDriverExce
 import re
 import random
 import string
+import threading
+import time
 import undetected_chromedriver as uc
 from chromedriver_autoinstaller.utils import get_chrome_version
+from src.retry import RetryPolicy, retry
+
+# BingRewards/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class EventListener(AbstractEventListener):
@@ -24,9 +31,20 @@ class EventListener(AbstractEventListener):
 
 
 class Driver(EventFiringWebDriver):
-    def __init__(self, driver, EventListener, device):
+    def __init__(self, driver, EventListener, device, display_manager=None, display=None):
         super().__init__(driver, EventListener)
         self.device = device
+        # the private src.display.VirtualDisplay of a headed browser, stopped on quit
+        self.display_manager = display_manager
+        self.display = display
+
+    def quit(self):
+        try:
+            super().quit()
+        finally:
+            if self.display:
+                self.display_manager.release(self.display)
+                self.display = None
 
     def close_other_tabs(self):
         """ Closes all but current tab """
@@ -46,15 +64,59 @@ class Driver(EventFiringWebDriver):
     def switch_to_last_tab(self):
         self.switch_to_n_tab(-1)
 
+    def enable_profiling(self, profiler):
+        """ Records the latency of every command sent to the driver, see src.profiler """
+        web_driver = self.wrapped_driver
+        execute = web_driver.execute
+
+        def profiled_execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                profiler.record(driver_command, time.perf_counter() - start)
+        web_driver.execute = profiled_execute
+
+
+class ContextDriver(Driver):
+    """
+    Driver bound to one isolated browser context of a SharedBrowser.
+    Only sees the tabs of its own context, and quitting disposes the context
+    instead of closing the browser
+    """
+    def __init__(self, driver, EventListener, device, shared_browser, context_id):
+        super().__init__(driver, EventListener, device)
+        self.shared_browser = shared_browser
+        self.context_id = context_id
+
+    @property
+    def window_handles(self):
+        target_ids = self.shared_browser.get_context_target_ids(self.context_id)
+        return [handle for handle in self.wrapped_driver.window_handles if handle in target_ids]
+
+    def quit(self):
+        try:
+            self.wrapped_driver.quit()
+        finally:
+            self.shared_browser.dispose_context(self.context_id)
+
 class DriverFactory(ABC):
     WEB_DEVICE = 'web'
     MOBILE_DEVICE = 'mobile'
-    DRIVERS_DIR = "drivers"
+    # next to BingRewards.py, regardless of the working directory
+    DRIVERS_DIR = os.path.join(BASE_DIR, "drivers")
+    COOKIES_DIR = os.path.join(BASE_DIR, "stored_browser_data/")
+    # network errors while downloading the driver
+    DRIVER_DOWNLOAD_RETRY = RetryPolicy(max_attempts=3, base_delay=2, max_delay=10, budget=120, retry_on=(URLError, ConnectionError))
+    # whether get_driver already hands out isolated contexts of one shared browser
+    shares_browser = False
+    # optional src.display.DisplayManager, gives each headed browser a private virtual display
+    display_manager = None
 
     # Microsoft Edge user agents for additional points
     # agent src: https://www.whatismybrowser.com/guides/the-latest-user-agent/edge
-    __WEB_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.37"
-    __MOBILE_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 15_5 like Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.37"
+    WEB_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.37"
+    MOBILE_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 15_5 like Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.37"
 
     @property
     @staticmethod
@@ -80,9 +142,9 @@ class DriverFactory(ABC):
     def driver_name():
         pass
 
-    @staticmethod
+    @classmethod
     @abstractmethod
-    def _get_latest_driver_url(dl_try_count):
+    def _get_latest_driver_url(cls, dl_try_count):
         raise NotImplementedError
 
     def replace_selenium_marker(driver_path):
@@ -103,6 +165,10 @@ class DriverFactory(ABC):
         except Exception as e: # intentionally broad, havent seen an error yet, but that's not to say it couldnt happen. PATH modifications could trigger one
             print(f'Unable to replace selenium cdc_ string due to exception. No worries, program should still work without string replacement.\n{e}.')
 
+    @classmethod
+    def __fetch_driver(cls, dl_try_count=0):
+        retry('driver_download', cls.DRIVER_DOWNLOAD_RETRY, cls.__download_driver, dl_try_count)
+
     @classmethod
     def __download_driver(cls, dl_try_count=0):
         url = cls._get_latest_driver_url(dl_try_count)
@@ -143,7 +209,7 @@ class DriverFactory(ABC):
         #    cls.replace_selenium_marker(driver_path)
 
     @classmethod
-    def add_driver_options(cls, device, headless, cookies, nosandbox):
+    def add_driver_options(cls, device, headless, cookies, nosandbox, workspace=None):
         options = cls.WebDriverOptions()
 
         options.add_argument("--disable-extensions")
@@ -169,25 +235,116 @@ class DriverFactory(ABC):
         if cls.undetected_driver:
             options.add_argument("--disable-popup-blocking")
         elif device == cls.WEB_DEVICE:
-            options.add_argument("user-agent=" + cls.__WEB_USER_AGENT)
+            options.add_argument("user-agent=" + cls.WEB_USER_AGENT)
         else:
-            options.add_argument("user-agent=" + cls.__MOBILE_USER_AGENT)
+            options.add_argument("user-agent=" + cls.MOBILE_USER_AGENT)
 
         if cookies:
-            cookies_path = os.path.join(os.getcwd(), 'stored_browser_data/')
+            if workspace:
+                cookies_path = workspace.profile_dir
+            else:
+                cookies_path = cls.COOKIES_DIR
             options.add_argument("user-data-dir=" + cookies_path)
 
+        if workspace:
+            options.add_argument("--disk-cache-dir=" + workspace.cache_dir)
+            if workspace.cache_size_mb:
+                options.add_argument(f"--disk-cache-size={workspace.cache_size_mb * 1024 ** 2}")
+
         if nosandbox:
             options.add_argument("--no-sandbox")
 
         return options
 
     @classmethod
-    def get_driver(cls, device, headless, cookies, nosandbox) -> Driver:
+    def emulate_mobile(cls, driver):
+        """ Overrides user agent and device metrics of the driver's current tab via CDP """
+        cmd_args = {
+            "userAgent": cls.MOBILE_USER_AGENT,
+
+            # DO NOT USE THE DATA BELOW. IT'S AN EXAMPLE AND IT DOESN'T MATCH THE USERAGENT ABOVE
+
+            "userAgentMetadata": {
+                "brands": [
+                    {"brand": "Chromium", "version": "114"},
+                    {"brand": "Microsoft Edge", "version": "114"},
+                    {"brand": "Not;A=Brand", "version": "537"},
+                ],
+                "mobile": True,
+                "model": "iPhone12,2",
+                "platform": "iOS",
+                "platformVersion": "15.5.0",
+                #"fullVersion": "105.0.5195.79",
+                "fullVersionList": [
+                    {"brand": "Chromium", "version": "114.0.0.0"},
+                    {"brand": "Microsoft Edge", "version": "114.0.1823.37"},
+                    {"brand": "Not;A=Brand", "version": "537.36"},
+                ],
+                "architecture": "arm64",
+                "bitness": "",
+                "wow64": False,
+            },
+        }
+        driver.execute_cdp_cmd(
+            cmd="Emulation.setUserAgentOverride",
+            cmd_args=cmd_args,
+        )
+        driver.execute_cdp_cmd(
+            cmd="Network.setUserAgentOverride",
+            cmd_args=cmd_args,
+        )
+        driver.execute_cdp_cmd(
+            cmd='Emulation.setDeviceMetricsOverride', 
+            cmd_args={
+                "width": 1170,
+                "height": 2532,
+                "deviceScaleFactor": 3.00,
+                "mobile": True,
+            }
+        )
+
+    @classmethod
+    def _get_driver_path(cls):
+        # raspberry pi: assumes driver already installed via `sudo apt-get install chromium-chromedriver`
+        if platform.machine() in ["armv7l","aarch64"]:
+            return "/usr/lib/chromium-browser/chromedriver"
+        return os.path.join(cls.DRIVERS_DIR, cls.driver_name)
+
+    @classmethod
+    def attach_driver(cls, debugger_address):
+        """
+        Starts a new WebDriver session attached to an already running browser
+        instead of launching a new one. The driver must already be downloaded
+        """
+        if cls.undetected_driver:
+            options = webdriver.ChromeOptions()
+            driver_cls = webdriver.Chrome
+        else:
+            options = cls.WebDriverOptions()
+            driver_cls = cls.WebDriverCls
+        options.debugger_address = debugger_address
+        return driver_cls(cls._get_driver_path(), options=options)
+
+    @classmethod
+    def get_driver(cls, device, headless, cookies, nosandbox, workspace=None) -> Driver:
+        options = cls.add_driver_options(device, headless, cookies, nosandbox, workspace)
+        display = None
+        if not headless and cls.display_manager:
+            display = cls.display_manager.allocate()
+            options.add_argument("--display=" + display.name)
+        try:
+            driver = cls.__launch(device, headless, nosandbox, workspace, options, display)
+        except:
+            if display:
+                cls.display_manager.release(display)
+            raise
+        return Driver(driver, EventListener(), device, cls.display_manager, display)
+
+    @classmethod
+    def __launch(cls, device, headless, nosandbox, workspace, options, display):
         dl_try_count = 0
         MAX_TRIES = 4
         is_dl_success = False
-        options = cls.add_driver_options(device, headless, cookies, nosandbox)
 
         # raspberry pi: assumes driver already installed via `sudo apt-get install chromium-chromedriver`
         if platform.machine() in ["armv7l","aarch64"]:
@@ -198,57 +355,17 @@ class DriverFactory(ABC):
                 os.mkdir(cls.DRIVERS_DIR)
             driver_path = os.path.join(cls.DRIVERS_DIR, cls.driver_name)
             if not os.path.exists(driver_path):
-                cls.__download_driver()
+                cls.__fetch_driver()
                 dl_try_count += 1
 
         while not is_dl_success:
             try:
                 if cls.undetected_driver:
-                    driver = cls.WebDriverCls(options=options, driver_executable_path=driver_path)
+                    # undetected_chromedriver patches the binary, each workspace gets its own copy
+                    executable_path = workspace.get_driver_path(driver_path) if workspace else driver_path
+                    driver = cls.WebDriverCls(options=options, driver_executable_path=executable_path)
                     if device == cls.MOBILE_DEVICE:
-                        cmd_args = {
-                        "userAgent": "Mozilla/5.0 (iPhone; CPU iPhone OS 15_5 like Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.37",
-
-                        # DO NOT USE THE DATA BELOW. IT'S AN EXAMPLE AND IT DOESN'T MATCH THE USERAGENT ABOVE
-
-                        "userAgentMetadata": {
-                            "brands": [
-                                {"brand": "Chromium", "version": "114"},
-                                {"brand": "Microsoft Edge", "version": "114"},
-                                {"brand": "Not;A=Brand", "version": "537"},
-                            ],
-                            "mobile": True,
-                            "model": "iPhone12,2",
-                            "platform": "iOS",
-                            "platformVersion": "15.5.0",
-                            #"fullVersion": "105.0.5195.79",
-                            "fullVersionList": [
-                                {"brand": "Chromium", "version": "114.0.0.0"},
-                                {"brand": "Microsoft Edge", "version": "114.0.1823.37"},
-                                {"brand": "Not;A=Brand", "version": "537.36"},
-                            ],
-                            "architecture": "arm64",
-                            "bitness": "",
-                            "wow64": False,
-                            },
-                        }
-                        driver.execute_cdp_cmd(
-                            cmd="Emulation.setUserAgentOverride",
-                            cmd_args=cmd_args,
-                        )
-                        driver.execute_cdp_cmd(
-                            cmd="Network.setUserAgentOverride",
-                            cmd_args=cmd_args,
-                        )
-                        driver.execute_cdp_cmd(
-                            cmd='Emulation.setDeviceMetricsOverride', 
-                            cmd_args={
-                                "width": 1170,
-                                "height": 2532,
-                                "deviceScaleFactor": 3.00,
-                                "mobile": True,
-                            }
-                        )
+                        cls.emulate_mobile(driver)
                 else:
                     driver = cls.WebDriverCls(driver_path, options=options)
                 is_dl_success = True
@@ -264,7 +381,7 @@ class DriverFactory(ABC):
                     raise SessionNotCreatedException(
                         f'Tried downloading the {dl_try_count} most recent drivers. None match your browser version. Aborting now, please update your browser.')
 
-                cls.__download_driver(dl_try_count)
+                cls.__fetch_driver(dl_try_count)
                 # driver not up to date with Chrome browser, try different version
                 dl_try_count += 1
 
@@ -275,25 +392,31 @@ class DriverFactory(ABC):
                 # handle cookie error
                 if "DevToolsActivePort file doesn't exist" in error_msg:
                     #print('Driver error using cookies option. Trying without cookies.')
-                    options = cls.add_driver_options(device, headless, cookies=False, nosandbox=nosandbox)
+                    options = cls.add_driver_options(device, headless, cookies=False, nosandbox=nosandbox, workspace=workspace)
+                    if display:
+                        options.add_argument("--display=" + display.name)
 
                 else:
                     raise WebDriverException(error_msg)
 
-        return Driver(driver, EventListener(), device)
+        return driver
 
 
 class UChromeDriverFactory(DriverFactory):
+    # configurable, i.e to point at a local mirror
+    DRIVER_RELEASE_URL = "https://sites.google.com/chromium.org/driver/downloads?authuser=0"
+    DRIVER_STORAGE_URL = "https://chromedriver.storage.googleapis.com"
     undetected_driver = True
     WebDriverCls = uc.Chrome
     WebDriverOptions = uc.ChromeOptions
     VERSION_MISMATCH_STR = 'this version of chromedriver only supports chrome version'
     driver_name = "chromedriver.exe" if platform.system() == "Windows" else "chromedriver"
 
-    def _get_latest_driver_url(dl_try_count):
+    @classmethod
+    def _get_latest_driver_url(cls, dl_try_count):
         # determine latest chromedriver version
         # version selection faq: http://chromedriver.chromium.org/downloads/version-selection
-        CHROME_RELEASE_URL = "https://sites.google.com/chromium.org/driver/downloads?authuser=0"
+        CHROME_RELEASE_URL = cls.DRIVER_RELEASE_URL
         try:
             response = urlopen(
                 CHROME_RELEASE_URL,
@@ -309,29 +432,33 @@ class UChromeDriverFactory(DriverFactory):
 
         system = platform.system()
         if system == "Windows":
-            url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_win32.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_win32.zip"
         elif system == "Darwin":
             # M1
             if platform.processor() == 'arm':
-                url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_mac_arm64.zip"
+                url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_mac_arm64.zip"
             else:
-                url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_mac64.zip"
+                url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_mac64.zip"
         elif system == "Linux":
-            url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_linux64.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_linux64.zip"
         return url
 
 
 class ChromeDriverFactory(DriverFactory):
+    # configurable, i.e to point at a local mirror
+    DRIVER_RELEASE_URL = "https://sites.google.com/chromium.org/driver/downloads?authuser=0"
+    DRIVER_STORAGE_URL = "https://chromedriver.storage.googleapis.com"
     undetected_driver = False
     WebDriverCls = webdriver.Chrome
     WebDriverOptions = webdriver.ChromeOptions
     VERSION_MISMATCH_STR = 'this version of chromedriver only supports chrome version'
     driver_name = "chromedriver.exe" if platform.system() == "Windows" else "chromedriver"
 
-    def _get_latest_driver_url(dl_try_count):
+    @classmethod
+    def _get_latest_driver_url(cls, dl_try_count):
         # determine latest chromedriver version
         # version selection faq: http://chromedriver.chromium.org/downloads/version-selection
-        CHROME_RELEASE_URL = "https://sites.google.com/chromium.org/driver/downloads?authuser=0"
+        CHROME_RELEASE_URL = cls.DRIVER_RELEASE_URL
         try:
             response = urlopen(
                 CHROME_RELEASE_URL,
@@ -349,27 +476,31 @@ class ChromeDriverFactory(DriverFactory):
 
         system = platform.system()
         if system == "Windows":
-            url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_win32.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_win32.zip"
         elif system == "Darwin":
             # M1
             if platform.processor() == 'arm':
-                url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_mac_arm64.zip"
+                url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_mac_arm64.zip"
             else:
-                url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_mac64.zip"
+                url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_mac64.zip"
         elif system == "Linux":
-            url = f"https://chromedriver.storage.googleapis.com/{latest_version}/chromedriver_linux64.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/chromedriver_linux64.zip"
         return url
 
 
 class MsEdgeDriverFactory(DriverFactory):
+    # configurable, i.e to point at a local mirror
+    DRIVER_RELEASE_URL = "https://developer.microsoft.com/en-us/microsoft-edge/tools/webdriver/"
+    DRIVER_STORAGE_URL = "https://msedgedriver.azureedge.net"
     undetected_driver = False
     WebDriverCls = webdriver.Edge
     WebDriverOptions = webdriver.EdgeOptions
     VERSION_MISMATCH_STR = 'this version of microsoft edge webdriver only supports microsoft edge version'
     driver_name = "msedgedriver.exe" if platform.system() == "Windows" else "msedgedriver"
 
-    def _get_latest_driver_url(dl_try_count):
-        EDGE_RELEASE_URL = "https://developer.microsoft.com/en-us/microsoft-edge/tools/webdriver/"
+    @classmethod
+    def _get_latest_driver_url(cls, dl_try_count):
+        EDGE_RELEASE_URL = cls.DRIVER_RELEASE_URL
         try:
             response = urlopen(
                 EDGE_RELEASE_URL,
@@ -387,9 +518,68 @@ class MsEdgeDriverFactory(DriverFactory):
 
         system = platform.system()
         if system == "Windows":
-            url = f"https://msedgedriver.azureedge.net/{latest_version}/edgedriver_win64.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/edgedriver_win64.zip"
         elif system == "Darwin":
-            url = f"https://msedgedriver.azureedge.net/{latest_version}/edgedriver_mac64.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/edgedriver_mac64.zip"
         elif system == "Linux":
-            url = f"https://msedgedriver.azureedge.net/{latest_version}/edgedriver_linux64.zip"
+            url = f"{cls.DRIVER_STORAGE_URL}/{latest_version}/edgedriver_linux64.zip"
         return url
+
+
+class SharedBrowser:
+    """
+    Runs several accounts in a single browser process.
+    Each account gets its own browser context (CDP Target.createBrowserContext),
+    i.e separate cookies, storage and cache, driven by its own WebDriver session
+    attached to the browser, so accounts can be driven concurrently from different threads
+    """
+    __CAPABILITY_OPTIONS_KEYS = ('goog:chromeOptions', 'ms:edgeOptions')
+
+    def __init__(self, driver_factory, headless=True, nosandbox=False):
+        self.driver_factory = driver_factory
+        self.__lock = threading.Lock()
+        # cookies are per context, a persistent profile would be shared by every account
+        self.__root_driver = driver_factory.get_driver(
+            driver_factory.WEB_DEVICE, headless, False, nosandbox
+        )
+        capabilities = self.__root_driver.capabilities
+        self.debugger_address = next(
+            capabilities[key]['debuggerAddress']
+            for key in self.__CAPABILITY_OPTIONS_KEYS if key in capabilities
+        )
+
+    def __execute_cdp_cmd(self, cmd, cmd_args=None):
+        with self.__lock:
+            return self.__root_driver.execute_cdp_cmd(cmd, cmd_args or {})
+
+    def new_context(self, device) -> ContextDriver:
+        context_id = self.__execute_cdp_cmd('Target.createBrowserContext')['browserContextId']
+        target_id = self.__execute_cdp_cmd(
+            'Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id}
+        )['targetId']
+
+        try:
+            driver = self.driver_factory.attach_driver(self.debugger_address)
+            driver.switch_to.window(target_id)
+            if device == self.driver_factory.MOBILE_DEVICE:
+                self.driver_factory.emulate_mobile(driver)
+        except:
+            self.dispose_context(context_id)
+            raise
+        return ContextDriver(driver, EventListener(), device, self, context_id)
+
+    def get_context_target_ids(self, context_id):
+        target_infos = self.__execute_cdp_cmd('Target.getTargets')['targetInfos']
+        return {
+            target_info['targetId'] for target_info in target_infos
+            if target_info['type'] == 'page' and target_info.get('browserContextId') == context_id
+        }
+
+    def dispose_context(self, context_id):
+        try:
+            self.__execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except WebDriverException:  # already disposed
+            pass
+
+    def quit(self):
+        self.__root_driver.quit()
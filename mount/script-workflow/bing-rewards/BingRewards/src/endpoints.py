@@ -0,0 +1,36 @@
+"""
+URLs of the Microsoft, Bing and Google services Rewards talks to.
+Configurable so runs can target local stand-ins, see src/fake_bing.py and benchmark.py
+"""
+
+
+class Endpoints:
+    def __init__(
+        self,
+        login="https://login.live.com/",
+        bing="https://bing.com",
+        dashboard="https://rewards.bing.com/",
+        account="https://account.microsoft.com/",
+        trends="https://trends.google.com/trends/api/dailytrends",
+    ):
+        self.login = login
+        self.bing = bing
+        self.dashboard = dashboard
+        # landing page once login is complete
+        self.account = account
+        self.trends = trends
+
+    @property
+    def login_ppsecure(self):
+        return self.login + "ppsecure"
+
+    @classmethod
+    def local(cls, base_url):
+        """ Every service served from one local server, i.e src.fake_bing.FakeBingServer """
+        return cls(
+            login=f"{base_url}/login/",
+            bing=f"{base_url}/bing/",
+            dashboard=f"{base_url}/rewards/",
+            account=f"{base_url}/account/",
+            trends=f"{base_url}/trends/api/dailytrends",
+        )
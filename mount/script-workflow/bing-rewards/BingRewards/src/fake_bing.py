@@ -0,0 +1,362 @@
+"""
+Local stand-ins for the services Rewards talks to, so whole runs can be exercised and timed without network.
+Point Rewards at them with Endpoints.local(server.url).
+
+/login/     login.live.com: email, password (i0118) and 'stay signed in' (KmsiCheckboxField) pages
+/account/   landing page once signed in
+/rewards/   rewards dashboard, with the `var dashboard = ...` blob and the daily set / more activities cards
+/bing/      bing.com search, every /bing/search request counts as a pc or mobile (by user agent) search,
+            the results page reads the points balance from /bing/rewardsapp/ncheader into its header
+/offer/     poll and multiple choice quiz pages opened by the dashboard cards
+/trends/    Google Trends dailytrends API
+"""
+import json
+import random
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeBingState:
+    POINTS_PER_SEARCH = 5
+
+    def __init__(self, pc_searches=3, mobile_searches=2, quiz_questions=3):
+        self.pc_search_max = pc_searches * self.POINTS_PER_SEARCH
+        self.mobile_search_max = mobile_searches * self.POINTS_PER_SEARCH
+        self.pc_search_progress = 0
+        self.edge_search_progress = 0
+        self.mobile_search_progress = 0
+        self.quiz_questions = quiz_questions
+        self.available_points = 1000
+        self.earned_today = 0
+        self.queries = []
+        self.lock = threading.Lock()
+        # offer id -> [title, points, complete]
+        self.offers = {
+            'daily-poll': ['Daily poll', 10, False],
+            'daily-quiz': ['Daily quiz', 30, False],
+            'daily-done': ['Daily activity', 10, True],
+        }
+        self.more_activities = {
+            'more-poll': ['Weekly poll', 10, False],
+            'more-drag': ['Weekly drag and drop quiz', 30, False],
+        }
+
+    def add_points(self, points):
+        self.available_points += points
+        self.earned_today += points
+
+    def record_search(self, query, user_agent):
+        with self.lock:
+            self.queries.append(query)
+            if 'iPhone' in user_agent:
+                if self.mobile_search_progress < self.mobile_search_max:
+                    self.mobile_search_progress += self.POINTS_PER_SEARCH
+                    self.add_points(self.POINTS_PER_SEARCH)
+            # desktop searches fill the Edge bonus counter first, then the pc counter
+            elif self.edge_search_progress < self.pc_search_max:
+                self.edge_search_progress += self.POINTS_PER_SEARCH
+                self.add_points(self.POINTS_PER_SEARCH)
+            elif self.pc_search_progress < self.pc_search_max:
+                self.pc_search_progress += self.POINTS_PER_SEARCH
+                self.add_points(self.POINTS_PER_SEARCH)
+
+    def complete_offer(self, offer_id):
+        with self.lock:
+            offer = self.offers.get(offer_id) or self.more_activities.get(offer_id)
+            if offer and not offer[2]:
+                offer[2] = True
+                self.add_points(offer[1])
+
+    @staticmethod
+    def __get_promotions(offers):
+        return [
+            {
+                'name': offer_id, 'title': title, 'promotionType': 'quiz', 'destinationUrl': f'/offer/?id={offer_id}',
+                'pointProgressMax': points, 'complete': complete,
+            }
+            for offer_id, (title, points, complete) in offers.items()
+        ]
+
+    def get_dashboard(self):
+        return {
+            'userStatus': {
+                'availablePoints': self.available_points,
+                'lifetimePoints': self.available_points + 5000,
+                'levelInfo': {'activeLevel': 'Level2'},
+                'counters': {
+                    'pcSearch': [
+                        {'pointProgress': self.pc_search_progress, 'pointProgressMax': self.pc_search_max},
+                        {'pointProgress': self.edge_search_progress, 'pointProgressMax': self.pc_search_max},
+                    ],
+                    'mobileSearch': [
+                        {'pointProgress': self.mobile_search_progress, 'pointProgressMax': self.mobile_search_max},
+                    ],
+                    'dailyPoint': [{'pointProgress': self.earned_today}],
+                },
+            },
+            'streakBonusPromotions': [{'activityProgress': 3}],
+            'punchCards': [],
+            'dailySetPromotions': {date.today().strftime('%m/%d/%Y'): self.__get_promotions(self.offers)},
+            'morePromotions': self.__get_promotions(self.more_activities),
+        }
+
+
+_LOGIN_EMAIL_PAGE = """<html><body>
+<form action="/login/password" method="get"><input name="loginfmt" type="email" autofocus></form>
+</body></html>"""
+
+_LOGIN_PASSWORD_PAGE = """<html><body>
+<form action="/login/ppsecure/post.srf" method="get"><input id="i0118" name="passwd" type="password" autofocus></form>
+</body></html>"""
+
+_LOGIN_KMSI_PAGE = """<html><body>
+<p>Stay signed in?</p>
+<input id="KmsiCheckboxField" type="checkbox">
+<button id="idSIButton9" onclick="location.href='/account/'">Yes</button>
+</body></html>"""
+
+_SEARCH_PAGE = """<html><body>
+<header><span id="id_rc"></span></header>
+<form action="/bing/search" method="get"><input id="sb_form_q" name="q" value="{query}"></form>
+<ol id="b_results">{results}</ol>
+<script>
+fetch('/bing/rewardsapp/ncheader').then((resp) => resp.json()).then((header) => {{
+    document.getElementById('id_rc').textContent = header.userInfo.balance.toLocaleString();
+}});
+</script>
+</body></html>"""
+
+_POLL_PAGE = """<html><body>
+<div id="btPollOverlay">
+<h2>{title}</h2>
+<button id="btoption0" onclick="answer()">Option A</button><button id="btoption1" onclick="answer()">Option B</button>
+<div id="OptionText00" onclick="answer()">Option A</div><div id="OptionText01" onclick="answer()">Option B</div>
+</div>
+<script>function answer() {{ fetch('/api/complete?offer={offer_id}'); }}</script>
+</body></html>"""
+
+# multiple choice quiz with overlay: question state circles, rqAnswerOption{n} options, quizCompleteContainer at the end
+_QUIZ_PAGE = """<html><body>
+<div id="btOverlay">
+<div id="quizWelcomeContainer"><button id="rqStartQuiz" onclick="start()">Start playing</button></div>
+<div id="quizContainer" style="display: none;">
+<div id="states"></div><div id="options"></div>
+</div>
+<div id="quizCompleteContainer" style="display: none;"><div>Great job! You earned {points} points</div></div>
+</div>
+<script>
+const questions = {questions}, answers = [];
+for (let i = 0; i < questions; i++) answers.push(Math.floor(Math.random() * 4));
+let current = 0;
+function render() {{
+    document.getElementById('states').innerHTML = Array.from({{length: questions}}, (_, i) =>
+        `<span id="rqQuestionState${{i}}" class="${{i <= current ? 'filledCircle' : 'emptyCircle'}}"></span>`).join('');
+    document.getElementById('options').innerHTML = [0, 1, 2, 3].map((i) =>
+        `<div id="rqAnswerOption${{i}}" class="rqOption" onclick="answer(${{i}})">Option ${{i}}</div>`).join('');
+}}
+function start() {{
+    document.getElementById('quizWelcomeContainer').style = 'display: none;';
+    document.getElementById('quizContainer').style = '';
+    render();
+}}
+function answer(i) {{
+    if (i !== answers[current]) return;
+    if (current === questions - 1) {{
+        fetch('/api/complete?offer={offer_id}').then(() => {{
+            document.getElementById('quizCompleteContainer').style = '';
+        }});
+    }} else {{
+        current += 1;
+        render();
+    }}
+}}
+</script>
+</body></html>"""
+
+# options are swapped by pressing the mouse on one and releasing it on another, like the real drag and drop quiz
+_DRAG_AND_DROP_PAGE = """<html><body>
+<div id="btOverlay">
+<div id="quizWelcomeContainer"><button id="rqStartQuiz" onclick="start()">Start playing</button></div>
+<div id="quizContainer" style="display: none;">
+<div id="states"></div><div id="rqAnswerOptionNum0"></div><div id="options"></div>
+</div>
+<div id="quizCompleteContainer" style="display: none;"><div>Great job! You earned {points} points</div></div>
+</div>
+<script>
+const questions = {questions};
+let current = 0, order = [], dragged = -1;
+function shuffle() {{
+    do {{ order = [0, 1, 2, 3].sort(() => Math.random() - 0.5); }} while (order.every((answer, i) => answer === i));
+}}
+function render() {{
+    document.getElementById('states').innerHTML = Array.from({{length: questions}}, (_, i) =>
+        `<span id="rqQuestionState${{i}}" class="${{i <= current ? 'filledCircle' : 'emptyCircle'}}"></span>`).join('');
+    document.getElementById('options').innerHTML = order.map((answer, i) =>
+        `<div id="rqAnswerOption${{i}}" data-option="answer${{answer}}" style="height: 40px;"
+            class="rqOption rqDragOption${{answer === i ? ' correctAnswer' : ''}}"
+            onmousedown="dragged = ${{i}}" onmouseup="drop(${{i}})">Answer ${{answer}}</div>`).join('');
+}}
+function start() {{
+    document.getElementById('quizWelcomeContainer').style = 'display: none;';
+    document.getElementById('quizContainer').style = '';
+    shuffle();
+    render();
+}}
+function drop(i) {{
+    if (dragged < 0 || dragged === i) return;
+    [order[dragged], order[i]] = [order[i], order[dragged]];
+    dragged = -1;
+    if (!order.every((answer, j) => answer === j)) return render();
+    if (current === questions - 1) {{
+        render();
+        fetch('/api/complete?offer={offer_id}').then(() => {{
+            document.getElementById('quizCompleteContainer').style = '';
+        }});
+    }} else {{
+        current += 1;
+        shuffle();
+        render();
+    }}
+}}
+</script>
+</body></html>"""
+
+
+class FakeBingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self) -> FakeBingState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def __send(self, body, content_type='text/html', status=200, headers=None):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path
+
+        if path == '/login/':
+            self.__send(_LOGIN_EMAIL_PAGE)
+        elif path == '/login/password':
+            self.__send(_LOGIN_PASSWORD_PAGE)
+        elif path.startswith('/login/ppsecure'):
+            self.__send(_LOGIN_KMSI_PAGE)
+        elif path == '/account/':
+            self.__send('<html><body><h1>Microsoft account</h1></body></html>')
+        elif path == '/rewards/':
+            self.__send(self.__get_dashboard_page())
+        elif path == '/bing/':
+            self.__send(_SEARCH_PAGE.format(query='', results=''))
+        elif path == '/bing/search':
+            query = params.get('q', '')
+            self.state.record_search(query, self.headers.get('User-Agent', ''))
+            results = ''.join(f'<li><a href="#">{query} result {i}</a></li>' for i in range(10))
+            self.__send(_SEARCH_PAGE.format(query=query, results=results))
+        elif path == '/bing/rewardsapp/ncheader':
+            self.__send(json.dumps({'userInfo': {'balance': self.state.available_points}}), content_type='application/json')
+        elif path == '/offer/':
+            self.__send(self.__get_offer_page(params.get('id', '')))
+        elif path == '/api/complete':
+            self.state.complete_offer(params.get('offer', ''))
+            self.__send('{}', content_type='application/json')
+        elif path == '/trends/api/dailytrends':
+            self.__send(")]}',\n" + json.dumps(self.__get_trends()), content_type='application/json')
+        else:
+            self.__send('not found', status=404)
+
+    def __get_offer_page(self, offer_id):
+        offer = self.state.offers.get(offer_id) or self.state.more_activities.get(offer_id)
+        if offer is None:
+            return '<html><body>not found</body></html>'
+        title, points, _ = offer
+        if 'poll' in title.lower():
+            return _POLL_PAGE.format(title=title, offer_id=offer_id)
+        if 'drag and drop' in title.lower():
+            return _DRAG_AND_DROP_PAGE.format(offer_id=offer_id, points=points, questions=self.state.quiz_questions)
+        return _QUIZ_PAGE.format(offer_id=offer_id, points=points, questions=self.state.quiz_questions)
+
+    @staticmethod
+    def __get_card(offer_id, offer, item_tag):
+        title, points, complete = offer
+        icon_class = 'mee-icon mee-icon-SkypeCircleCheck' if complete else 'mee-icon mee-icon-AddMedium'
+        return (
+            f'<mee-card><div><card-content><{item_tag}><div>'
+            f'<a href="/offer/?id={offer_id}" target="_blank">'
+            f'<mee-rewards-points><div><div><span class="{icon_class}"></span><span>{points}</span></div></div></mee-rewards-points>'
+            f'<div><h3>{title}</h3></div>'
+            f'</a></div></{item_tag}></card-content></div></mee-card>'
+        )
+
+    def __get_dashboard_page(self):
+        with self.state.lock:
+            daily_set = ''.join(
+                self.__get_card(offer_id, offer, 'mee-rewards-daily-set-item-content')
+                for offer_id, offer in self.state.offers.items()
+            )
+            more_activities = ''.join(
+                self.__get_card(offer_id, offer, 'mee-rewards-more-activities-card-item')
+                for offer_id, offer in self.state.more_activities.items()
+            )
+            dashboard = json.dumps(self.state.get_dashboard())
+        counters = ''.join(f'<span>{value}</span>' for value in ('1,000', '6,000', '3', '2 days until bonus', '-'))
+        return (
+            '<html><body>'
+            f'<mee-rewards-counter-animation>{counters}</mee-rewards-counter-animation>'
+            f'<div id="daily-sets"><mee-card-group><div>{daily_set}</div></mee-card-group></div>'
+            f'<div id="more-activities"><div>{more_activities}</div></div>'
+            '<script type="text/javascript">\n'
+            f'        var dashboard = {dashboard};\n'
+            '        appDataModule.constant("prefetchedDashboard", dashboard);\n'
+            '</script>'
+            '</body></html>'
+        )
+
+    @staticmethod
+    def __get_trends():
+        words = ['weather', 'news', 'football', 'recipes', 'stocks', 'movies', 'music', 'travel', 'science', 'history']
+        trending_searches = [
+            {
+                'title': {'query': f'{word} {i}'},
+                'relatedQueries': [{'query': f'{word} {i} {suffix}'} for suffix in ('today', 'near me')],
+            }
+            for i in range(5) for word in words
+        ]
+        random.shuffle(trending_searches)
+        return {'default': {'trendingSearchesDays': [{'trendingSearches': trending_searches}]}}
+
+
+class FakeBingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, state=None, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeBingHandler)
+        self.state = state if state is not None else FakeBingState()
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
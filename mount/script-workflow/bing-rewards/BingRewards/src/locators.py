@@ -0,0 +1,294 @@
+"""
+Selector registry: each logical element Rewards looks up has ranked alternative locators.
+
+    search_box = selectors.find(driver, 'search_box', timeout=5, condition=SelectorRegistry.VISIBLE)
+
+All alternatives are probed together in a single execute_script per poll, instead of one WebDriverWait per locator.
+The locator that last worked is tried first on the next lookup and remembered on disk (logs/selectors.json),
+alternatives that keep missing are demoted.
+Once every alternative of an element has missed DEAD_AFTER lookups in a row, i.e Microsoft changed the markup,
+lookups stop waiting out the full timeout and give up FAIL_FAST_TIMEOUT seconds after the page has loaded.
+Every RECOVERY_EVERY-th lookup of a dead element still waits the full timeout, so an element that is merely slow
+is found again, and misses older than DEAD_EXPIRY are forgotten.
+Elements that are often legitimately absent (OPTIONAL_ELEMENTS, i.e banners and login prompts) only learn from hits.
+"""
+import os
+import json
+import time
+import threading
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
+
+DAILY_SET_OFFER_XPATH = '//*[@id="daily-sets"]/mee-card-group[1]/div/mee-card[{index}]/div/card-content/mee-rewards-daily-set-item-content/div/a'
+MORE_ACTIVITIES_OFFER_XPATH = '//*[@id="more-activities"]/div/mee-card[{index}]/div/card-content/mee-rewards-more-activities-card-item/div/a'
+
+# logical element name: [(By, value), ...] best first, values are formatted with the lookup's keyword arguments
+DEFAULT_LOCATORS = {
+    # login
+    'password': [(By.ID, 'i0118'), (By.NAME, 'passwd'), (By.CSS_SELECTOR, 'input[type="password"]')],
+    'approve_sign_in': [(By.ID, 'idChkBx_SAOTCAS_TD')],
+    'stay_signed_in': [(By.ID, 'KmsiCheckboxField'), (By.NAME, 'DontShowAgain')],
+    'stay_signed_in_yes': [(By.XPATH, '//*[@id="idSIButton9"]'), (By.CSS_SELECTOR, 'input[type="submit"][id^="idSIButton"]')],
+    'terms_next': [(By.ID, 'iNext')],
+    'security_info_looks_good': [(By.ID, 'iLooksGood')],
+    'authenticator_code': [(By.ID, 'idRemoteNGC_DisplaySign')],
+    # dashboard
+    'dashboard_sign_in': [(By.XPATH, '//*[@id="raf-signin-link-id"]'), (By.CSS_SELECTOR, 'a[id^="raf-signin-link"]')],
+    'daily_set_offer': [
+        (By.XPATH, DAILY_SET_OFFER_XPATH),
+        (By.CSS_SELECTOR, '#daily-sets mee-card-group:first-of-type mee-card:nth-of-type({index}) mee-rewards-daily-set-item-content a'),
+    ],
+    'more_activities_card': [(By.XPATH, '//*[@id="more-activities"]/div/mee-card'), (By.CSS_SELECTOR, '#more-activities mee-card')],
+    'more_activities_offer': [
+        (By.XPATH, MORE_ACTIVITIES_OFFER_XPATH),
+        (By.CSS_SELECTOR, '#more-activities mee-card:nth-of-type({index}) mee-rewards-more-activities-card-item a'),
+    ],
+    # relative to an offer card
+    'offer_title': [(By.XPATH, './div[2]/h3'), (By.CSS_SELECTOR, 'h3')],
+    'offer_status_icon': [(By.XPATH, './mee-rewards-points/div/div/span[1]'), (By.CSS_SELECTOR, 'mee-rewards-points span.mee-icon')],
+    # bing
+    'search_box': [(By.ID, 'sb_form_q'), (By.CSS_SELECTOR, '#sb_form [name="q"]')],
+    'cookie_accept': [(By.ID, 'bnp_btn_accept'), (By.CSS_SELECTOR, '#bnp_container [id^="bnp_btn_accept"]')],
+    # quizzes and polls
+    'quiz_start': [(By.ID, 'rqStartQuiz'), (By.CSS_SELECTOR, '#quizWelcomeContainer [id^="rqStartQuiz"]')],
+    'quiz_answer_option': [(By.ID, 'rqAnswerOption{index}')],
+    'quiz_complete_header': [(By.XPATH, '//*[@id="quizCompleteContainer"]/div'), (By.CSS_SELECTOR, '#quizCompleteContainer > div')],
+    'this_or_that_progress': [(By.CLASS_NAME, 'bt_Quefooter')],
+    'this_or_that_header': [(By.CLASS_NAME, 'headerMessage_Refresh')],
+    'poll_option': [(By.ID, 'btoption{index}'), (By.ID, 'OptionText0{index}')],
+    'punchcard_progress': [(By.XPATH, "//div[@class='punchcard-completion-row']"), (By.CSS_SELECTOR, '.punchcard-completion-row')],
+}
+
+# lookups of these not finding anything are expected, they say nothing about the locators
+OPTIONAL_ELEMENTS = {
+    'approve_sign_in', 'stay_signed_in', 'stay_signed_in_yes', 'terms_next', 'security_info_looks_good',
+    'authenticator_code', 'dashboard_sign_in', 'cookie_accept', 'quiz_start', 'quiz_complete_header',
+}
+
+# same element order as Selenium's find_elements, which uses css selectors for id and name
+_PROBE_JS = r"""
+const [locators, condition] = arguments;
+function locate(by, value) {
+    switch (by) {
+        case 'id': return document.querySelectorAll('[id="' + CSS.escape(value) + '"]');
+        case 'name': return document.querySelectorAll('[name="' + CSS.escape(value) + '"]');
+        case 'class name': return document.getElementsByClassName(value);
+        case 'tag name': return document.getElementsByTagName(value);
+        case 'css selector': return document.querySelectorAll(value);
+        case 'xpath': {
+            const snapshot = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const els = [];
+            for (let i = 0; i < snapshot.snapshotLength; i++) els.push(snapshot.snapshotItem(i));
+            return els;
+        }
+    }
+    return [];
+}
+function matches(el) {
+    if (condition === 'present') return true;
+    const rect = el.getBoundingClientRect();
+    const style = getComputedStyle(el);
+    const displayed = rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+    return displayed && (condition === 'visible' || !el.disabled);
+}
+return {
+    ready: document.readyState === 'complete',
+    // per locator, the index of its first element meeting the condition, -1 if none
+    matches: locators.map(([by, value]) => {
+        try {
+            return Array.from(locate(by, value)).findIndex(matches);
+        } catch (e) {  // i.e an invalid xpath
+            return -1;
+        }
+    }),
+};
+"""
+
+
+class SelectorRegistry:
+    PRESENT = 'present'
+    VISIBLE = 'visible'
+    CLICKABLE = 'clickable'
+
+    PROBE_INTERVAL = .1
+    # consecutive misses after which a locator is considered dead, a slow page must not kill a working locator
+    DEAD_AFTER = 5
+    FAIL_FAST_TIMEOUT = 1
+    # one in this many lookups of a dead element waits the full timeout
+    RECOVERY_EVERY = 5
+    # seconds after which the misses of an element are forgotten, the markup may have changed back
+    DEAD_EXPIRY = 24 * 60 * 60
+
+    __registries = {}
+    __registries_lock = threading.Lock()
+
+    def __init__(self, path=None, locators=None):
+        """
+        path: where the ranking is remembered, in memory only if None
+        locators: overrides of DEFAULT_LOCATORS
+        """
+        self.path = path
+        self.locators = dict(DEFAULT_LOCATORS, **(locators or {}))
+        # name: {'preferred': locator key, 'misses': {locator key: consecutive misses}, 'missed_at': time of the last miss}
+        self.state = {}
+        # name: lookups of the element since it was found dead, in this process
+        self.__dead_lookups = {}
+        self.__lock = threading.Lock()
+        self.__dirty = False
+        self.read()
+
+    @classmethod
+    def get(cls, path):
+        """ Registries are shared process wide by path, accounts running in the same process learn from each other """
+        with cls.__registries_lock:
+            if path not in cls.__registries:
+                cls.__registries[path] = cls(path)
+            return cls.__registries[path]
+
+    def read(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f)
+        except ValueError:
+            print(f'\nIgnoring unreadable {self.path}')
+
+    def write(self):
+        if not self.path:
+            return
+        with self.__lock:
+            if not self.__dirty:
+                return
+            # write then rename, a crash mid-write must not leave a truncated file behind
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=4, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.__dirty = False
+
+    @staticmethod
+    def __get_key(by, value):
+        return f'{by}={value}'
+
+    def __get_misses(self, name):
+        state = self.state.get(name, {})
+        if time.time() - state.get('missed_at', 0) > self.DEAD_EXPIRY:
+            return {}
+        return state.get('misses', {})
+
+    def get_locators(self, name, **fmt):
+        """ [(key, By, formatted value), ...] in the order they are tried: last working, still alive, dead """
+        state = self.state.get(name, {})
+        preferred = state.get('preferred')
+        misses = self.__get_misses(name)
+        ranked = []
+        for rank, (by, value) in enumerate(self.locators[name]):
+            key = self.__get_key(by, value)
+            is_dead = misses.get(key, 0) >= self.DEAD_AFTER
+            ranked.append(((key != preferred, is_dead, rank), key, by, value.format(**fmt)))
+        return [(key, by, value) for _, key, by, value in sorted(ranked)]
+
+    def is_dead(self, name):
+        misses = self.__get_misses(name)
+        return all(misses.get(self.__get_key(by, value), 0) >= self.DEAD_AFTER for by, value in self.locators[name])
+
+    def __is_fail_fast(self, name):
+        """
+        Whether the lookup gives up early, all but every RECOVERY_EVERY-th lookup of a dead element do.
+        An element never found yet waits the full timeout, its misses may only be a page slower than the timeout
+        """
+        if not self.state.get(name, {}).get('preferred') or not self.is_dead(name):
+            return False
+        with self.__lock:
+            count = self.__dead_lookups.get(name, 0) + 1
+            self.__dead_lookups[name] = count
+        return count % self.RECOVERY_EVERY != 0
+
+    def __record(self, name, hit_key, missed_keys):
+        with self.__lock:
+            state = self.state.setdefault(name, {'preferred': None, 'misses': {}})
+            if time.time() - state.get('missed_at', 0) > self.DEAD_EXPIRY:
+                state['misses'] = {}
+            if missed_keys:
+                for key in missed_keys:
+                    state['misses'][key] = state['misses'].get(key, 0) + 1
+                state['missed_at'] = time.time()
+            if hit_key:
+                # found again, i.e by a recovery lookup, the misses were the markup changing for a while
+                if self.is_dead(name):
+                    state['misses'] = {key: 1 for key in missed_keys}
+                state['preferred'] = hit_key
+                state['misses'].pop(hit_key, None)
+                self.__dead_lookups.pop(name, None)
+            self.__dirty = True
+
+    def __record_miss(self, name, locators):
+        if name not in OPTIONAL_ELEMENTS:
+            self.__record(name, None, [key for key, _, _ in locators])
+
+    def __record_hit(self, name, hit_key, locators, metrics):
+        # alternatives ranked above the hit missed
+        missed_keys = []
+        for key, _, _ in locators:
+            if key == hit_key:
+                break
+            missed_keys.append(key)
+        self.__record(name, hit_key, missed_keys)
+        if metrics and hit_key != self.__get_key(*self.locators[name][0]):
+            metrics.increment('selector_fallbacks')
+
+    def find(self, driver, name, timeout=0, condition=PRESENT, metrics=None, **fmt):
+        """
+        First element of the best ranked locator meeting the condition, polling until timeout.
+        Raises TimeoutException if it timed out, NoSuchElementException for timeout=0, like WebDriverWait and find_element do
+        """
+        locators = self.get_locators(name, **fmt)
+        fail_fast = self.__is_fail_fast(name)
+        start = time.monotonic()
+        while True:
+            probe = driver.execute_script(_PROBE_JS, [[by, value] for _, by, value in locators], condition)
+            for (key, by, value), index in zip(locators, probe['matches']):
+                if index < 0:
+                    continue
+                elements = driver.find_elements(by, value)
+                # the page may have changed since the probe
+                if index < len(elements):
+                    self.__record_hit(name, key, locators, metrics)
+                    return elements[index]
+
+            limit = timeout
+            if fail_fast and probe['ready']:
+                limit = min(timeout, self.FAIL_FAST_TIMEOUT)
+            elapsed = time.monotonic() - start
+            if elapsed >= limit:
+                break
+            time.sleep(min(self.PROBE_INTERVAL, limit - elapsed))
+
+        self.__record_miss(name, locators)
+        if fail_fast and timeout > self.FAIL_FAST_TIMEOUT and metrics:
+            metrics.increment('selector_fast_fails')
+        message = f'Unable to locate {name} ({condition}): ' + ', '.join(key for key, _, _ in locators)
+        if timeout:
+            raise TimeoutException(message)
+        raise NoSuchElementException(message)
+
+    def find_all(self, driver, name, metrics=None, **fmt):
+        """ All elements of the best ranked locator matching any, [] if none does """
+        locators = self.get_locators(name, **fmt)
+        for key, by, value in locators:
+            elements = driver.find_elements(by, value)
+            if elements:
+                self.__record_hit(name, key, locators, metrics)
+                return elements
+        self.__record_miss(name, locators)
+        return []
+
+    def find_within(self, parent, name, metrics=None, **fmt):
+        """ Lookup relative to an element, without waiting. Raises NoSuchElementException """
+        elements = self.find_all(parent, name, metrics, **fmt)
+        if not elements:
+            raise NoSuchElementException(f'Unable to locate {name} within element')
+        return elements[0]
@@ -8,7 +8,8 @@ The completion object is passed into rewards.py to ascertain what remaining task
 rewards.py returns an updated completion object which is finally converted back into a new log entry and then written to the log file within write()
 """
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from dateutil import tz
 import json
 
@@ -37,17 +38,41 @@ class HistLog:
     __OFFERS_OPTION = "Offers"
     __PUNCHCARD_OPTION = "Latest Punch Card Activity"
 
-    def __init__(self, email, run_path, search_path, run_datetime=datetime.now()):
+    def __init__(self, email, run_path, search_path, run_datetime=None, checkpoint_path=None):
+        """
+        run_datetime: local time of the run, defaults to now
+        checkpoint_path: checkpoint.json, enables resuming a crashed run mid-phase
+        """
         self.email = email
+        if run_datetime is None:
+            run_datetime = datetime.now()
         self.__run_datetime = run_datetime.replace(tzinfo=self.__LOCAL_TIMEZONE)
 
-        self.__run_log = RunHistoryJsonLog(run_path, email)
-        self.__search_log = SearchHistoryJsonLog(search_path, email)
+        self.__run_log = RunHistoryJsonLog(run_path, email, run_datetime)
+        self.__search_log = SearchHistoryJsonLog(search_path, email, run_datetime)
+        self.__checkpoint = None
+        if checkpoint_path:
+            # a checkpoint is valid until the next reset
+            day = self.get_next_reset().strftime("%Y-%m-%d")
+            self.__checkpoint = CheckpointJsonLog(checkpoint_path, email, day, run_datetime)
         self.__completion = Completion()
 
     def get_timestamp(self):
         return self.__run_datetime.strftime(self.__DATETIME_FORMAT)
 
+    def get_next_reset(self):
+        """ Local time of the first daily reset after run_datetime """
+        return self.get_reset_after(self.__run_datetime)
+
+    @classmethod
+    def get_reset_after(cls, run_datetime):
+        """ Local time of the first daily reset after run_datetime (local time), without reading the logs """
+        run_datetime_pst = run_datetime.replace(tzinfo=cls.__LOCAL_TIMEZONE).astimezone(cls.__PST_TIMEZONE)
+        reset = run_datetime_pst.replace(hour=cls.__RESET_HOUR, minute=0, second=0, microsecond=0)
+        if reset <= run_datetime_pst:
+            reset += timedelta(days=1)
+        return reset.astimezone(cls.__LOCAL_TIMEZONE).replace(tzinfo=None)
+
     def is_already_ran_today(self):
         try:
             last_ran = self.__run_log.user_entries[-1].split(": ")[0]
@@ -90,6 +115,14 @@ class HistLog:
             #clear search history if account's first run of the day
             self.__search_log.user_entries = []
 
+        if self.__checkpoint:
+            # queries of a run that crashed before writing the search log
+            search_hist = self.__search_log.user_entries
+            search_hist.extend(query for query in self.__checkpoint.get_queries() if query not in search_hist)
+            if self.__checkpoint.is_resumed() and self.__completion.checkpoint is None:
+                print(f'\nResuming from checkpoint: {self.__checkpoint.get_summary()}')
+            self.__completion.checkpoint = self.__checkpoint
+
         return self.__completion
 
     def get_run_hist(self):
@@ -135,6 +168,8 @@ class Completion:
         self.mobile_search = False
         self.offers = False
         self.punchcard = False
+        # CheckpointJsonLog with the finer grained progress of today's runs, if enabled
+        self.checkpoint = None
 
     def is_edge_search_completed(self):
         return self.edge_search
@@ -220,9 +255,15 @@ class BaseJsonLog:
     """
     DATETIME_FORMAT = "%a, %b %d %Y %I:%M%p"
     LOCAL_TIMEZONE = tz.tzlocal()
+    # accounts running concurrently in one process share the same log files,
+    # reentrant so a read-modify-write can hold it around write()
+    _WRITE_LOCK = threading.RLock()
 
-    def __init__(self, log_path, email, run_datetime=datetime.now()):
+    def __init__(self, log_path, email, run_datetime=None):
         self.log_path = log_path
+        self.email = email
+        if run_datetime is None:
+            run_datetime = datetime.now()
         self.run_datetime = run_datetime.replace(tzinfo=self.LOCAL_TIMEZONE)
         self.read()
         self.user_entries = self.data.get(email, [])
@@ -246,8 +287,19 @@ class BaseJsonLog:
         self.data[email] = self.user_entries
 
     def write(self):
-        with open(self.log_path, "w") as f:
-            json.dump(self.data, f, indent=4, sort_keys=True)
+        with self._WRITE_LOCK:
+            # re-read so entries written by other accounts since read() are kept
+            user_entries = self.data.get(self.email)
+            self.read()
+            if user_entries is not None:
+                self.data[self.email] = user_entries
+            # write then rename, a crash mid-write must not leave a truncated log behind
+            tmp_path = self.log_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.data, f, indent=4, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.log_path)
 
     def add_entry_and_write(self, entry, email, include_log_dt=True):
         self.add_user_entry(entry, include_log_dt)
@@ -258,19 +310,187 @@ class BaseJsonLog:
 class StatsJsonLog(BaseJsonLog):
     MAX_SIZE = 300
 
-    def __init__(self, log_path, email):
-        super().__init__(log_path, email)
+    def __init__(self, log_path, email, run_datetime=None):
+        super().__init__(log_path, email, run_datetime)
 
 
 class RunHistoryJsonLog(BaseJsonLog):
     MAX_SIZE = 365
 
-    def __init__(self, log_path, email):
-        super().__init__(log_path, email)
+    def __init__(self, log_path, email, run_datetime=None):
+        super().__init__(log_path, email, run_datetime)
 
 
 class SearchHistoryJsonLog(BaseJsonLog):
     MAX_SIZE = 1
 
-    def __init__(self, log_path, email):
-        super().__init__(log_path, email)
+    def __init__(self, log_path, email, run_datetime=None):
+        super().__init__(log_path, email, run_datetime)
+
+
+class CheckpointJsonLog(BaseJsonLog):
+    """
+    Fine grained progress of the current Rewards day, written as the run goes:
+    queries searched, offers attempted/verified and punch card activities attempted.
+    A run that crashed mid-phase resumes from here instead of redoing the phase
+    """
+    def __init__(self, log_path, email, day, run_datetime=None):
+        super().__init__(log_path, email, run_datetime)
+        user_entries = self.data.get(email)
+        # a checkpoint from a previous day is stale
+        if not isinstance(user_entries, dict) or user_entries.get('day') != day:
+            user_entries = {
+                'day': day,
+                'queries': [],
+                'offers_attempted': {},
+                'offers_verified': [],
+                'punchcard_activities': {},
+            }
+        self.user_entries = user_entries
+
+    def __save(self):
+        self.reattach_to_json(self.email)
+        self.write()
+
+    def is_resumed(self):
+        return bool(
+            self.user_entries['queries'] or self.user_entries['offers_attempted'] or self.user_entries['punchcard_activities']
+        )
+
+    def get_summary(self):
+        return (
+            f"{len(self.user_entries['queries'])} queries, "
+            f"{len(self.user_entries['offers_attempted'])} offers attempted, "
+            f"{len(self.user_entries['offers_verified'])} verified, "
+            f"{sum(len(self.__get_punchcard_attempts(title)) for title in self.user_entries['punchcard_activities'])} punch card activities"
+        )
+
+    def get_queries(self):
+        return self.user_entries['queries']
+
+    def add_query(self, query):
+        self.user_entries['queries'].append(query)
+        self.__save()
+
+    def get_offer_attempts(self, title):
+        return self.user_entries['offers_attempted'].get(title, 0)
+
+    def add_offer_attempt(self, title):
+        self.user_entries['offers_attempted'][title] = self.get_offer_attempts(title) + 1
+        self.__save()
+
+    def is_offer_verified(self, title):
+        return title in self.user_entries['offers_verified']
+
+    def set_offer_verified(self, title):
+        if not self.is_offer_verified(title):
+            self.user_entries['offers_verified'].append(title)
+            self.__save()
+
+    def __get_punchcard_attempts(self, punchcard_title):
+        """ {activity index: attempts today} of the punch card """
+        attempts = self.user_entries['punchcard_activities'].get(punchcard_title, {})
+        # earlier checkpoints only kept the index of the activity last attempted
+        if not isinstance(attempts, dict):
+            attempts = {str(attempts): 1}
+        return attempts
+
+    def get_punchcard_activity_attempts(self, punchcard_title, activity_index):
+        return self.__get_punchcard_attempts(punchcard_title).get(str(activity_index), 0)
+
+    def add_punchcard_activity_attempt(self, punchcard_title, activity_index):
+        attempts = self.__get_punchcard_attempts(punchcard_title)
+        attempts[str(activity_index)] = attempts.get(str(activity_index), 0) + 1
+        self.user_entries['punchcard_activities'][punchcard_title] = attempts
+        self.__save()
+
+
+class MarketJsonLog(BaseJsonLog):
+    """
+    Base class of logs shared by all accounts of a market (the key instead of an email), valid until the daily reset:
+    {market: {'day': ..., ENTRIES_KEY: {...}}}
+    """
+    ENTRIES_KEY = None
+
+    def __init__(self, log_path, market, day, run_datetime=None):
+        super().__init__(log_path, market, run_datetime)
+        self.day = day
+        self.user_entries = self.__get_entries()
+
+    def __get_entries(self):
+        entries = self.data.get(self.email)
+        # entries of a previous day are stale
+        if not isinstance(entries, dict) or entries.get('day') != self.day:
+            entries = {'day': self.day, self.ENTRIES_KEY: {}}
+        return entries
+
+    def refresh(self):
+        """ Picks up entries written since by other accounts """
+        with self._WRITE_LOCK:
+            self.read()
+        self.user_entries = self.__get_entries()
+
+    def save(self):
+        self.reattach_to_json(self.email)
+        self.write()
+
+
+class QuizAnswerJsonLog(MarketJsonLog):
+    """
+    Verified answers to today's quizzes: {offer id: {question index: [answer, ...]}}
+    The first account to solve a quiz records the answers, the others try them first.
+    An answer is an option index, or for drag and drop quizzes the answers in the order that solved the question
+    """
+    ENTRIES_KEY = 'quizzes'
+
+    def get_answers(self, offer_id, question):
+        self.refresh()
+        return self.user_entries['quizzes'].get(offer_id, {}).get(str(question), [])
+
+    def add_answer(self, offer_id, question, answer):
+        # refreshed and written under one lock, else the market entry written replaces answers added meanwhile
+        with self._WRITE_LOCK:
+            self.refresh()
+            answers = self.user_entries['quizzes'].setdefault(offer_id, {}).setdefault(str(question), [])
+            if answer not in answers:
+                answers.append(answer)
+                self.save()
+
+
+class PromotionCatalogJsonLog(MarketJsonLog):
+    """
+    Today's promotions: {title: {'type', 'destination', 'points', 'solver', 'quiz_type'}}
+    Built from the dashboard and completed with what the first account detected on the promotion's page,
+    i.e whether a quiz has an overlay and its kind, so other accounts skip the detection
+    """
+    ENTRIES_KEY = 'promotions'
+
+    def get(self, title):
+        self.refresh()
+        return self.user_entries['promotions'].get(title, {})
+
+    def add_promotions(self, promotions):
+        """ Promotions of the dashboard json, those already known are kept as is """
+        with self._WRITE_LOCK:
+            self.refresh()
+            catalog = self.user_entries['promotions']
+            added = False
+            for promotion in promotions:
+                title = promotion.get('title')
+                if title and title not in catalog:
+                    catalog[title] = {
+                        'type': promotion.get('promotionType'),
+                        'destination': promotion.get('destinationUrl'),
+                        'points': promotion.get('pointProgressMax'),
+                    }
+                    added = True
+            if added:
+                self.save()
+
+    def update(self, title, **fields):
+        with self._WRITE_LOCK:
+            self.refresh()
+            entry = self.user_entries['promotions'].setdefault(title, {})
+            if any(entry.get(key) != value for key, value in fields.items()):
+                entry.update(fields)
+                self.save()
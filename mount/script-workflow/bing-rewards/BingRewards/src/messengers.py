@@ -9,7 +9,7 @@ class BaseMessenger(ABC):
         self.messenger_type = messenger_type
 
     @abstractmethod
-    def send_message(message):
+    def send_message(self, message, screenshot_path=None):
         pass
 
     def handle_resp(self, resp):
@@ -21,7 +21,7 @@ class BaseMessenger(ABC):
                 f"Boo! {self.messenger_type.capitalize()} notification NOT sent, response code is: {resp} with response msg `{resp.text}`\n"
             )
 
-    def send_reward_message(self, stats_str, run_hist_str, email):
+    def send_reward_message(self, stats_str, run_hist_str, email, screenshot_path=None):
         """
         This is the entry function that will be called in BinGRewards.py.
         In turn, this function will call send_message() which is a function customized for each Notification Service
@@ -31,7 +31,7 @@ class BaseMessenger(ABC):
         "\n".join(stats_str) + \
         f"\nRun Log: {[run_hist_str]}"
 
-        self.send_message(message)
+        self.send_message(message, screenshot_path)
 
 
 class TelegramMessenger(BaseMessenger):
@@ -40,8 +40,9 @@ class TelegramMessenger(BaseMessenger):
         self.api_token = api_token
         self.userid = userid
 
-    def send_message(self, message):
-        if not os.path.isfile("error.png"):
+    def send_message(self, message, screenshot_path=None):
+        screenshot_path = screenshot_path or "error.png"
+        if not os.path.isfile(screenshot_path):
             reply_url = f'https://api.telegram.org/bot{self.api_token}/sendMessage?chat_id={self.userid}&text={message}'
             resp = requests.get(reply_url)
             self.handle_resp(resp)
@@ -49,7 +50,7 @@ class TelegramMessenger(BaseMessenger):
             if len(message) > 1024:
                 message = message[-1024:]
             reply_url = f'https://api.telegram.org/bot{self.api_token}/sendDocument?chat_id={self.userid}&caption={message}'
-            d =  {"document": open('error.png', 'rb')}
+            d =  {"document": open(screenshot_path, 'rb')}
             resp = requests.get(reply_url, files=d)
             self.handle_resp(resp)
 
@@ -59,7 +60,7 @@ class DiscordMessenger(BaseMessenger):
         super().__init__('discord')
         self.webhook_url = webhook_url
 
-    def send_message(self, message):
+    def send_message(self, message, screenshot_path=None):
         content = {"username": "Bing Rewards Bot", "content": message}
         resp = requests.post(self.webhook_url, json=content)
         self.handle_resp(resp)
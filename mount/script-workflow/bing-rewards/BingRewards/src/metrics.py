@@ -0,0 +1,166 @@
+"""
+Per run instrumentation: timed spans for every phase (login, each search type, offers, punch card, stats)
+and counters (dashboard loads, queries, ...) attributed to the phase they happened in.
+The points a phase earned are counted as its 'points' counter, from the balances the dashboard shows.
+
+Exporters write the metrics of a finished run to
+- a JSONL file, one record per span/counter
+- a Prometheus textfile (node_exporter textfile collector), one series per account and phase
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+    def __init__(self, email=None):
+        self.email = email
+        self.start = time.time()
+        self.spans = []
+        # (phase, counter name) -> value
+        self.counters = defaultdict(int)
+        self.__lock = threading.Lock()
+        # phases are tracked per thread, a run may drive several browsers at once
+        self.__local = threading.local()
+        # last points balance read, shared by the threads: it is the account's
+        self.__balance = None
+
+    def __get_phase_stack(self):
+        if not hasattr(self.__local, 'phases'):
+            self.__local.phases = []
+        return self.__local.phases
+
+    @property
+    def current_phase(self):
+        phases = self.__get_phase_stack()
+        return phases[-1] if phases else None
+
+    @contextmanager
+    def span(self, name):
+        phases = self.__get_phase_stack()
+        parent = phases[-1] if phases else None
+        phases.append(name)
+        if parent is None:
+            self.__local.phase_count = getattr(self.__local, 'phase_count', 0) + 1
+        start_time = time.time()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            phases.pop()
+            if parent is None:
+                self.__local.last_phase = name
+            with self.__lock:
+                self.spans.append({
+                    'name': name,
+                    'parent': parent,
+                    'start': start_time,
+                    'duration': time.monotonic() - start,
+                })
+
+    def increment(self, counter, value=1):
+        with self.__lock:
+            self.counters[(self.current_phase, counter)] += value
+
+    def observe_points(self, balance):
+        """
+        Points balance read i.e from the dashboard, the points gained since the previous reading are counted to a phase:
+        the one they are read in, or on its first reading the phase before it, which they showed up too late for
+        """
+        phases = self.__get_phase_stack()
+        phase = phases[0] if phases else None
+        phase_count = getattr(self.__local, 'phase_count', 0)
+        if phase is not None and getattr(self.__local, 'read_phase_count', None) != phase_count:
+            self.__local.read_phase_count = phase_count
+            phase = getattr(self.__local, 'last_phase', phase)
+        with self.__lock:
+            previous, self.__balance = self.__balance, balance
+            if previous is not None and balance > previous:
+                self.counters[(phase, 'points')] += balance - previous
+
+    def get_phase_durations(self):
+        """ Total seconds per span name, a phase can run more than once i.e after a relaunch """
+        durations = defaultdict(float)
+        for span in self.spans:
+            durations[span['name']] += span['duration']
+        return dict(durations)
+
+
+class JsonlMetricsExporter:
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, metrics):
+        timestamp = time.time()
+        with open(self.path, 'a') as f:
+            for span in metrics.spans:
+                f.write(json.dumps({'type': 'span', 'timestamp': timestamp, 'account': metrics.email, **span}) + '\n')
+            for (phase, counter), value in metrics.counters.items():
+                f.write(json.dumps({
+                    'type': 'counter', 'timestamp': timestamp, 'account': metrics.email,
+                    'phase': phase, 'name': counter, 'value': value
+                }) + '\n')
+
+
+class PrometheusTextfileExporter:
+    """
+    Keeps the latest run of every account in one textfile,
+    series of other accounts are preserved when an account's run is exported
+    """
+    PREFIX = 'bing_rewards'
+    _WRITE_LOCK = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def __escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def __series(self, name, labels, value):
+        label_str = ','.join(f'{key}="{self.__escape(label)}"' for key, label in labels.items())
+        return f'{self.PREFIX}_{name}{{{label_str}}} {value}'
+
+    def export(self, metrics):
+        account_label = f'account="{self.__escape(metrics.email)}"'
+        lines = [
+            self.__series('phase_duration_seconds', {'account': metrics.email, 'phase': phase}, round(duration, 3))
+            for phase, duration in metrics.get_phase_durations().items()
+        ]
+        lines += [
+            self.__series('phase_counter', {'account': metrics.email, 'phase': phase or '', 'counter': counter}, value)
+            for (phase, counter), value in metrics.counters.items()
+        ]
+        lines.append(self.__series('last_run_timestamp_seconds', {'account': metrics.email}, int(time.time())))
+
+        with self._WRITE_LOCK:
+            kept_lines = []
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    kept_lines = [
+                        line.rstrip('\n') for line in f
+                        if line.strip() and not line.startswith('#') and account_label not in line
+                    ]
+            series = sorted(kept_lines + lines)
+            headers = [
+                f'# TYPE {self.PREFIX}_phase_duration_seconds gauge',
+                f'# TYPE {self.PREFIX}_phase_counter gauge',
+                f'# TYPE {self.PREFIX}_last_run_timestamp_seconds gauge',
+            ]
+            # write then rename so the collector never reads a partial file
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write('\n'.join(headers + series) + '\n')
+            os.replace(tmp_path, self.path)
+
+
+def get_metrics_exporters(export_format, log_dir):
+    exporters = []
+    if export_format in ('jsonl', 'both'):
+        exporters.append(JsonlMetricsExporter(os.path.join(log_dir, 'metrics.jsonl')))
+    if export_format in ('prometheus', 'both'):
+        exporters.append(PrometheusTextfileExporter(os.path.join(log_dir, 'bing_rewards.prom')))
+    return exporters
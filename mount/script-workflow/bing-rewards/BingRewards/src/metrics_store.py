@@ -0,0 +1,101 @@
+"""
+Numeric time series of every run's metrics, to tell which phases are worth their browser time.
+
+Each finished run adds one row per phase and metric to a SQLite file:
+'duration' (browser seconds of the phase), 'points' (see Metrics.observe_points) and the phase's counters
+(dashboard_loads, queries, <operation>_retries, ...). Rows are indexed by account and run time.
+
+    store = MetricsStore('logs/metrics.sqlite3')
+    store.add_run(metrics)
+    store.get_totals(MetricsStore.PHASE, accounts=['me@example.com'], since=datetime(2024, 5, 1))
+
+python BingRewards/report.py prints the totals as points per browser second.
+"""
+import os
+import sqlite3
+from collections import defaultdict
+
+
+class MetricsStore:
+    PHASE = 'phase'
+    ACCOUNT = 'account'
+
+    DURATION = 'duration'
+    POINTS = 'points'
+    # seconds SQLite waits for another process writing
+    DB_TIMEOUT = 30
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self.__connect()
+        try:
+            db.executescript('''
+                CREATE TABLE IF NOT EXISTS metrics (
+                    run_start REAL, account TEXT, phase TEXT, name TEXT, value REAL
+                );
+                CREATE INDEX IF NOT EXISTS metrics_account_run_start ON metrics (account, run_start);
+                CREATE INDEX IF NOT EXISTS metrics_run_start ON metrics (run_start);
+            ''')
+        finally:
+            db.close()
+
+    def __connect(self):
+        return sqlite3.connect(self.path, timeout=self.DB_TIMEOUT)
+
+    @classmethod
+    def get_rows(cls, metrics):
+        """ (phase, name, value) of a run, durations of nested spans (i.e login) are '<span>_duration' of their phase """
+        values = defaultdict(float)
+        for span in metrics.spans:
+            if span['parent'] is None:
+                values[(span['name'], cls.DURATION)] += span['duration']
+            else:
+                values[(span['parent'], f"{span['name']}_{cls.DURATION}")] += span['duration']
+        for (phase, counter), value in metrics.counters.items():
+            values[(phase or '', counter)] += value
+        return [(phase, name, value) for (phase, name), value in values.items()]
+
+    def add_run(self, metrics):
+        rows = [(metrics.start, metrics.email, phase, name, value) for phase, name, value in self.get_rows(metrics)]
+        db = self.__connect()
+        try:
+            with db:
+                db.executemany('INSERT INTO metrics (run_start, account, phase, name, value) VALUES (?, ?, ?, ?, ?)', rows)
+        finally:
+            db.close()
+
+    def get_totals(self, group_by=PHASE, accounts=None, since=None, until=None):
+        """
+        {phase or account: {'runs': n, name: total value}} of the runs started within [since, until)
+        accounts: only these, all if None
+        since, until: datetimes
+        """
+        where, params = [], []
+        if accounts:
+            where.append(f'account IN ({", ".join("?" * len(accounts))})')
+            params += list(accounts)
+        if since:
+            where.append('run_start >= ?')
+            params.append(since.timestamp())
+        if until:
+            where.append('run_start < ?')
+            params.append(until.timestamp())
+        key = 'account' if group_by == self.ACCOUNT else 'phase'
+        query = (
+            f'SELECT {key}, name, SUM(value), COUNT(DISTINCT account || run_start) FROM metrics'
+            + (f' WHERE {" AND ".join(where)}' if where else '')
+            + f' GROUP BY {key}, name'
+        )
+        db = self.__connect()
+        try:
+            rows = db.execute(query, params).fetchall()
+        finally:
+            db.close()
+
+        totals = defaultdict(lambda: {'runs': 0})
+        for group, name, value, runs in rows:
+            totals[group][name] = value
+            if name == self.DURATION:
+                totals[group]['runs'] = runs
+        return dict(totals)
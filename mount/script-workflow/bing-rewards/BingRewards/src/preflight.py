@@ -0,0 +1,195 @@
+"""
+Browserless pre-flight: reads the rewards dashboard with plain HTTP requests, reusing the session cookies
+saved by the last browser run, and works out which tasks are still pending and which devices they need.
+
+Tasks the dashboard shows complete are marked completed before Rewards runs, so a browser is launched
+only for the devices still needed, or not at all. Without a saved session, or once it expired,
+there is no plan and the run goes ahead as usual.
+"""
+import os
+import json
+import time
+from datetime import date
+import requests
+from src.driver import DriverFactory
+from src.endpoints import Endpoints
+from src.log import Completion
+from src.rate_limit import RateLimiter
+
+DASHBOARD_START = "var dashboard = "
+DASHBOARD_END = ";\n        appDataModule.constant(\"prefetchedDashboard\", dashboard);"
+
+# tasks as named by Completion, per search type
+SEARCH_TYPE_TASKS = {
+    'web': ('edge_search', 'web_search'),
+    'mobile': ('edge_search', 'mobile_search'),
+    'both': ('edge_search', 'web_search', 'mobile_search'),
+    'offers': ('offers',),
+    'punch card': ('punchcard',),
+    'remaining': ('edge_search', 'web_search', 'punchcard', 'offers', 'mobile_search'),
+}
+# edge search runs on whichever device is open
+TASK_DEVICES = {
+    'web_search': DriverFactory.WEB_DEVICE,
+    'offers': DriverFactory.WEB_DEVICE,
+    'punchcard': DriverFactory.WEB_DEVICE,
+    'mobile_search': DriverFactory.MOBILE_DEVICE,
+}
+
+
+def parse_dashboard(html):
+    """ The dashboard json embedded in the rewards page. Raises ValueError if it isn't there, i.e signed out """
+    try:
+        start = html.index(DASHBOARD_START) + len(DASHBOARD_START)
+        end = html.index(DASHBOARD_END, start)
+    except ValueError:
+        raise ValueError('No dashboard data in page')
+    return json.loads(html[start:end])
+
+
+def is_valid_punchcard(punchcard):
+    """ Punch cards Rewards knows how to complete """
+    valid_offer_types = ('quiz', 'urlreward')
+    try:
+        punchcard_offer_types = punchcard['parentPromotion']['attributes']['type'].split(',')
+    except (KeyError, TypeError, AttributeError):
+        punchcard_offer_types = [None]
+    return bool(
+        punchcard.get('parentPromotion')
+        and all(punchcard_offer_type in valid_offer_types for punchcard_offer_type in punchcard_offer_types)
+        and punchcard['parentPromotion'].get('pointProgressMax', 0) != 0
+        and punchcard.get('childPromotions')
+    )
+
+
+def get_promotions(dashboard, today=None):
+    """ Today's daily set and more promotions of the dashboard json, None if today's daily set isn't there """
+    today = today if today is not None else date.today()
+    daily_sets = dashboard.get('dailySetPromotions', {})
+    today_key = today.strftime('%m/%d/%Y')
+    # i.e a different reset time zone
+    if today_key not in daily_sets:
+        return None
+    return daily_sets[today_key] + dashboard.get('morePromotions', [])
+
+
+class SessionStore:
+    """ Cookies of the rewards dashboard, saved after a browser run. Only readable by the owner, they are credentials """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """ Cookies that haven't expired, [] if none """
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                cookies = json.load(f)
+        except ValueError:
+            return []
+        now = time.time()
+        return [cookie for cookie in cookies if cookie.get('expiry') is None or cookie['expiry'] > now]
+
+    def save(self, cookies):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(cookies, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class PreflightPlan:
+    def __init__(self, dashboard, today=None):
+        self.dashboard = dashboard
+        self.today = today if today is not None else date.today()
+        user_status = dashboard['userStatus']
+        self.available_points = user_status['availablePoints']
+        counters = user_status['counters']
+
+        # what the dashboard shows complete
+        self.completion = Completion()
+        self.completion.web_search = self.__is_counter_complete(counters, 'pcSearch', 0)
+        self.completion.edge_search = self.__is_counter_complete(counters, 'pcSearch', 1)
+        self.completion.mobile_search = self.__is_counter_complete(counters, 'mobileSearch', 0)
+        self.completion.offers = not self.__get_pending_offers()
+        self.completion.punchcard = not any(
+            is_valid_punchcard(punchcard) and not punchcard['parentPromotion']['complete']
+            for punchcard in dashboard.get('punchCards', [])
+        )
+        # Rewards can't do these, launching a browser for them is no use
+        self.unavailable = set()
+        if user_status['levelInfo']['activeLevel'] == 'Level1':
+            self.unavailable.add('mobile_search')
+
+    @staticmethod
+    def __is_counter_complete(counters, search_key, search_index):
+        try:
+            counter = counters[search_key][search_index]
+        # counter not offered to this account, nothing to earn
+        except (KeyError, IndexError):
+            return True
+        return counter['pointProgress'] >= counter['pointProgressMax']
+
+    def __get_pending_offers(self):
+        promotions = get_promotions(self.dashboard, self.today)
+        # unknown, let Rewards check the cards
+        if promotions is None:
+            return [None]
+        return [
+            promotion for promotion in promotions
+            if not promotion.get('complete') and promotion.get('pointProgressMax', 0) > 0
+        ]
+
+    def get_pending(self, search_type):
+        """ Tasks of the search type a browser is needed for """
+        return [
+            task for task in SEARCH_TYPE_TASKS.get(search_type, ())
+            if not getattr(self.completion, task) and task not in self.unavailable
+        ]
+
+    def get_device_types(self, search_type):
+        pending = self.get_pending(search_type)
+        device_types = {TASK_DEVICES[task] for task in pending if task in TASK_DEVICES}
+        if pending and not device_types:  # only edge search
+            device_types.add(DriverFactory.WEB_DEVICE)
+        return sorted(device_types)
+
+
+class PreflightPlanner:
+    TIMEOUT = 15
+
+    def __init__(self, session_store, endpoints=None, user_agent=DriverFactory.WEB_USER_AGENT, rate_limiter=None):
+        self.session_store = session_store
+        self.endpoints = endpoints if endpoints is not None else Endpoints()
+        self.user_agent = user_agent
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.get(None)
+
+    def fetch_dashboard(self):
+        """ The dashboard json, None without a valid session """
+        cookies = self.session_store.load()
+        if not cookies:
+            return None
+        session = requests.Session()
+        session.headers['User-Agent'] = self.user_agent
+        for cookie in cookies:
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        self.rate_limiter.acquire(RateLimiter.DASHBOARD)
+        try:
+            resp = session.get(self.endpoints.dashboard, timeout=self.TIMEOUT)
+            resp.raise_for_status()
+            return parse_dashboard(resp.text)
+        # signed out (the session expired), or the dashboard is down: leave it to the browser
+        except (requests.RequestException, ValueError):
+            return None
+
+    def plan(self):
+        dashboard = self.fetch_dashboard()
+        if dashboard is None:
+            return None
+        try:
+            return PreflightPlan(dashboard)
+        except (KeyError, TypeError):  # dashboard format changed
+            return None
@@ -0,0 +1,97 @@
+"""
+Pre-warming: the next account's run is prepared while the current account finishes.
+
+Accounts running back to back otherwise start cold, the next browser is launched and the login page loaded
+only once the previous account has printed its stats and quit its browser.
+Once the current account's tasks are done, its tail (stats, reporting, quitting the browser) overlaps with
+launching the next account's browser, loading its login page, fetching its search queries and pre-flight plan.
+
+    prewarmer = Prewarmer(memory_budget_mb=1024)
+    prewarmer.start(email, prepare)   # prepare(warm_start) runs on a thread
+    warm_start = prewarmer.take(email)
+
+At most one account is warm at a time, and only while the host has memory_budget_mb available:
+the warm browser is a second browser alongside the current one.
+"""
+import atexit
+import threading
+from datetime import timedelta
+from src.processes import get_available_memory_mb
+
+
+class WarmStart:
+    """ What was prepared for an account's run """
+    def __init__(self, email):
+        self.email = email
+        # src.driver.Driver on the login page, None if no browser is needed or it couldn't be launched
+        self.driver = None
+        self.queries = None
+        # src.preflight.PreflightPlan
+        self.plan = None
+
+    def discard(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:  # already gone
+                pass
+            self.driver = None
+
+
+class Prewarmer:
+    # a browser on the login page takes around 300-500MB, leave room for the current account's to grow
+    MEMORY_BUDGET_MB = 1024
+    # accounts due later than this once the current one is done aren't pre-warmed, their browser would sit idle
+    MAX_IDLE = timedelta(minutes=2)
+
+    def __init__(self, memory_budget_mb=MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self.__lock = threading.Lock()
+        self.__warm_start = None
+        self.__thread = None
+        atexit.register(self.discard)
+
+    def has_memory(self):
+        available = get_available_memory_mb()
+        # no /proc, nothing to go by
+        return available is None or available >= self.memory_budget_mb
+
+    def start(self, email, prepare):
+        """ Runs prepare(warm_start) for the account on a thread. False if an account is already warm or memory is short """
+        with self.__lock:
+            if self.__warm_start is not None:
+                return False
+            if not self.has_memory():
+                print(f'\nNot pre-warming {email}, less than {self.memory_budget_mb}MB of memory available')
+                return False
+            warm_start = WarmStart(email)
+            thread = threading.Thread(target=self.__prepare, args=(warm_start, prepare), name=f'prewarm {email}', daemon=True)
+            self.__warm_start, self.__thread = warm_start, thread
+        print(f'\nPre-warming {email}')
+        thread.start()
+        return True
+
+    @staticmethod
+    def __prepare(warm_start, prepare):
+        try:
+            prepare(warm_start)
+        except Exception as e:
+            # the run starts cold instead
+            print(f'\nPre-warming {warm_start.email} failed: {e!r}')
+            warm_start.discard()
+
+    def take(self, email):
+        """ The account's WarmStart once ready, None if it isn't the warm account (which is then discarded) """
+        with self.__lock:
+            warm_start, thread = self.__warm_start, self.__thread
+            self.__warm_start = self.__thread = None
+        if warm_start is None:
+            return None
+        thread.join()
+        if warm_start.email != email:
+            warm_start.discard()
+            return None
+        return warm_start
+
+    def discard(self):
+        self.take(None)
@@ -0,0 +1,277 @@
+"""
+Helpers to find and kill the chromedriver/browser processes spawned for a run,
+and ProcessSupervisor which tracks them per run, accounts for their memory/CPU per phase
+and reaps whatever survives driver.quit().
+Process trees are read from /proc, on other platforms only the root process can be killed
+"""
+import json
+import os
+import signal
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_KILL_SIGNAL = getattr(signal, 'SIGKILL', signal.SIGTERM)
+_PROC_DIR = '/proc'
+
+
+def _read_stat_fields(pid):
+    """ Fields of /proc/<pid>/stat after the command name, i.e fields[0] is the state """
+    try:
+        with open(os.path.join(_PROC_DIR, str(pid), 'stat')) as f:
+            stat = f.read()
+    except OSError:  # process exited, or no /proc
+        return None
+    # the command name is wrapped in parentheses and may itself contain spaces
+    return stat[stat.rindex(')') + 2:].split()
+
+
+def get_start_time(pid):
+    """ Start time in clock ticks since boot, tells a process apart from a later one re-using its pid """
+    fields = _read_stat_fields(pid)
+    return int(fields[19]) if fields else None
+
+
+def get_cpu_seconds(pid):
+    fields = _read_stat_fields(pid)
+    if not fields:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def get_rss_bytes(pid):
+    try:
+        with open(os.path.join(_PROC_DIR, str(pid), 'status')) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def get_available_memory_mb():
+    """ Memory available to new processes without swapping, None without /proc """
+    try:
+        with open(os.path.join(_PROC_DIR, 'meminfo')) as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def get_parent_pids():
+    """ Maps pid to parent pid for every running process """
+    parent_pids = {}
+    if not os.path.isdir(_PROC_DIR):
+        return parent_pids
+    for entry in os.listdir(_PROC_DIR):
+        if not entry.isdigit():
+            continue
+        fields = _read_stat_fields(entry)
+        if fields:  # else process exited meanwhile
+            parent_pids[int(entry)] = int(fields[1])
+    return parent_pids
+
+
+def get_descendant_pids(pid):
+    parent_pids = get_parent_pids()
+    descendants = []
+    parents = {pid}
+    while parents:
+        children = [child for child, parent in parent_pids.items() if parent in parents]
+        descendants.extend(children)
+        parents = set(children)
+    return descendants
+
+
+def kill_process_tree(pid):
+    # snapshot the tree first, children are re-parented once their parent dies
+    for tree_pid in [pid] + get_descendant_pids(pid):
+        try:
+            os.kill(tree_pid, _KILL_SIGNAL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def get_driver_pids(driver):
+    """
+    Root pids of a driver: the chromedriver service and, for undetected_chromedriver, the browser,
+    or the Chrome process of a src.cdp.CdpDriver
+    """
+    driver = getattr(driver, 'wrapped_driver', driver)
+    pids = []
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is not None:
+        pids.append(process.pid)
+    # undetected_chromedriver launches the browser itself instead of through chromedriver
+    browser_pid = getattr(driver, 'browser_pid', None)
+    if browser_pid:
+        pids.append(browser_pid)
+    return pids + get_shared_browser_pids(driver)
+
+
+def get_shared_browser_pids(driver):
+    """ Pid of the Chrome process a CdpDriver shares with the other accounts of this process, it outlives driver.quit() """
+    driver = getattr(driver, 'wrapped_driver', driver)
+    process = getattr(getattr(driver, 'browser', None), 'process', None)
+    return [process.pid] if process is not None else []
+
+
+class ProcessSupervisor:
+    """
+    Tracks every browser process tree spawned during one run.
+
+    - samples the trees, recording peak RSS and CPU time per phase
+    - reaps processes still alive at the end of the run
+    - registers tracked pids in `registry_dir` so a later run can reap them if this one died before reaping
+    """
+    __SAMPLE_INTERVAL = 2
+
+    def __init__(self, registry_dir):
+        self.registry_dir = registry_dir
+        if not os.path.exists(registry_dir):
+            os.makedirs(registry_dir)
+        self.__registry_path = os.path.join(registry_dir, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        # pid -> start time, of every process seen in the tracked trees
+        self.__pids = {}
+        self.__root_pids = []
+        # roots of browsers shared with other accounts, sampled but not reaped
+        self.__shared_pids = set()
+        # thread id -> usage of the phase running on it, an account may drive several browsers at once
+        self.__phases = {}
+        self.phase_usage = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__sampler = threading.Thread(target=self.__sample_loop, daemon=True)
+        self.__sampler.start()
+
+    @staticmethod
+    def __is_same_process(pid, start_time):
+        return start_time is not None and get_start_time(pid) == start_time
+
+    def reap_orphans(self):
+        """ Kills processes registered by previous runs whose owning process is gone """
+        reaped_count = 0
+        for file_name in os.listdir(self.registry_dir):
+            path = os.path.join(self.registry_dir, file_name)
+            if path == self.__registry_path:
+                continue
+            try:
+                with open(path) as f:
+                    registry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            owner_pid, owner_start_time = registry['owner']
+            if self.__is_same_process(owner_pid, owner_start_time):  # run still in progress
+                continue
+            for pid, start_time in registry['pids']:
+                if self.__is_same_process(pid, start_time):
+                    kill_process_tree(pid)
+                    reaped_count += 1
+            os.remove(path)
+        if reaped_count:
+            print(f'Reaped {reaped_count} orphaned browser processes from previous runs')
+        return reaped_count
+
+    def track(self, driver):
+        with self.__lock:
+            for pid in get_driver_pids(driver):
+                self.__root_pids.append(pid)
+                self.__pids.setdefault(pid, get_start_time(pid))
+            self.__shared_pids.update(get_shared_browser_pids(driver))
+            self.__write_registry(self.__pids)
+        self.__sample()
+
+    def __write_registry(self, pids):
+        registry = {
+            'owner': [os.getpid(), get_start_time(os.getpid())],
+            'pids': [[pid, start_time] for pid, start_time in pids.items()],
+        }
+        with open(self.__registry_path, 'w') as f:
+            json.dump(registry, f)
+
+    def __sample(self):
+        with self.__lock:
+            root_pids = list(self.__root_pids)
+        if not root_pids:
+            return
+        tree_pids = set(root_pids)
+        for pid in root_pids:
+            tree_pids.update(get_descendant_pids(pid))
+
+        rss = 0
+        cpu_seconds = {}
+        for pid in tree_pids:
+            rss += get_rss_bytes(pid)
+            cpu = get_cpu_seconds(pid)
+            if cpu is not None:
+                cpu_seconds[pid] = cpu
+
+        with self.__lock:
+            new_pids = {pid: get_start_time(pid) for pid in tree_pids if pid not in self.__pids}
+            self.__pids.update(new_pids)
+            if new_pids:
+                self.__write_registry(self.__pids)
+            for usage in self.__phases.values():
+                usage['peak_rss'] = max(usage['peak_rss'], rss)
+                for pid, cpu in cpu_seconds.items():
+                    usage['cpu_start'].setdefault(pid, cpu)
+                    usage['cpu_end'][pid] = cpu
+
+    def __sample_loop(self):
+        while not self.__stopped.wait(self.__SAMPLE_INTERVAL):
+            self.__sample()
+
+    @contextmanager
+    def phase(self, description):
+        thread_id = threading.get_ident()
+        with self.__lock:
+            self.__phases[thread_id] = {'peak_rss': 0, 'cpu_start': {}, 'cpu_end': {}, 'start': time.monotonic()}
+        self.__sample()
+        try:
+            yield
+        finally:
+            self.__sample()
+            with self.__lock:
+                usage = self.__phases.pop(thread_id)
+                cpu_seconds = sum(cpu - usage['cpu_start'][pid] for pid, cpu in usage['cpu_end'].items())
+                prev = self.phase_usage.get(description, {'peak_rss_mb': 0, 'cpu_seconds': 0, 'duration': 0})
+                self.phase_usage[description] = {
+                    'peak_rss_mb': max(prev['peak_rss_mb'], round(usage['peak_rss'] / 1024 ** 2)),
+                    'cpu_seconds': round(prev['cpu_seconds'] + cpu_seconds, 1),
+                    'duration': round(prev['duration'] + time.monotonic() - usage['start'], 1),
+                }
+
+    def reap(self):
+        """ Kills tracked processes that survived driver.quit() """
+        with self.__lock:
+            pids, self.__pids, self.__root_pids = self.__pids, {}, []
+            shared_pids, self.__shared_pids = self.__shared_pids, set()
+        # a shared browser and its children keep running for the other accounts, the watchdog only bounds the waits on it
+        # and CdpDriverFactory.shutdown closes it at exit
+        for pid in list(shared_pids):
+            shared_pids.update(get_descendant_pids(pid))
+        reaped_count = 0
+        for pid, start_time in pids.items():
+            if pid not in shared_pids and self.__is_same_process(pid, start_time):
+                kill_process_tree(pid)
+                reaped_count += 1
+        if reaped_count:
+            print(f'Reaped {reaped_count} browser processes that survived driver.quit()')
+        if os.path.exists(self.__registry_path):
+            os.remove(self.__registry_path)
+        return reaped_count
+
+    def stop(self):
+        self.__stopped.set()
+        self.reap()
+
+    def get_usage_str(self):
+        return 'Resources: ' + ', '.join(
+            f"{description} {usage['peak_rss_mb']}MB peak/{usage['cpu_seconds']}s cpu/{usage['duration']}s"
+            for description, usage in self.phase_usage.items()
+        )
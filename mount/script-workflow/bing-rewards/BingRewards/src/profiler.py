@@ -0,0 +1,78 @@
+"""
+Opt-in WebDriver command profiler.
+
+Every command sent by the driver (findElement, get, executeScript, getElementAttribute, switchToWindow, ...)
+is recorded with its latency, the Rewards methods on the call stack and the current phase.
+Produces a ranked hot command report and a folded stack dump for flamegraph.pl / speedscope
+"""
+import os
+import sys
+import threading
+from collections import defaultdict
+
+
+class CommandProfiler:
+    __REWARDS_FILE = os.path.join('src', 'rewards.py')
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        # (phase, rewards call stack, command) -> [count, total seconds, max seconds]
+        self.entries = defaultdict(lambda: [0, 0., 0.])
+        self.__lock = threading.Lock()
+
+    def __get_rewards_stack(self):
+        """ Rewards methods on the call stack, outermost first, with name mangling removed """
+        stack = []
+        frame = sys._getframe(2)
+        while frame is not None:
+            if frame.f_code.co_filename.endswith(self.__REWARDS_FILE):
+                stack.append(frame.f_code.co_name.replace('_Rewards__', '__'))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def record(self, command, duration):
+        phase = self.metrics.current_phase if self.metrics else None
+        key = (phase or '-', self.__get_rewards_stack(), command)
+        with self.__lock:
+            entry = self.entries[key]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+
+    def get_command_count(self):
+        return sum(entry[0] for entry in self.entries.values())
+
+    def get_report(self, top=30):
+        """ Commands ranked by total time, per calling Rewards method and phase """
+        by_caller = defaultdict(lambda: [0, 0., 0.])
+        for (phase, stack, command), (count, total, max_duration) in self.entries.items():
+            caller = stack[-1] if stack else '-'
+            entry = by_caller[(phase, caller, command)]
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], max_duration)
+
+        total_time = sum(entry[1] for entry in by_caller.values()) or 1
+        lines = [
+            f'{self.get_command_count()} WebDriver commands, {total_time:.1f}s total',
+            f'{"total s":>9} {"%":>5} {"calls":>6} {"avg ms":>8} {"max ms":>8}  phase / caller / command',
+        ]
+        ranked = sorted(by_caller.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for (phase, caller, command), (count, total, max_duration) in ranked:
+            lines.append(
+                f'{total:9.2f} {100 * total / total_time:5.1f} {count:6d} {1000 * total / count:8.1f} {1000 * max_duration:8.1f}  {phase} / {caller} / {command}'
+            )
+        return '\n'.join(lines)
+
+    def get_folded_stacks(self):
+        """ One `phase;method;...;command microseconds` line per unique stack, the flamegraph.pl input format """
+        return '\n'.join(
+            ';'.join((phase,) + stack + (command,)).replace(' ', '_') + f' {int(total * 1e6)}'
+            for (phase, stack, command), (_, total, _) in sorted(self.entries.items())
+        )
+
+    def write(self, report_path, folded_path):
+        with open(report_path, 'w') as f:
+            f.write(self.get_report() + '\n')
+        with open(folded_path, 'w') as f:
+            f.write(self.get_folded_stacks() + '\n')
@@ -0,0 +1,107 @@
+"""
+Host wide rate limiting: token buckets shared by every account, thread and process on the host.
+
+    limiter = RateLimiter.get('logs/rate_limits.sqlite3')
+    limiter.acquire(RateLimiter.TRENDS)
+
+The buckets live in a SQLite file, whose locking serializes processes.
+Each acquire reserves the next free slot of its bucket and sleeps until then, instead of polling:
+the host as a whole sends at most `rate` requests per second plus a burst of `capacity`,
+however many accounts run at once, rather than every process pacing itself as if it were alone.
+Without a path, the buckets are only shared within the process.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class RateLimiter:
+    TRENDS = 'trends'
+    BING_SEARCH = 'bing_search'
+    DASHBOARD = 'dashboard'
+
+    # name: (requests per second, burst)
+    BUCKETS = {
+        # Google Trends rejects more than one request every 20 seconds or so
+        TRENDS: (1 / 20, 1),
+        BING_SEARCH: (1., 3),
+        DASHBOARD: (.5, 3),
+    }
+    # seconds SQLite waits for another process holding the lock
+    DB_TIMEOUT = 30
+
+    __limiters = {}
+    __limiters_lock = threading.Lock()
+
+    def __init__(self, path=None, buckets=None, clock=time.time, sleep=time.sleep):
+        """
+        path: SQLite file shared by the processes, in memory if None
+        buckets: overrides of BUCKETS
+        clock: wall clock, monotonic clocks don't compare across processes
+        """
+        self.path = path
+        self.buckets = dict(self.BUCKETS, **(buckets or {}))
+        self.clock = clock
+        self.sleep = sleep
+        self.__lock = threading.Lock()
+        # name: (tokens, updated at), without a path
+        self.__state = {}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            db = self.__connect()
+            try:
+                db.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            finally:
+                db.close()
+
+    @classmethod
+    def get(cls, path):
+        """ Limiters are shared process wide by path """
+        with cls.__limiters_lock:
+            if path not in cls.__limiters:
+                cls.__limiters[path] = cls(path)
+            return cls.__limiters[path]
+
+    def __connect(self):
+        return sqlite3.connect(self.path, timeout=self.DB_TIMEOUT, isolation_level=None)
+
+    def __take(self, name, tokens, updated, now):
+        """ Tokens left once one is taken, and the seconds to wait for it. Tokens go negative for reserved slots """
+        rate, capacity = self.buckets[name]
+        if tokens is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, tokens + (now - updated) * rate)
+        tokens -= 1
+        return tokens, max(0., -tokens / rate)
+
+    def __reserve(self, name):
+        now = self.clock()
+        if not self.path:
+            with self.__lock:
+                tokens, updated = self.__state.get(name, (None, now))
+                tokens, wait = self.__take(name, tokens, updated, now)
+                self.__state[name] = (tokens, now)
+            return wait
+
+        db = self.__connect()
+        try:
+            # write lock up front, the read and update must not interleave with another process's
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT tokens, updated FROM buckets WHERE name = ?', (name,)).fetchone()
+            tokens, wait = self.__take(name, *(row or (None, now)), now)
+            db.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)', (name, tokens, now))
+            db.execute('COMMIT')
+        finally:
+            db.close()
+        return wait
+
+    def acquire(self, name, metrics=None):
+        """ Blocks until the bucket allows one more request, returns the seconds waited """
+        wait = self.__reserve(name)
+        if wait > 0:
+            if metrics:
+                metrics.increment(f'{name}_rate_limited')
+            self.sleep(wait)
+        return wait
@@ -0,0 +1,114 @@
+"""
+Retries with jittered exponential backoff and a total time budget, per operation policies,
+and circuit breakers that stop running a phase which keeps failing, across all accounts in the process.
+
+    result = retry('dashboard', DASHBOARD_POLICY, load_dashboard, metrics=metrics)
+
+Every retry is counted as a `<operation>_retries` metric, see src.metrics
+"""
+import random
+import threading
+import time
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=1., max_delay=30., budget=None, retry_on=(Exception,)):
+        """
+        max_attempts: attempts in total, including the first one
+        base_delay: seconds before the first retry, doubled for every further retry up to max_delay
+        budget: seconds, no retry is started that would end after the budget is spent
+        retry_on: exceptions worth retrying, anything else is raised right away
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retry_on = retry_on
+
+    def get_delay(self, retry_count):
+        """ 'Full jitter' backoff, so accounts retrying at the same time spread out """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry_count))
+
+
+def retry(operation, policy, func, *args, metrics=None, sleep=time.sleep, clock=time.monotonic, **kwargs):
+    """ Calls func until it returns, raising its last exception once the attempts or budget are spent """
+    start = clock()
+    for attempt in range(policy.max_attempts):
+        try:
+            return func(*args, **kwargs)
+        except policy.retry_on:
+            if attempt == policy.max_attempts - 1:
+                raise
+            delay = policy.get_delay(attempt)
+            if policy.budget is not None and clock() - start + delay > policy.budget:
+                raise
+        if metrics:
+            metrics.increment(f'{operation}_retries')
+        sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures, and lets a single trial through once `cooldown` seconds have passed.
+    Breakers are shared process wide by name, one failing account after another trips it for all of them
+    """
+    THRESHOLD = 3
+    COOLDOWN = 30 * 60
+
+    __breakers = {}
+    __breakers_lock = threading.Lock()
+
+    def __init__(self, name, threshold=THRESHOLD, cooldown=COOLDOWN, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        # when the half open breaker let its trial call through, None without one pending
+        self.trial_at = None
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name):
+        with cls.__breakers_lock:
+            if name not in cls.__breakers:
+                cls.__breakers[name] = cls(name)
+            return cls.__breakers[name]
+
+    @property
+    def is_open(self):
+        with self.__lock:
+            return self.opened_at is not None and self.clock() - self.opened_at < self.cooldown
+
+    def allow(self):
+        """ False while open. After the cooldown the breaker is half open, a single call is let through to test it """
+        with self.__lock:
+            if self.opened_at is None:
+                return True
+            now = self.clock()
+            if now - self.opened_at < self.cooldown:
+                return False
+            # the others wait for the trial's result, unless its caller never recorded one
+            if self.trial_at is not None and now - self.trial_at < self.cooldown:
+                return False
+            self.trial_at = now
+            return True
+
+    def record_success(self):
+        with self.__lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_at = None
+
+    def record_failure(self):
+        with self.__lock:
+            self.failures += 1
+            if self.trial_at is not None:
+                # the trial failed, open for another cooldown
+                self.opened_at = self.clock()
+                self.trial_at = None
+                print(f'\nCircuit breaker "{self.name}" trial failed, skipping it for {self.cooldown // 60} minutes')
+            elif self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = self.clock()
+                print(f'\nCircuit breaker "{self.name}" opened after {self.failures} consecutive failures, skipping it for {self.cooldown // 60} minutes')
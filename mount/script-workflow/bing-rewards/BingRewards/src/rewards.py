@@ -1,6 +1,18 @@
 from src.driver import ChromeDriverFactory
 from src.log import Completion
 from src.messengers import BaseMessenger
+from src.watchdog import Watchdog, WatchdogExpired
+from src.metrics import Metrics
+from src.endpoints import Endpoints
+from src.run_log import RunLog
+from src.retry import RetryPolicy, CircuitBreaker, retry
+from src.locators import SelectorRegistry
+from src.preflight import parse_dashboard, is_valid_punchcard, get_promotions
+from src.concurrency import ConcurrencyPolicy, SessionThread
+from src.search_progress import SearchProgress, install_balance_hook, read_balance
+from src.search_transport import SearchTransport
+from src.rate_limit import RateLimiter
+from src.task_planner import TaskPlanner
 import requests
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
@@ -10,31 +22,78 @@ from selenium.webdriver import ActionChains
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, NoAlertPresentException, UnexpectedAlertPresentException, JavascriptException
 import time
 import sys
+import threading
 import re
 import random
-from datetime import datetime, timedelta, date
+import itertools
+from datetime import timedelta, date
 import json
 import traceback
+from contextlib import ExitStack
 from requests.exceptions import HTTPError
 from typing import List
 
 
-class Rewards:
-    __LOGIN_URL = "https://login.live.com/"
-    __BING_URL = "https://bing.com"
-    __DASHBOARD_URL = "https://rewards.bing.com/"
+class QuizNotStartedError(Exception):
+    pass
+
+
+def get_trending_queries(trends_url, geo):
+    """ Shuffled search terms from Google Trends daily trends of a random recent day. Raises HTTPError """
+    search_terms = set()
+    trends_dict = {
+        "hl": 'en',
+        "ed": str(
+            (date.today() - timedelta(days=random.randint(1, 20))).strftime(
+                "%Y%m%d"
+            )
+        ),
+        "geo": geo,
+        "ns": 15,
+    }
+
+    resp = requests.get(trends_url, params=trends_dict)
+    resp.raise_for_status()
+
+    data = json.loads(resp.text.lstrip(")]}\',\n"))
+    for topic in data["default"]["trendingSearchesDays"][0][
+        "trendingSearches"
+    ]:
+        search_terms.add(topic["title"]["query"].lower())
+        for related_topic in topic["relatedQueries"]:
+            search_terms.add(related_topic["query"].lower())
+    search_terms = list(search_terms)
+    random.shuffle(search_terms)
+    return search_terms
 
+
+class Rewards:
     __WEB_DRIVER_WAIT_LONG = 30
     __WEB_DRIVER_WAIT_SHORT = 5
 
-    __SYS_OUT_TAB_LEN = 8
-    __SYS_OUT_PROGRESS_BAR_LEN = 30
+    __MAX_WATCHDOG_RELAUNCHES = 2
+    # an offer still not completed after this many attempts today is skipped, i.e it crashed the browser each time
+    __MAX_OFFER_ATTEMPTS = 2
+
+    # retry policies, see src.retry
+    __DASHBOARD_RETRY = RetryPolicy(max_attempts=4, base_delay=1, max_delay=8, budget=60, retry_on=(TimeoutException, NoSuchElementException, ValueError))
+    __QUIZ_PROGRESS_RETRY = RetryPolicy(max_attempts=5, base_delay=.25, max_delay=2, budget=10)
+    __START_QUIZ_RETRY = RetryPolicy(max_attempts=3, base_delay=2, max_delay=6, budget=45, retry_on=(QuizNotStartedError,))
+    # search progress that stalls, the page is refreshed between attempts
+    __SEARCH_STALL_RETRY = RetryPolicy(max_attempts=4, base_delay=1, max_delay=4)
+    # seconds between searches
+    __SEARCH_DELAY = (2, 4.5)
+    # wait between the web device tasks and mobile search
+    MOBILE_SEARCH_DELAY = 180
+    # undetected_chromedriver patches the driver binary on launch, launches sharing it (no workspace copy) take turns
+    __LAUNCH_LOCK = threading.Lock()
+
     cookieclearquiz = 0
     _ON_POSIX = 'posix' in sys.builtin_module_names
 
     messengers: List[BaseMessenger]
 
-    def __init__(self, email, password, debug=True, headless=True, cookies=False, driver_factory=ChromeDriverFactory, nosandbox=False, google_trends_geo='US', messengers=None):
+    def __init__(self, email, password, debug=True, headless=True, cookies=False, driver_factory=ChromeDriverFactory, nosandbox=False, google_trends_geo='US', messengers=None, shared_browser=None, watchdog=None, supervisor=None, workspace=None, metrics=None, profiler=None, endpoints=None, run_log=None, selectors=None, session_store=None, answer_cache=None, promotion_catalog=None, concurrency=None, search_transport=None, rate_limiter=None, task_planner=None):
         self.email = email
         self.password = password
         self.debug = debug
@@ -42,71 +101,107 @@ class Rewards:
         self.cookies = cookies
         self.nosandbox = nosandbox
         self.completion = Completion()
-        self.stdout = []
+        # bounded log of this run, formatted and printed by its sink, see src.run_log
+        self.run_log = run_log if run_log is not None else RunLog(email)
         self.search_hist = []
+        # src.log.CheckpointJsonLog of today's progress, from the completion passed to complete_search_type
+        self.checkpoint = None
         self.__queries = []
         self.driver_factory = driver_factory
         self.google_trends_geo = google_trends_geo
         self.messengers = messengers if messengers is not None else []
-
-    def __get_sys_out_prefix(self, lvl, end):
-        prefix = " " * (self.__SYS_OUT_TAB_LEN * (lvl - 1) - (lvl - 1))
-        if not end:
-            return prefix + ">" * lvl + " "
-        else:
-            return prefix + " " * int(
-                self.__SYS_OUT_TAB_LEN / 2
-            ) + "<" * lvl + " "
+        # multi-tenant mode: run inside an isolated context of a browser shared with other accounts
+        self.shared_browser = shared_browser
+        # optional src.watchdog.Watchdog bounding every WebDriver command and phase
+        self.watchdog = watchdog
+        # optional src.processes.ProcessSupervisor accounting for and reaping browser processes
+        self.supervisor = supervisor
+        # optional src.workspace.Workspace, per account profile and artifacts
+        self.workspace = workspace
+        self.screenshot_path = workspace.screenshot_path if workspace else "error.png"
+        # timed spans and counters of this run, see src.metrics
+        self.metrics = metrics if metrics is not None else Metrics(email)
+        # optional src.profiler.CommandProfiler recording every WebDriver command
+        self.profiler = profiler
+        self.endpoints = endpoints if endpoints is not None else Endpoints()
+        # ranked alternative locators of the elements looked up, see src.locators
+        self.selectors = selectors if selectors is not None else SelectorRegistry()
+        # optional src.preflight.SessionStore, the dashboard session is saved there for the next run's pre-flight
+        self.session_store = session_store
+        # optional src.log.QuizAnswerJsonLog, quiz answers verified by accounts of the same market
+        self.answer_cache = answer_cache
+        # optional src.log.PromotionCatalogJsonLog, today's promotions of the market and how to solve them
+        self.promotion_catalog = promotion_catalog
+        # src.concurrency.ConcurrencyPolicy, browsers the account may drive at once
+        self.concurrency = concurrency if concurrency is not None else ConcurrencyPolicy()
+        # src.search_transport.SearchTransport, typing queries or navigating to their results per device type
+        self.search_transport = search_transport if search_transport is not None else SearchTransport()
+        # src.rate_limit.RateLimiter pacing trends, search and dashboard requests of all accounts on the host
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.get(None)
+        # src.task_planner.TaskPlanner ordering the remaining tasks by points per second, within the time left until the reset
+        self.task_planner = task_planner if task_planner is not None else TaskPlanner()
+        # browser launched ahead of the run by src.prewarm, on the login page, used by the first launch of its device
+        self.prewarmed_driver = None
+        # called once the tasks are done and only the stats are left, i.e to pre-warm the next account
+        self.on_tail = None
+        # offer title -> offer id (promotion name) of today's dashboard, the key of the offer in the answer cache
+        self.__offer_ids = {}
 
     def __sys_out(self, msg, lvl, end=False, flush=False):
-        #to avoid UnicodeEncodeErrors
-        msg = msg.encode('ascii', 'ignore').decode('ascii')
         if self.debug:
-            if flush:  # because of progress bar
-                print("")
-            out = "{0}{1}{2}".format(
-                self.__get_sys_out_prefix(lvl, end), msg,
-                "\n" if lvl == 1 and end else ""
-            )
-            print(out)
-            if len(self.stdout) > 0 and self.stdout[-1].startswith("\r"):
-                self.stdout[-1] = self.stdout[-1][2:]
-            self.stdout.append(out)
+            self.run_log.message(msg, lvl, end, flush)
 
     def __sys_out_progress(self, current_progress, complete_progress, lvl):
         if self.debug:
-            ratio = float(current_progress) / complete_progress
-            current_bars = int(ratio * self.__SYS_OUT_PROGRESS_BAR_LEN)
-            needed_bars = self.__SYS_OUT_PROGRESS_BAR_LEN - current_bars
-            out = "\r{0}Progress: [{1}] {2}/{3} ({4}%)".format(
-                self.__get_sys_out_prefix(lvl, False),
-                "#" * current_bars + " " * needed_bars, current_progress,
-                complete_progress, int(ratio * 100)
-            )
-            sys.stdout.write(out)
-            sys.stdout.flush()
-            if self.stdout[-1].startswith(
-                "\r"
-            ):  # dont need to check size of array before accessing element because progress never comes first
-                self.stdout[-1] = out
-            else:
-                self.stdout.append(out)
+            self.run_log.progress(current_progress, complete_progress, lvl)
+
+    def __find(self, name, timeout=0, condition=SelectorRegistry.PRESENT, **fmt):
+        return self.selectors.find(self.driver, name, timeout, condition, metrics=self.metrics, **fmt)
+
+    def __wait_for_url(self, timeout, *fragments):
+        """ Until the url contains any of the fragments, on navigation events with the CDP driver """
+        if hasattr(self.driver, 'wait_for_url'):
+            self.driver.wait_for_url(lambda url: any(fragment in url for fragment in fragments), timeout)
+        else:
+            WebDriverWait(self.driver, timeout).until(EC.any_of(*(EC.url_contains(fragment) for fragment in fragments)))
+
+    def __wait_for_element(self, by, value, timeout, clickable=False):
+        """ The element once visible (and enabled if clickable), pushed by the page with the CDP driver """
+        if hasattr(self.driver, 'wait_for'):
+            return self.driver.wait_for(by, value, timeout, visible=True)
+        condition = EC.element_to_be_clickable if clickable else EC.visibility_of_element_located
+        return WebDriverWait(self.driver, timeout).until(condition((by, value)))
+
+    def __script_click(self, element):
+        """ Click dispatched from within the page, the CDP driver's clicks already are """
+        if hasattr(self.driver, 'wait_for'):
+            element.click()
+        else:
+            self.driver.execute_script('arguments[0].scrollIntoView({block: "center"}); arguments[0].click();', element)
+
+    def __drag_and_drop(self, source, target):
+        """ Mouse drag of source onto target, dispatched as input events by the CDP driver """
+        if hasattr(self.driver, 'drag_and_drop'):
+            self.driver.drag_and_drop(source, target)
+        else:
+            ActionChains(self.driver).drag_and_drop(source, target).perform()
+
+    def __find_within(self, parent, name):
+        return self.selectors.find_within(parent, name, metrics=self.metrics)
 
     def __check_login_url(self, url):
         #made it to the home page! login complete
-        if "https://account.microsoft.com/" in url:
+        if self.endpoints.account in url:
             return True
 
-        elif "https://login.live.com/ppsecure" in url:
+        elif self.endpoints.login_ppsecure in url:
             # approve sign in page
             try:
-                WebDriverWait(self.driver, .5).until(
-                    EC.element_to_be_clickable((By.ID, 'idChkBx_SAOTCAS_TD'))
-                ).click()
+                self.__find('approve_sign_in', .5, SelectorRegistry.CLICKABLE).click()
                 message = "Waiting for user to approve sign-in request. In Microsoft Authenticator, please select approve."
                 self.__sys_out(message, 2)
                 for messenger in self.messengers:
-                    messenger.send_message(message)
+                    messenger.send_message(message, self.screenshot_path)
 
             except TimeoutException:
                 pass
@@ -114,30 +209,22 @@ class Rewards:
             #'stay signed in' page
             finally:
                 try:
-                    WebDriverWait(self.driver, 30).until(
-                        EC.element_to_be_clickable((By.ID, 'KmsiCheckboxField'))
-                    ).click()
+                    self.__find('stay_signed_in', 30, SelectorRegistry.CLICKABLE).click()
                 except TimeoutException:
-                    self.driver.save_screenshot("error.png")
+                    self.driver.save_screenshot(self.screenshot_path)
                     print('\nIssue logging in, please run in -nhl mode to see the problem\n')
                     raise
                 #yes, stay signed in
-                self.driver.find_element(By.XPATH, '//*[@id="idSIButton9"]').click()
+                self.__find('stay_signed_in_yes').click()
 
         #'agree to terms and conditions' page
         elif "https://account.live.com/tou" in url:
-            WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                EC.url_contains("https://account.live.com/tou")
-            )
-            WebDriverWait(self.driver, 2).until(
-                EC.element_to_be_clickable((By.ID, 'iNext'))
-            ).click()
+            self.__wait_for_url(self.__WEB_DRIVER_WAIT_SHORT, "https://account.live.com/tou")
+            self.__find('terms_next', 2, SelectorRegistry.CLICKABLE).click()
 
         #'Is your security info still accurate?' page
         elif "https://account.live.com/proofs/remind" in url:
-            WebDriverWait(self.driver, 2).until(
-                EC.element_to_be_clickable((By.ID, 'iLooksGood'))
-            ).click()
+            self.__find('security_info_looks_good', 2, SelectorRegistry.CLICKABLE).click()
 
         #'confirm identity' or 'recover account' page
         elif "identity/confirm" in url or "/recover" in url:
@@ -145,58 +232,55 @@ class Rewards:
                 message = f"Waiting for user to approve 2FA, please approve in Microsoft Authenticator"
                 self.__sys_out(message, 2)
                 for messenger in self.messengers:
-                    messenger.send_message(message)
-                WebDriverWait(self.driver, 60).until(
-                    EC.url_contains("https://login.live.com/ppsecure")
-                )
+                    messenger.send_message(message, self.screenshot_path)
+                self.__wait_for_url(60, self.endpoints.login_ppsecure)
             except TimeoutException:
-                self.driver.save_screenshot("error.png")
+                self.driver.save_screenshot(self.screenshot_path)
                 raise RuntimeError(
                     "Must confirm account identity by signing in manually first. Please login again with your Microsoft account in Google Chrome."
                 )
 
         # 2FA page: login url doesn't change
-        elif url == self.__LOGIN_URL:
+        elif url == self.endpoints.login:
             # standard 2FA page
             try:
-                authenticator_code = self.driver.find_element(By.ID, "idRemoteNGC_DisplaySign").text
+                authenticator_code = self.__find('authenticator_code').text
                 message = f"Waiting for user to approve 2FA, please select {authenticator_code} in Microsoft Authenticator"
                 self.__sys_out(message, 2)
                 for messenger in self.messengers:
-                    messenger.send_message(message)
-                WebDriverWait(self.driver, 30).until(
-                    EC.url_contains("https://login.live.com/ppsecure")
-                )
+                    messenger.send_message(message, self.screenshot_path)
+                self.__wait_for_url(30, self.endpoints.login_ppsecure)
             except NoSuchElementException:
-                self.driver.save_screenshot("error.png")
+                self.driver.save_screenshot(self.screenshot_path)
                 raise RuntimeError(f"Unable to handle {url}")
             except TimeoutException:
-                self.driver.save_screenshot("error.png")
+                self.driver.save_screenshot(self.screenshot_path)
                 raise TimeoutException("You did not select code within Microsoft Authenticator in time.")
 
         else:
-            self.driver.save_screenshot("error.png")
+            self.driver.save_screenshot(self.screenshot_path)
             raise RuntimeError(url+" Made it to an unrecognized page during login process.")
         # login process not complete yet
         return False
 
     def __login(self):
+        with self.metrics.span('login'):
+            self.__login_steps()
+
+    def __login_steps(self):
         self.__sys_out("Logging in", 2)
 
-        self.driver.get(self.__LOGIN_URL)
-        ActionChains(self.driver).send_keys(
-            self.email, Keys.RETURN
-        ).perform()
+        # a pre-warmed browser is already there
+        if not self.driver.current_url.startswith(self.endpoints.login):
+            self.driver.get(self.endpoints.login)
+        # type into the focused field, works with both the Selenium and the CDP driver
+        self.driver.switch_to.active_element.send_keys(self.email, Keys.RETURN)
 
         #login with credentials
         try:
-            WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                EC.visibility_of_element_located((By.ID, "i0118"))
-            ).send_keys(self.password, Keys.RETURN)
+            self.__find('password', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.VISIBLE).send_keys(self.password, Keys.RETURN)
         except:
-            ActionChains(self.driver).send_keys(
-                self.password, Keys.RETURN
-            ).perform()
+            self.driver.switch_to.active_element.send_keys(self.password, Keys.RETURN)
 
         is_login_complete = False
         while not is_login_complete:
@@ -210,37 +294,37 @@ class Rewards:
         #        f"Logged in, but user not located in one of these valid markets: {VALID_MARKETS}."
         #    )
 
-    def __open_dashboard(self, try_count=0):
+    def __open_dashboard_once(self):
         """
         Opens dashboard url
         Checks that the url is correct
         And all the offer elements are loaded
         """
-        max_try_count = 3
-        self.driver.get(self.__DASHBOARD_URL)
+        self.rate_limiter.acquire(RateLimiter.DASHBOARD, self.metrics)
+        self.driver.get(self.endpoints.dashboard)
+
+        #check the url
+        self.__wait_for_url(
+            self.__WEB_DRIVER_WAIT_SHORT,
+            "https://rewards.microsoft.com/?redref", "https://rewards.microsoft.com/", "https://rewards.bing.com/",
+            self.endpoints.dashboard,
+        )
+        # need to sign in via welcome page first
+        if 'welcome' in self.driver.current_url:
+            self.__find('dashboard_sign_in').click()
 
+        #wait for offers to load completely
+        self.__find('daily_set_offer', self.__WEB_DRIVER_WAIT_SHORT, index=1)
+
+    def __with_dashboard_retry(self, func):
         try:
-            #check the url
-            WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                # 'any_of' checks for either condition
-                EC.any_of(
-                    EC.url_contains("https://rewards.microsoft.com/?redref"),
-                    EC.url_contains("https://rewards.microsoft.com/"),                    
-                    EC.url_contains("https://rewards.bing.com/"),                    
-                )
-            )
-            # need to sign in via welcome page first
-            if 'welcome' in self.driver.current_url:
-                self.driver.find_element(By.XPATH, '//*[@id="raf-signin-link-id"]').click()
-
-            #wait for offers to load completely
-            offer_xpath = '//*[@id="daily-sets"]/mee-card-group[1]/div/mee-card[1]/div/card-content/mee-rewards-daily-set-item-content/div/a'
-            WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(EC.presence_of_element_located((By.XPATH, offer_xpath)))
-        except (TimeoutException, NoSuchElementException) as e:
-            if try_count == max_try_count:
-                self.driver.save_screenshot("error.png")
-                raise(e)
-            self.__open_dashboard(try_count + 1)
+            return retry('dashboard', self.__DASHBOARD_RETRY, func, metrics=self.metrics)
+        except (TimeoutException, NoSuchElementException):
+            self.driver.save_screenshot(self.screenshot_path)
+            raise
+
+    def __open_dashboard(self):
+        self.__with_dashboard_retry(self.__open_dashboard_once)
 
     def find_between(self, s: str, first: str, last: str) -> str:
         try:
@@ -250,22 +334,18 @@ class Rewards:
         except ValueError:
             return ""
 
+    def __load_dashboard_data(self):
+        self.metrics.increment('dashboard_loads')
+        self.__open_dashboard_once()
+        # ValueError if the data is missing, json.JSONDecodeError is a ValueError too
+        dashboard = parse_dashboard(self.driver.find_element(By.XPATH, '/html/body').get_attribute('innerHTML'))
+        available_points = dashboard.get('userStatus', {}).get('availablePoints')
+        if isinstance(available_points, int):
+            self.metrics.observe_points(available_points)
+        return dashboard
+
     def get_dashboard_data(self):
-        max_try_count = 3
-        for try_count in range(1, max_try_count + 1):
-            self.__open_dashboard()
-            dashboard = self.find_between(
-                self.driver.find_element(By.XPATH, '/html/body').get_attribute('innerHTML'),
-                "var dashboard = ",
-                ";\n        appDataModule.constant(\"prefetchedDashboard\", dashboard);"
-            )
-            try:
-                dashboard = json.loads(dashboard)
-                return dashboard
-            except (json.decoder.JSONDecodeError, ValueError):
-                print(f'\nJSONDecodeError try_count {try_count}')
-                if try_count == (max_try_count):
-                    raise
+        return self.__with_dashboard_retry(self.__load_dashboard_data)
 
     def __get_search_progress(self, search_type):
         if len(self.driver.window_handles) == 1:  # open new tab
@@ -292,200 +372,219 @@ class Rewards:
         complete_progress = counters[search_key][search_index]['pointProgressMax']
 
         self.driver.switch_to_first_tab()
-        return current_progress, complete_progress
-
-    def __update_search_queries(self, last_request_time):
-        if last_request_time:
-            time.sleep(
-                max(
-                    0, 20 - (datetime.now() - last_request_time).total_seconds()
-                )
-            )  # sleep at least 20 seconds to avoid over requesting server
-
-        trends_url = "https://trends.google.com/trends/api/dailytrends"
-        search_terms = set()
-        trends_dict = {
-            "hl": 'en',
-            "ed": str(
-                (date.today() - timedelta(days=random.randint(1, 20))).strftime(
-                    "%Y%m%d"
-                )
-            ),
-            "geo": self.google_trends_geo,
-            "ns": 15,
-        }
+        return SearchProgress(current_progress, complete_progress, user_status['availablePoints'])
 
-        resp = requests.get(trends_url, params=trends_dict)
-        if resp.status_code != 200:
+    def __update_search_queries(self):
+        # shared by all accounts on the host, to avoid over requesting server
+        self.rate_limiter.acquire(RateLimiter.TRENDS, self.metrics)
+        try:
+            self.__queries = get_trending_queries(self.endpoints.trends, self.google_trends_geo)
+        except HTTPError:
             self.__sys_out("Bad response from Google Trends API: most likely the API does not like the `geo` argument that was specified.\n", 2)
-            resp.raise_for_status()
-
-        data = json.loads(resp.text.lstrip(")]}\',\n"))
-        for topic in data["default"]["trendingSearchesDays"][0][
-            "trendingSearches"
-        ]:
-            search_terms.add(topic["title"]["query"].lower())
-            for related_topic in topic["relatedQueries"]:
-                search_terms.add(related_topic["query"].lower())
-        search_terms = list(search_terms)
-        random.shuffle(search_terms)
-        self.__queries = search_terms
-
-        last_request_time = datetime.now()
-        return last_request_time
+            raise
 
-    def __search(self, search_type):
+    def set_search_queries(self, queries):
+        """ Queries fetched ahead of the run, i.e by src.prewarm """
+        self.__queries = list(queries)
+
+    def __get_next_query(self):
+        """ A query not searched yet today """
+        while True:
+            if len(self.__queries) > 0:
+                query = self.__queries[0]
+                self.__queries = self.__queries[1:]
+            else:
+                self.__update_search_queries()
+                continue
+            if query not in self.search_hist:
+                return query
+
+    def __add_query(self, query):
+        self.search_hist.append(query)
+        if self.checkpoint:
+            self.checkpoint.add_query(query)
+        self.metrics.increment('queries')
+
+    def __submit_query_form(self, query, is_first):
+        #chromedriver 98+, special characters fail
+        query = re.sub(r"[^a-zA-Z0-9\s]", "", query)
+        #avoid UnicodeEncodeError when later writing to log
+        query = query.encode('ascii', 'ignore').decode('ascii')
+
+        search_box = self.__find('search_box', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.VISIBLE)
+        search_box.clear()
+        self.rate_limiter.acquire(RateLimiter.BING_SEARCH, self.metrics)
+        search_box.send_keys(query, Keys.RETURN)  # unique search term
+        self.__add_query(query)
+        time.sleep(random.uniform(*self.__SEARCH_DELAY))
+
+        if is_first:
+            try:
+                self.__find('cookie_accept', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.CLICKABLE).click()
+            except TimeoutException:
+                pass
 
-        def clean_query(query):
-            #chromedriver 98+, special characters fail
-            query = re.sub(r"[^a-zA-Z0-9\s]", "", query)
-            #avoid UnicodeEncodeError when later writing to log
-            query = query.encode('ascii', 'ignore').decode('ascii')
-            return query
+        self.__handle_alerts()
 
+    def __submit_query_urls(self, queries):
+        for _ in queries:
+            self.rate_limiter.acquire(RateLimiter.BING_SEARCH, self.metrics)
+        SearchTransport.submit(self.driver, self.endpoints.bing, queries, *self.__SEARCH_DELAY)
+        for query in queries:
+            self.__add_query(query)
+        time.sleep(random.uniform(*self.__SEARCH_DELAY))
+
+    def __search(self, search_type):
         self.__sys_out("Starting search", 2)
-        self.driver.get(self.__BING_URL)
+        install_balance_hook(self.driver)
+        self.driver.get(self.endpoints.bing)
 
-        cookieclear = 0
+        transport = self.search_transport.get(self.driver.device)
+        typed_query_count = 0
         prev_progress = -1
         try_count = 0
 
-        last_request_time = None
         if len(self.__queries) == 0:
-            last_request_time = self.__update_search_queries(
-                last_request_time
-            )
+            self.__update_search_queries()
+        progress = None
         while True:
-            progress = self.__get_search_progress(search_type)
-            if not progress:
-                return False
+            # the dashboard is read to start with, when the results page shows no points earned and to verify it at the end
+            if progress is None or not progress.update(read_balance(self.driver)) or progress.is_complete:
+                progress = self.__get_search_progress(search_type)
+                if not progress:
+                    return False
             else:
-                current_progress, complete_progress = progress
+                self.metrics.increment('search_progress_page_reads')
+            current_progress, complete_progress = progress.current_progress, progress.complete_progress
             if complete_progress > 0:
                 self.__sys_out_progress(current_progress, complete_progress, 3)
-            if current_progress == complete_progress:
+            if progress.is_complete:
                 break
+            # searches after the reset count towards the next day, which the next run starts afresh
+            seconds_left = self.task_planner.get_seconds_left()
+            if seconds_left is not None and seconds_left <= 0:
+                self.__sys_out("Stopping search, the daily reset is due", 2, True, True)
+                return False
             elif current_progress == prev_progress:
                 try_count += 1
-                self.driver.refresh()
-                if try_count == 4:
+                if try_count == self.__SEARCH_STALL_RETRY.max_attempts:
                     self.__sys_out("Failed to complete search", 2, True, True)
                     return False
+                self.metrics.increment('search_stall_retries')
+                # results pages navigated to may not be counted, type the queries instead
+                if transport == SearchTransport.URL:
+                    self.__sys_out("Searches by URL are not counted, typing them instead", 3)
+                    self.metrics.increment('search_transport_fallbacks')
+                    transport = SearchTransport.FORM
+                    self.driver.get(self.endpoints.bing)
+                else:
+                    self.driver.refresh()
                 # handle mobile blank search-bar bug
-                elif try_count >= 2:
+                if try_count >= 2:
                     self.driver.refresh()
-                    time.sleep(2)
+                    time.sleep(self.__SEARCH_STALL_RETRY.get_delay(try_count))
             else:
                 prev_progress = current_progress
                 try_count = 0
 
-            search_box = WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(EC.visibility_of_element_located((By.ID, "sb_form_q")))
-            search_box.clear()
-
-            # send query
-            while True:
-                if len(self.__queries) > 0:
-                    query = self.__queries[0]
-                    self.__queries = self.__queries[1:]
-                else:
-                    last_request_time = self.__update_search_queries(
-                        last_request_time
-                    )
-                    continue
-                if query not in self.search_hist:
-                    break
-
-            query = clean_query(query)
-            search_box.send_keys(query, Keys.RETURN)  # unique search term
-            self.search_hist.append(query)
-            time.sleep(random.uniform(2, 4.5))
-
-            if cookieclear == 0:
-                try:
-                    WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                        EC.element_to_be_clickable((By.ID, "bnp_btn_accept"))
-                    ).click()
-                except TimeoutException:
-                    pass
-                cookieclear = 1
-
-            self.__handle_alerts()
+            if transport == SearchTransport.URL:
+                queries = []
+                # the batch also has to be fetched before the reset
+                timeouts = [timeout for timeout in (self.watchdog.command_timeout if self.watchdog else None, seconds_left) if timeout is not None]
+                batch_size = self.search_transport.get_batch_size(
+                    complete_progress - current_progress, self.__SEARCH_DELAY[1], min(timeouts) if timeouts else None
+                )
+                for _ in range(batch_size):
+                    queries.append(self.__get_next_query())
+                self.__submit_query_urls(queries)
+            else:
+                query = self.__get_next_query()
+                self.__submit_query_form(query, is_first=typed_query_count == 0)
+                typed_query_count += 1
         self.__sys_out("Successfully completed search", 2, True, True)
         return True
 
-    def __get_quiz_progress(self, try_count=0):
+    def __read_quiz_progress(self):
+        questions = self.driver.find_elements(By.XPATH,
+            '//*[starts-with(@id, "rqQuestionState")]'
+        )
+        if len(questions) > 0:
+            current_progress, complete_progress = 0, len(questions)
+            for question in questions:
+                if question.get_attribute("class") == "filledCircle":
+                    current_progress += 1
+                else:
+                    break
+            return current_progress - 1, complete_progress
+        else:
+            footer = self.driver.find_element(By.XPATH,
+                '//*[@id="FooterText0"]'
+            ).text
+            current_progress = footer[0]
+            complete_progress = footer[-1]
+            return current_progress, complete_progress
+
+    def __get_quiz_progress(self):
         try:
-            questions = self.driver.find_elements(By.XPATH,
-                '//*[starts-with(@id, "rqQuestionState")]'
-            )
-            if len(questions) > 0:
-                current_progress, complete_progress = 0, len(questions)
-                for question in questions:
-                    if question.get_attribute("class") == "filledCircle":
-                        current_progress += 1
-                    else:
-                        break
-                return current_progress - 1, complete_progress
-            else:
-                footer = self.driver.find_element(By.XPATH,
-                    '//*[@id="FooterText0"]'
-                ).text
-                current_progress = footer[0]
-                complete_progress = footer[-1]
-                return current_progress, complete_progress
+            return retry('quiz_progress', self.__QUIZ_PROGRESS_RETRY, self.__read_quiz_progress, metrics=self.metrics)
+        except Exception:
+            return 0, -1
 
-        except:
-            if try_count < 4:
-                return self.__get_quiz_progress(try_count + 1)
-            else:
-                return 0, -1
+    def __try_start_quiz(self):
+        try:
+            start_quiz = self.__find('quiz_start', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.VISIBLE)
+        #if quiz doesn't have a rStartQuiz element, it doesn't need to be prepped
+        except TimeoutException:
+            return
+        if start_quiz.is_displayed():
+            try:
+                start_quiz.click()
+            except:
+                self.driver.refresh()
+                time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
+        else:
+            try:
+                if self.driver.find_element(By.ID,
+                    "quizWelcomeContainer"
+                ).get_attribute("style") == "display: none;":  # started
+                    self.__sys_out("Successfully started quiz", 3, True)
+                    return
+            except:
+                self.driver.refresh()
+                time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
+        # check again whether it started
+        raise QuizNotStartedError
 
     def __start_quiz(self):
         # check for cookies
         try:
-            WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                EC.element_to_be_clickable((By.ID, "bnp_btn_accept"))
-            ).click()
+            self.__find('cookie_accept', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.CLICKABLE).click()
         except TimeoutException:
             pass
 
-        try_count = 0
-        while True:
-            try:
-                start_quiz = WebDriverWait(
-                    self.driver, self.__WEB_DRIVER_WAIT_SHORT
-                ).until(
-                    EC.visibility_of_element_located((By.ID, 'rqStartQuiz'))
-                )
-            #if quiz doesn't have a rStartQuiz element, it doesn't need to be prepped
-            except TimeoutException:
-                return True
-            if start_quiz.is_displayed():
-                try:
-                    start_quiz.click()
-                except:
-                    self.driver.refresh()
-                    time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
-            else:
-                try:
-                    if self.driver.find_element(By.ID,
-                        "quizWelcomeContainer"
-                    ).get_attribute("style") == "display: none;":  # started
-                        self.__sys_out("Successfully started quiz", 3, True)
-                        break
-                except:
-                    self.driver.refresh()
-                    time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
-
-            try_count += 1
-            if try_count == 3:
-                self.__sys_out("Failed to start quiz", 3, True)
-                return False
-            time.sleep(3)
-
+        try:
+            retry('start_quiz', self.__START_QUIZ_RETRY, self.__try_start_quiz, metrics=self.metrics)
+        except QuizNotStartedError:
+            self.__sys_out("Failed to start quiz", 3, True)
+            return False
         return True
 
-    def __multiple_answers(self):
+    def __get_cached_answers(self, answer_key, question):
+        """
+        Answers another account verified for this question, tried before the others
+        """
+        if not self.answer_cache or not answer_key:
+            return []
+        answers = self.answer_cache.get_answers(answer_key, question)
+        if answers:
+            self.metrics.increment('quiz_answer_cache_hits')
+        return answers
+
+    def __add_cached_answer(self, answer_key, question, answer):
+        if self.answer_cache and answer_key:
+            self.answer_cache.add_answer(answer_key, question, answer)
+
+    def __multiple_answers(self, answer_key=None):
         """
         A type of quiz with overlay that have multple questions (usually 3), and within each question, the user must select x amount of correct answers (usually 5). Examples of this type of question are warpspeed and supersonic quizzes
         """
@@ -514,10 +613,12 @@ class Rewards:
 
             #within the question, select the correct multiple answers
             try:
-                option_index = 0
                 question_progress = '0/5'
                 question_progresses = [question_progress]
-                while True:
+                # verified answers first, then every option in order
+                cached_options = self.__get_cached_answers(answer_key, quiz_current_progress)
+                option_indexes = itertools.chain(cached_options, (i for i in itertools.count() if i not in cached_options))
+                for option_index in option_indexes:
                     if (
                         len(
                             self.driver.find_elements(
@@ -527,20 +628,20 @@ class Rewards:
                         <= 0
                     ):
                         return False
-                    #find_element_by_id returns an EventFiringWebElement object, to get the web element, must use wrapped_element attribute
                     element = self.driver.find_element(By.ID,
                         'rqAnswerOption{0}'.format(option_index)
-                    ).wrapped_element
-                    #must use ActionChains due to error 'element is not clickable at point', for more info see this link:https://stackoverflow.com/questions/11908249/debugging-element-is-not-clickable-at-point-error
-                    ActionChains(self.driver).move_to_element(element).click(
-                        element
-                    ).perform()
+                    )
+                    # a native click fails with 'element is not clickable at point', see https://stackoverflow.com/questions/11908249/debugging-element-is-not-clickable-at-point-error
+                    self.__script_click(element)
                     time.sleep(random.uniform(1, 4))
                     prev_progress = question_progress
                     #returns a string like '1/5' (1 out of 5 answers selected correctly so far)
                     question_progress = self.driver.find_element(By.CLASS_NAME,
                         'bt_corOpStat'
                     ).text
+                    # the count of correct answers changed
+                    if question_progress != prev_progress:
+                        self.__add_cached_answer(answer_key, quiz_current_progress, option_index)
                     #once the last correct answer is clicked, question progress becomes '' or 5/5, tho in the past it became '0/5' sometimes, hence 2nd cond
                     if question_progress in ['', '5/5'] or (
                         prev_progress != question_progress
@@ -550,7 +651,6 @@ class Rewards:
                         time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
                         break
                     question_progresses.append(question_progress)
-                    option_index += 1
             except:
                 return False
 
@@ -568,7 +668,7 @@ class Rewards:
         try_count = 0
         while True:
             try:
-                progress = WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_LONG).until(EC.visibility_of_element_located((By.CLASS_NAME, 'bt_Quefooter'))).text
+                progress = self.__find('this_or_that_progress', self.__WEB_DRIVER_WAIT_LONG, SelectorRegistry.VISIBLE).text
                 #delimter is 'of' for EN and 'di' for IT
                 progress_delimiter = f"{progress.split(' ')[-2]}"
                 current_question, complete_progress = map(int, progress.split(progress_delimiter))
@@ -577,11 +677,11 @@ class Rewards:
 
                 answer_encode_key = self.driver.execute_script("return _G.IG")
 
-                answer1 = self.driver.find_element(By.ID, "rqAnswerOption0")
+                answer1 = self.__find('quiz_answer_option', index=0)
                 answer1_title = answer1.get_attribute('data-option')
                 answer1_code = get_answer_code(answer_encode_key, answer1_title)
 
-                answer2 = self.driver.find_element(By.ID, "rqAnswerOption1")
+                answer2 = self.__find('quiz_answer_option', index=1)
 
                 correct_answer_code = self.driver.execute_script("return _w.rewardsQuizRenderInfo.correctAnswer")
 
@@ -593,7 +693,7 @@ class Rewards:
                 time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
                 if current_question == complete_progress:
                     try:
-                        header = WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_LONG).until(EC.visibility_of_element_located((By.CLASS_NAME, 'headerMessage_Refresh')))
+                        header = self.__find('this_or_that_header', self.__WEB_DRIVER_WAIT_LONG, SelectorRegistry.VISIBLE)
                         if "you earned" in header.text.lower():
                             self.__sys_out_progress(
                                 complete_progress, complete_progress, 4
@@ -622,32 +722,72 @@ class Rewards:
             self.__sys_out("Failed to complete Hot Takes", 3, True, True)
             return False
 
-    def __quiz(self):
+    def __detect_quiz_type(self):
+        if len(self.driver.find_elements(By.ID, 'rqAnswerOptionNum0')) > 0:
+            return 'drag_and_drop'
+        elif len(self.driver.find_elements(By.CLASS_NAME, 'btCorOps')) > 0:
+            return 'multiple_answers'
+        elif len(self.driver.find_elements(By.CLASS_NAME, 'btOptionAnsOvl')) > 0:
+            return 'this_or_that'
+        elif len(self.driver.find_elements(By.ID, 'btPollOverlay')) > 0:
+            return 'hot_take'
+        return 'multiple_choice'
+
+    @staticmethod
+    def __get_option_id(option):
+        """ Identifies a drag and drop answer whatever its position """
+        return option.get_attribute('data-option') or option.text
+
+    @staticmethod
+    def __swap(option_ids, from_index, to_index):
+        """ Order of the answers once the options at from_index and to_index are swapped """
+        option_ids = list(option_ids)
+        option_ids[from_index], option_ids[to_index] = option_ids[to_index], option_ids[from_index]
+        return option_ids
+
+    @staticmethod
+    def __get_order_swaps(option_ids, orders):
+        """ Next swap towards the first cached order of these answers, [] if none is of these answers """
+        for order in orders:
+            if sorted(order) != sorted(option_ids):
+                continue
+            for to_index, option_id in enumerate(order):
+                if option_ids[to_index] != option_id:
+                    return [(option_ids.index(option_id), to_index)]
+        return []
+
+    def __get_quiz_type(self, promotion):
+        """
+        From the promotion catalog if another account already solved it, shared by __solve once the quiz is solved
+        """
+        if self.promotion_catalog and promotion:
+            quiz_type = self.promotion_catalog.get(promotion).get('quiz_type')
+            if quiz_type:
+                self.metrics.increment('promotion_catalog_hits')
+                return quiz_type
+        return self.__detect_quiz_type()
+
+    def __quiz(self, promotion=None, answer_key=None):
+        """
+        promotion: title of the offer or punch card activity, its key in the promotion catalog
+        answer_key: offer id of the offer or punch card activity (its title if unknown), its key in the answer cache
+        """
         started = self.__start_quiz()
         if not started:
             return started
 
         quiz_options_len = 4
-        is_drag_and_drop = False
-        is_tot = False
-        is_hot_take = False
-        is_multiple_answers = False
-
-        if len(self.driver.find_elements(By.ID, 'rqAnswerOptionNum0')) > 0:
-            is_drag_and_drop = True
+        quiz_type = self.__get_quiz_type(promotion)
+        self.__quiz_type = quiz_type
+        if quiz_type == 'drag_and_drop':
             self.__sys_out("Drag and drop", 3)
-        elif len(self.driver.find_elements(By.CLASS_NAME, 'btCorOps')) > 0:
-            is_multiple_answers = True
+        elif quiz_type == 'multiple_answers':
             self.__sys_out("Multiple Answers", 3)
-        elif len(self.driver.find_elements(By.CLASS_NAME, 'btOptionAnsOvl')) > 0:
-            is_tot = True
-        elif len(self.driver.find_elements(By.ID, 'btPollOverlay')) > 0:
-            is_hot_take = True
-        else:
+        elif quiz_type == 'multiple_choice':
             self.__sys_out("Multiple choice", 3)
 
         # drag and drop
-        if is_drag_and_drop:
+        if quiz_type == 'drag_and_drop':
             time.sleep(self.__WEB_DRIVER_WAIT_SHORT)  # let demo complete
 
             # get all possible combinations
@@ -659,6 +799,7 @@ class Rewards:
 
             prev_progress = -1
             incorrect_options = []
+            option_ids = []
             from_option_index, to_option_index = -1, -1
             while True:
                 current_progress, complete_progress = self.__get_quiz_progress()
@@ -667,21 +808,15 @@ class Rewards:
                         current_progress, complete_progress, 4
                     )
 
-                # get all correct combinations so to not use them again
+                # answers in their current order, and the positions already correct so to not use them again
+                prev_option_ids = option_ids
+                option_ids = []
                 correct_options = []
                 option_index = 0
                 while option_index < quiz_options_len:
                     try:
-                        option = WebDriverWait(
-                            self.driver, self.__WEB_DRIVER_WAIT_LONG
-                        ).until(
-                            EC.visibility_of_element_located(
-                                (
-                                    By.ID,
-                                    "rqAnswerOption{0}".format(option_index)
-                                )
-                            )
-                        )
+                        option = self.__find('quiz_answer_option', self.__WEB_DRIVER_WAIT_LONG, SelectorRegistry.VISIBLE, index=option_index)
+                        option_ids.append(self.__get_option_id(option))
                         if option.get_attribute(
                             "class"
                         ) == "rqOption rqDragOption correctAnswer":
@@ -692,6 +827,9 @@ class Rewards:
                         return False
 
                 if current_progress != prev_progress:  # new question
+                    # the last swap completed the previous question, share the order it left
+                    if from_option_index >= 0:
+                        self.__add_cached_answer(answer_key, prev_progress, self.__swap(prev_option_ids, from_option_index, to_option_index))
                     incorrect_options = []
                     prev_progress = current_progress
                 else:
@@ -704,53 +842,27 @@ class Rewards:
                     )
 
                 exit_code = -1  # no choices were swapped
-                for combo in to_from_combos:
+                # swaps towards the order verified by another account first
+                cached_combos = self.__get_order_swaps(option_ids, self.__get_cached_answers(answer_key, current_progress))
+                for combo in cached_combos + to_from_combos:
                     from_option_index, to_option_index = combo[0], combo[1]
                     # check if combination has already been tried
                     if combo not in incorrect_options and from_option_index not in correct_options and to_option_index not in correct_options:
                         # drag from option to to option
-                        from_option = WebDriverWait(
-                            self.driver, self.__WEB_DRIVER_WAIT_LONG
-                        ).until(
-                            EC.visibility_of_element_located(
-                                (
-                                    By.ID, "rqAnswerOption{0}".
-                                    format(from_option_index)
-                                )
-                            )
-                        )
-                        to_option = WebDriverWait(
-                            self.driver, self.__WEB_DRIVER_WAIT_LONG
-                        ).until(
-                            EC.visibility_of_element_located(
-                                (
-                                    By.ID,
-                                    "rqAnswerOption{0}".format(to_option_index)
-                                )
-                            )
-                        )
-                        ActionChains(self.driver).drag_and_drop(
-                            from_option, to_option
-                        ).perform()
+                        from_option = self.__find('quiz_answer_option', self.__WEB_DRIVER_WAIT_LONG, SelectorRegistry.VISIBLE, index=from_option_index)
+                        to_option = self.__find('quiz_answer_option', self.__WEB_DRIVER_WAIT_LONG, SelectorRegistry.VISIBLE, index=to_option_index)
+                        self.__drag_and_drop(from_option, to_option)
                         time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
 
                         if current_progress == complete_progress - 1:  # last question
                             try:
-                                header = WebDriverWait(
-                                    self.driver, self.__WEB_DRIVER_WAIT_SHORT
-                                ).until(
-                                    EC.visibility_of_element_located(
-                                        (
-                                            By.XPATH,
-                                            '//*[@id="quizCompleteContainer"]/div'
-                                        )
-                                    )
-                                )
+                                header = self.__find('quiz_complete_header', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.VISIBLE)
                                 #if header.text == "Way to go!":
                                 if "great job" in header.text.lower():
                                     self.__sys_out_progress(
                                         complete_progress, complete_progress, 4
                                     )
+                                    self.__add_cached_answer(answer_key, current_progress, self.__swap(option_ids, from_option_index, to_option_index))
                                     exit_code = 0  # successfully completed
                                     break
                             except:
@@ -768,14 +880,14 @@ class Rewards:
                     break
 
         #multiple answers per question (i.e. warp speed/supersonic)
-        elif is_multiple_answers:
-            return self.__multiple_answers()
+        elif quiz_type == 'multiple_answers':
+            return self.__multiple_answers(answer_key)
 
         #this or that quiz
-        elif is_tot:
+        elif quiz_type == 'this_or_that':
             return self.__solve_tot()
 
-        elif is_hot_take:
+        elif quiz_type == 'hot_take':
             return self.__solve_hot_take()
 
         # multiple choice (i.e. lignting speed)
@@ -789,6 +901,8 @@ class Rewards:
                 if complete_progress > 0:
                     #selected the correct answer
                     if current_progress != prev_progress:
+                        if prev_options:
+                            self.__add_cached_answer(answer_key, prev_progress, prev_options[-1])
                         self.__sys_out_progress(
                             current_progress, complete_progress, 4
                         )
@@ -807,16 +921,7 @@ class Rewards:
 
                 if current_progress == complete_progress - 1:  # last question, works for -1, 0 too (already complete)
                     try:
-                        header = WebDriverWait(
-                            self.driver, self.__WEB_DRIVER_WAIT_SHORT
-                        ).until(
-                            EC.visibility_of_element_located(
-                                (
-                                    By.XPATH,
-                                    '//*[@id="quizCompleteContainer"]/div'
-                                )
-                            )
-                        )
+                        header = self.__find('quiz_complete_header', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.VISIBLE)
                         #if header.text == "Way to go!":
                         finish_msg = header.text.lower()
                         if "you earned" in finish_msg or 'great job' in finish_msg:
@@ -825,6 +930,8 @@ class Rewards:
                                     prev_complete_progress,
                                     prev_complete_progress, 4
                                 )
+                                if prev_options:
+                                    self.__add_cached_answer(answer_key, current_progress, prev_options[-1])
                                 break
                             else:
                                 self.__sys_out(
@@ -834,8 +941,8 @@ class Rewards:
                     except:
                         pass
 
-                # select choice
-                for option_index in range(quiz_options_len):
+                # select choice, verified answers first
+                for option_index in self.__get_cached_answers(answer_key, current_progress) + list(range(quiz_options_len)):
                     if option_index not in prev_options:
                         break
                 if option_index in prev_options:
@@ -847,11 +954,7 @@ class Rewards:
 
                 try:
                     # click choice
-                    WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_LONG).until(
-                        EC.element_to_be_clickable(
-                            (By.ID, "rqAnswerOption{0}".format(option_index))
-                        )
-                    ).click()
+                    self.__find('quiz_answer_option', self.__WEB_DRIVER_WAIT_LONG, SelectorRegistry.CLICKABLE, index=option_index).click()
                     prev_options.append(option_index)
                     time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
                 except TimeoutException:
@@ -861,21 +964,17 @@ class Rewards:
         self.__sys_out("Successfully completed quiz", 3, True, True)
         return True
 
-    def __quiz2(self):
+    def __quiz2(self, answer_key=None):
+        """
+        answer_key: its key in the answer cache, the option that got each question through is tried first
+        """
         self.__sys_out("Starting quiz2 (no overlay)", 3)
         current_progress, complete_progress = 0, -1
 
         while current_progress != complete_progress:
             try:
-                progress = WebDriverWait(
-                    self.driver, self.__WEB_DRIVER_WAIT_SHORT
-                ).until(
-                    EC.visibility_of_element_located(
-                        (
-                            By.XPATH, '//*[@id="QuestionPane{}"]/div[2]'.
-                            format(current_progress)
-                        )
-                    )
+                progress = self.__wait_for_element(
+                    By.XPATH, '//*[@id="QuestionPane{}"]/div[2]'.format(current_progress), self.__WEB_DRIVER_WAIT_SHORT
                 ).text
             except TimeoutException:
                 self.__sys_out("Could not find quiz2 progress elements", 3)
@@ -891,44 +990,30 @@ class Rewards:
                 return False
             self.__sys_out_progress(current_progress - 1, complete_progress, 4)
             time.sleep(random.uniform(1, 3))
-            self.driver.find_elements(By.CLASS_NAME, 'wk_Circle')[random.randint(
-                0, 2
-            )].click()
+            question = current_progress
+            cached_options = self.__get_cached_answers(answer_key, question)
+            option_index = cached_options[0] if cached_options else random.randint(0, 2)
+            self.driver.find_elements(By.CLASS_NAME, 'wk_Circle')[option_index].click()
             time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
 
             is_clicked, try_count = False, 0
             #sometimes the 'next' button isn't clickable and page needs to be refreshed
             while not is_clicked:
                 if len(self.driver.find_elements(By.CLASS_NAME, 'cbtn')) > 0:
-                    WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'cbtn'))
-                    ).click()
+                    self.__wait_for_element(By.CLASS_NAME, 'cbtn', self.__WEB_DRIVER_WAIT_SHORT, clickable=True).click()
                 elif len(self.driver.find_elements(By.CLASS_NAME, 'wk_button')) > 0:
-                    WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                        EC.element_to_be_clickable(
-                            (By.CLASS_NAME, 'wk_button')
-                        )
-                    ).click()
+                    self.__wait_for_element(By.CLASS_NAME, 'wk_button', self.__WEB_DRIVER_WAIT_SHORT, clickable=True).click()
                 elif len(self.driver.find_elements(By.ID, 'check')) > 0:
-                    WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                        EC.element_to_be_clickable((By.ID, 'check'))
-                    ).click()
+                    self.__wait_for_element(By.ID, 'check', self.__WEB_DRIVER_WAIT_SHORT, clickable=True).click()
                 else:
                     self.__sys_out("Failed to complete quiz2", 3, True, True)
                     return False
 
                 try:
                     if current_progress != complete_progress:
-                        WebDriverWait(self.driver, 5).until(
-                            EC.visibility_of_element_located(
-                                (
-                                    By.XPATH,
-                                    '//*[@id="QuestionPane{}"]/div[2]'.
-                                    format(current_progress)
-                                )
-                            )
-                        ).text
+                        self.__wait_for_element(By.XPATH, '//*[@id="QuestionPane{}"]/div[2]'.format(current_progress), 5)
                     is_clicked = True
+                    self.__add_cached_answer(answer_key, question, option_index)
 
                 except:
                     #implies one of the next buttons was found, but wasn't able to click it
@@ -945,22 +1030,13 @@ class Rewards:
         self.__sys_out("Successfully completed quiz2", 3, True, True)
         return True
 
-    def __poll(self, title):
+    def __poll(self):
         self.__sys_out("Starting poll", 3)
         time.sleep(self.__WEB_DRIVER_WAIT_SHORT)
 
-        #for daily poll
-        if 'daily' in title:
-            element_id = 'btoption{0}'.format(random.randint(0, 1))
-        #all other polls
-        else:
-            #xpath = '//*[@id="OptionText0{}"]'.format(random.randint(0, 1))
-            element_id = 'OptionText0{0}'.format(random.randint(0, 1))
-
+        #daily polls have btoption ids, all other polls OptionText0 ids, both are probed
         try:
-            WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                EC.element_to_be_clickable((By.ID, element_id))
-            ).click()
+            self.__find('poll_option', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.CLICKABLE, index=random.randint(0, 1)).click()
             self.__sys_out("Successfully completed poll", 3, True)
             return True
         except TimeoutException:
@@ -1003,12 +1079,48 @@ class Rewards:
                     return False
                 time.sleep(2)
 
+    def __get_solver(self, title, is_quiz=False):
+        """
+        'poll', 'quiz' (with overlay), 'quiz2' (without) or 'urlreward' (opening the page earns the points).
+        From the promotion catalog if another account already solved it, detected on the page otherwise
+        """
+        entry = self.promotion_catalog.get(title) if self.promotion_catalog else {}
+        if entry.get('solver'):
+            self.metrics.increment('promotion_catalog_hits')
+            if entry['solver'] in ('quiz', 'quiz2'):
+                self.__sys_out("Starting quiz", 3)
+            return entry['solver']
+        if not is_quiz:
+            if "poll" in title.lower():
+                return 'poll'
+            if entry.get('type') == 'urlreward':
+                return 'urlreward'
+        return 'quiz' if self.__has_overlay() else 'quiz2'
+
+    def __solve(self, title, solver, offer_id=None):
+        self.__quiz_type = None
+        answer_key = offer_id or title
+        if solver == 'poll':
+            completed = self.__poll()
+        elif solver == 'urlreward':
+            completed = True
+        elif solver == 'quiz':
+            completed = self.__quiz(title, answer_key)
+        else:
+            completed = self.__quiz2(answer_key)
+        # only a solver that worked is worth sharing, detection can be fooled by a page still loading
+        if completed is True and self.promotion_catalog:
+            if self.__quiz_type:
+                self.promotion_catalog.update(title, solver=solver, quiz_type=self.__quiz_type)
+            else:
+                self.promotion_catalog.update(title, solver=solver)
+        return completed
+
     def __check_offer_status(self, offer):
         # check whether it was already completed
         checked = False
         try:
-            checked_xpath = './mee-rewards-points/div/div/span[1]'
-            icon = offer.find_element(By.XPATH, checked_xpath)
+            icon = self.__find_within(offer, 'offer_status_icon')
             if icon.get_attribute('class').startswith(
                 "mee-icon mee-icon-SkypeCircleCheck"
             ):
@@ -1019,17 +1131,26 @@ class Rewards:
         return checked
 
     def __click_offer(self, offer):
-        title_xpath = './div[2]/h3'
-        title = offer.find_element(By.XPATH, title_xpath).text
+        title = self.__find_within(offer, 'offer_title').text
         self.__sys_out("Trying {0}".format(title), 2)
 
         completed = True
-        checked = self.__check_offer_status(offer)
+        if self.checkpoint and self.checkpoint.is_offer_verified(title):
+            checked = True
+        else:
+            checked = self.__check_offer_status(offer)
 
         if checked:
             self.__sys_out("Already completed, or no points offered", 2, True)
 
+        elif self.checkpoint and self.checkpoint.get_offer_attempts(title) >= self.__MAX_OFFER_ATTEMPTS:
+            self.__sys_out(f"Already attempted {self.checkpoint.get_offer_attempts(title)} times today, skipping", 2, True)
+            completed = False
+
         else:
+            self.metrics.increment('offers_attempted')
+            if self.checkpoint:
+                self.checkpoint.add_offer_attempt(title)
             offer.click()
             self.driver.switch_to_last_tab()
             #Check for cookies popup - UK thing
@@ -1037,9 +1158,7 @@ class Rewards:
 
                 self.__sys_out("Checking cookies popup", 3)
                 try:
-                    WebDriverWait(self.driver, self.__WEB_DRIVER_WAIT_SHORT).until(
-                        EC.element_to_be_clickable((By.ID, "bnp_btn_accept"))
-                    ).click()
+                    self.__find('cookie_accept', self.__WEB_DRIVER_WAIT_SHORT, SelectorRegistry.CLICKABLE).click()
                     self.__sys_out("cookie popup cleared", 3)
                     self.cookieclearquiz = 1
                 except TimeoutException:
@@ -1048,16 +1167,8 @@ class Rewards:
 
             if self.__is_offer_sign_in_bug():
                 completed = -1
-
-            elif "poll" in title.lower():
-                completed = self.__poll(title.lower())
-
-            #if "quiz" in title.lower()
             else:
-                if self.__has_overlay():
-                    completed = self.__quiz()
-                else:
-                    completed = self.__quiz2()
+                completed = self.__solve(title, self.__get_solver(title), self.__offer_ids.get(title))
 
             if completed == -1:
                 self.__sys_out(
@@ -1084,34 +1195,35 @@ class Rewards:
         self.__open_dashboard()
         title_to_offer = {}
         for i in range(3):
-            offer = self.driver.find_element(By.XPATH,
-                '//*[@id="daily-sets"]/mee-card-group[1]/div/mee-card[{}]/div/card-content/mee-rewards-daily-set-item-content/div/a'
-                .format(i + 1)
-            )
-            title = offer.find_element(By.XPATH, './div[2]/h3').text
+            offer = self.__find('daily_set_offer', index=i + 1)
+            title = self.__find_within(offer, 'offer_title').text
             title_to_offer[title + str(i)] = offer
 
         for i in range(30):
             try:
-                offer = self.driver.find_element(By.XPATH,
-                    '//*[@id="more-activities"]/div/mee-card[{}]/div/card-content/mee-rewards-more-activities-card-item/div/a'
-                    .format(i + 1)
-                )
-                title = offer.find_element(By.XPATH, './div[2]/h3').text
+                offer = self.__find('more_activities_offer', index=i + 1)
+                title = self.__find_within(offer, 'offer_title').text
                 title_to_offer[title + str(i)] = offer
                 i += 1
             except NoSuchElementException:
                 pass
         return title_to_offer
 
-    def __perform_action_on_offers(self, action, offer_xpath, completed, offer_count):
+    def __verify_offer(self, offer):
+        checked = self.__check_offer_status(offer)
+        if checked and self.checkpoint:
+            try:
+                self.checkpoint.set_offer_verified(self.__find_within(offer, 'offer_title').text)
+            except NoSuchElementException:
+                pass
+        return checked
+
+    def __perform_action_on_offers(self, action, offer_name, completed, offer_count):
         for i in range(offer_count):
             #always start on first tab in case prev offer errored out
             self.driver.switch_to_first_tab()
             self.driver.close_other_tabs()
-            offer = self.driver.find_element(By.XPATH,
-                offer_xpath.format(offer_index=i + 1)
-            )
+            offer = self.__find(offer_name, index=i + 1)
 
             # don't crash program if an offer fails
             try:
@@ -1119,9 +1231,7 @@ class Rewards:
                 # sign in bug- try one more time
                 if c == -1:
                     #need to reobtain element, else stale
-                    offer = self.driver.find_element(By.XPATH,
-                        offer_xpath.format(offer_index=i + 1)
-                    )
+                    offer = self.__find(offer_name, index=i + 1)
                     c = action(offer)
                 completed.append(c)
             except (NoSuchElementException, TimeoutException):
@@ -1130,27 +1240,27 @@ class Rewards:
 
     def __offers(self):
         # showcase offer
-        self.__open_dashboard()
+        dashboard = self.get_dashboard_data()
+        promotions = get_promotions(dashboard) or []
+        self.__offer_ids = {promotion['title']: promotion['name'] for promotion in promotions if promotion.get('title') and promotion.get('name')}
+        if self.promotion_catalog:
+            self.promotion_catalog.add_promotions(promotions)
 
         #daily set
-        daily_sets_xpath = '//*[@id="daily-sets"]/mee-card-group[1]/div/mee-card[{offer_index}]/div/card-content/mee-rewards-daily-set-item-content/div/a'
-        self.__perform_action_on_offers(self.__click_offer, daily_sets_xpath, [], offer_count=3)
+        self.__perform_action_on_offers(self.__click_offer, 'daily_set_offer', [], offer_count=3)
 
         # remaining offers
-        remaining_offer_count = len(self.driver.find_elements(By.XPATH,
-            '//*[@id="more-activities"]/div/mee-card'
-        ))
-        more_activities_xpath = '//*[@id="more-activities"]/div/mee-card[{offer_index}]/div/card-content/mee-rewards-more-activities-card-item/div/a'
-        self.__perform_action_on_offers(self.__click_offer, more_activities_xpath, [], offer_count=remaining_offer_count)
+        remaining_offer_count = len(self.selectors.find_all(self.driver, 'more_activities_card', metrics=self.metrics))
+        self.__perform_action_on_offers(self.__click_offer, 'more_activities_offer', [], offer_count=remaining_offer_count)
 
         completed = []
         # check offers status after all offers have been tried
-        self.__perform_action_on_offers(self.__check_offer_status, daily_sets_xpath, completed, offer_count=3)
-        self.__perform_action_on_offers(self.__check_offer_status, more_activities_xpath, completed, offer_count=remaining_offer_count)
+        self.__perform_action_on_offers(self.__verify_offer, 'daily_set_offer', completed, offer_count=3)
+        self.__perform_action_on_offers(self.__verify_offer, 'more_activities_offer', completed, offer_count=remaining_offer_count)
 
         return min(completed)
 
-    def __punchcard_activity(self, parent_url, childPromotions):
+    def __punchcard_activity(self, parent_url, childPromotions, punchcard_title=None):
         """
         Each punch card has multiple activities.
         Completes the latest punch card activity.
@@ -1158,6 +1268,14 @@ class Rewards:
         for activity_index, activity in enumerate(childPromotions):
             if activity['complete'] is False:
                 activity_title = activity['title']
+                # the dashboard says whether it is complete, retry a failed attempt like offers are
+                attempts = self.checkpoint.get_punchcard_activity_attempts(punchcard_title, activity_index) if self.checkpoint else 0
+                if attempts >= self.__MAX_OFFER_ATTEMPTS:
+                    self.__sys_out(f'Activity "{activity_title}" was already attempted {attempts} times today', 2)
+                    break
+                if self.checkpoint:
+                    self.checkpoint.add_punchcard_activity_attempt(punchcard_title, activity_index)
+                self.metrics.increment('punchcard_activities_attempted')
                 self.__sys_out(f'Starting activity "{activity_title}"', 2)
                 if activity['promotionType'] == "quiz":
                     activity_url = activity['attributes']['destination']
@@ -1170,10 +1288,7 @@ class Rewards:
                         )
                         self.driver.get(activity_url)
 
-                    if self.__has_overlay():
-                        self.__quiz()
-                    else:
-                        self.__quiz2()
+                    self.__solve(activity_title, self.__get_solver(activity_title, is_quiz=True), activity.get('name'))
 
                 elif activity['promotionType'] == "urlreward":
                     self.driver.get(parent_url)
@@ -1203,18 +1318,7 @@ class Rewards:
         punchcards = self.get_dashboard_data()['punchCards']
 
         for punchcard_index, punchcard in enumerate(punchcards):
-            valid_offer_types = ('quiz', 'urlreward')
-            try:
-                #get punch card offer types
-                punchcard_offer_types = punchcard['parentPromotion']['attributes']['type'].split(',')
-            except (KeyError, TypeError):
-                punchcard_offer_types = [None]
-
-            # Check if valid punchcard
-            if punchcard.get('parentPromotion') \
-            and all(punchcard_offer_type in valid_offer_types for punchcard_offer_type in punchcard_offer_types) \
-            and punchcard['parentPromotion'].get('pointProgressMax', 0) != 0 \
-            and punchcard.get('childPromotions'):
+            if is_valid_punchcard(punchcard):
                 has_valid_punch = True
                 parent_url = punchcard['parentPromotion']['attributes']['destination']
                 title = punchcard['parentPromotion']['attributes']['title']
@@ -1223,7 +1327,7 @@ class Rewards:
                 if not is_complete_punchcard:
                     self.__sys_out(f'Punch card "{title}" is not complete yet.', 2)
                     #complete latest punch card activity
-                    activity_index = self.__punchcard_activity(parent_url, punchcard['childPromotions'])
+                    activity_index = self.__punchcard_activity(parent_url, punchcard['childPromotions'], title)
                     is_complete_activity = self.get_dashboard_data()['punchCards'][punchcard_index]['childPromotions'][activity_index]['complete']
                     if is_complete_activity:
                         self.__sys_out('Latest punch card activity successfully completed!', 3)
@@ -1239,7 +1343,7 @@ class Rewards:
 
         self.driver.get(parent_url)
         try:
-            punchcard_progress = WebDriverWait(self.driver, 3).until(EC.presence_of_element_located((By.XPATH, "//div[@class='punchcard-completion-row']"))).text
+            punchcard_progress = self.__find('punchcard_progress', 3).text
         except TimeoutException:
             self.__sys_out('Could not obtain overall punchcard progress, assuming punchcard failed to complete.', 2)
             return False
@@ -1284,11 +1388,30 @@ class Rewards:
             error_msg = traceback.format_exc()
             self.__sys_out(f'Error checking rewards status -\n {error_msg}', 1)
 
+    @classmethod
+    def launch_driver(cls, driver_factory, device_type, headless, cookies, nosandbox, workspace=None):
+        """ A new browser, also launched ahead of a run by src.prewarm """
+        if workspace:
+            return driver_factory.get_driver(device_type, headless, cookies, nosandbox, workspace=workspace)
+        with cls.__LAUNCH_LOCK:
+            return driver_factory.get_driver(device_type, headless, cookies, nosandbox)
+
     def __get_driver(self, device_type):
         try:
-            self.driver = self.driver_factory.get_driver(
-                device_type, self.headless, self.cookies, self.nosandbox
-            )
+            if self.prewarmed_driver is not None and self.prewarmed_driver.device == device_type:
+                self.driver, self.prewarmed_driver = self.prewarmed_driver, None
+            elif self.shared_browser:
+                self.driver = self.shared_browser.new_context(device_type)
+            else:
+                self.driver = self.launch_driver(
+                    self.driver_factory, device_type, self.headless, self.cookies, self.nosandbox, self.workspace
+                )
+            if self.profiler:
+                self.driver.enable_profiling(self.profiler)
+            if self.watchdog:
+                self.watchdog.watch(self.driver)
+            if self.supervisor:
+                self.supervisor.track(self.driver)
             self.__login()
         except:
             try:
@@ -1300,33 +1423,107 @@ class Rewards:
     def __get_available_points(self):
         return self.get_dashboard_data()['userStatus']['availablePoints']
 
+    def __save_session(self):
+        # the dashboard is open, its cookies are what the pre-flight needs
+        try:
+            self.session_store.save(self.driver.get_cookies())
+        except OSError:
+            self.__sys_out("Could not save the session for the next pre-flight", 2)
+
+    def __phase(self, description):
+        """ Context of a phase for metrics, the optional watchdog and process supervisor """
+        stack = ExitStack()
+        stack.enter_context(self.metrics.span(description))
+        if self.watchdog:
+            stack.enter_context(self.watchdog.phase(description))
+        if self.supervisor:
+            stack.enter_context(self.supervisor.phase(description))
+        return stack
+
+    def __relaunch_driver(self, device_type):
+        try:
+            self.driver.quit()
+        except Exception:  # processes were killed by the watchdog
+            pass
+        self.__get_driver(device_type)
+
+    def __launch(self, device_type):
+        """ The first browser of the run, relaunched like in __complete_action when the watchdog expires """
+        relaunch_count = 0
+        while True:
+            try:
+                with self.__phase('launch'):
+                    self.__get_driver(device_type)
+                    # the expiry may have been swallowed by a bare except within the login
+                    if self.watchdog and self.watchdog.expired:
+                        raise WatchdogExpired(self.watchdog.expired)
+                return
+            except WatchdogExpired as e:
+                if relaunch_count == self.__MAX_WATCHDOG_RELAUNCHES:
+                    self.__sys_out(f'Error during launch, giving up after {relaunch_count} browser relaunches:\n {e}', 1)
+                    raise
+                relaunch_count += 1
+                self.__sys_out(f'{e}. Relaunching browser', 1)
+                try:
+                    self.driver.quit()
+                except Exception:  # never launched, or killed by the watchdog
+                    pass
+
     def __complete_action(self, action, description, mandatory_device_type=None, **action_kwargs):
         self.__sys_out(f"Starting {description}", 1)
 
-        try:
-            if mandatory_device_type and mandatory_device_type != self.driver.device:
-                self.driver.quit()
-                self.__get_driver(mandatory_device_type)
-            completion = action(**action_kwargs)
-            if completion:
-                self.__sys_out(f"Successfully completed {description}", 1, True)
-            else:
-                self.__sys_out(f"Failed to complete {description}", 1, True)
-
-        except (TimeoutException, NoSuchElementException, HTTPError):
-            error_msg = traceback.format_exc()
-            self.__sys_out(f'Error during {description}:\n {error_msg}', 1)
+        # shared by all accounts in this process, opened by phases that keep erroring out
+        breaker = CircuitBreaker.get(description)
+        if not breaker.allow():
+            self.metrics.increment('circuit_open_skips')
+            self.__sys_out(f"Skipping {description}, it keeps failing for other accounts", 1, True)
             return False
 
-        except:
-            print(self.driver.current_url)
+        relaunch_count = 0
+        while True:
             try:
-                self.driver.quit()
-            except AttributeError:  # not yet initialized
-                pass
-            raise
+                with self.__phase(description):
+                    if relaunch_count:
+                        self.__relaunch_driver(mandatory_device_type or self.driver.device)
+                    elif mandatory_device_type and mandatory_device_type != self.driver.device:
+                        self.driver.quit()
+                        self.__get_driver(mandatory_device_type)
+                    completion = action(**action_kwargs)
+                    # the expiry may have been swallowed by a bare except within the action
+                    if self.watchdog and self.watchdog.expired:
+                        raise WatchdogExpired(self.watchdog.expired)
+                if completion:
+                    self.__sys_out(f"Successfully completed {description}", 1, True)
+                else:
+                    self.__sys_out(f"Failed to complete {description}", 1, True)
+
+            except WatchdogExpired as e:
+                if relaunch_count == self.__MAX_WATCHDOG_RELAUNCHES:
+                    self.__sys_out(f'Error during {description}, giving up after {relaunch_count} browser relaunches:\n {e}', 1)
+                    breaker.record_failure()
+                    return False
+                relaunch_count += 1
+                self.__sys_out(f'{e}. Relaunching browser and resuming {description}', 1)
+                continue
+
+            except (TimeoutException, NoSuchElementException, HTTPError):
+                error_msg = traceback.format_exc()
+                self.__sys_out(f'Error during {description}:\n {error_msg}', 1)
+                breaker.record_failure()
+                return False
+
+            except:
+                breaker.record_failure()
+                print(self.driver.current_url)
+                try:
+                    self.driver.quit()
+                except AttributeError:  # not yet initialized
+                    pass
+                raise
 
-        return completion
+            # only errors trip the breaker, not completing can be account specific i.e a punch card too early
+            breaker.record_success()
+            return completion
 
     def __complete_edge_search(self):
         action_kwargs = {'search_type': 'edge'}
@@ -1378,31 +1575,134 @@ class Rewards:
         self.__complete_web_search()
         self.__complete_mobile_search()
 
-    def complete_remaining_searches(self, search_type, prev_completion):
+    @staticmethod
+    def __is_mobile_search_after_web_device(search_type, prev_completion):
+        """ Whether the remaining tasks include mobile search and something to do on the web device before it """
+        if search_type == 'all':
+            return True
+        return search_type == 'remaining' and not prev_completion.is_mobile_search_completed() and (
+            not prev_completion.is_web_device_completed() or not prev_completion.is_edge_search_completed()
+        )
 
-        is_search_all = search_type == 'all'
-        if not prev_completion.is_edge_search_completed() or is_search_all:
-            self.__complete_edge_search()
-        if not prev_completion.is_web_search_completed() or is_search_all:
-            self.__complete_web_search()
-        if not prev_completion.is_punchcard_completed() or is_search_all:
-            self.__complete_punchcard()
-        if not prev_completion.is_offers_completed() or is_search_all:
-            self.__complete_offers()
-        time.sleep(180)
-        if not prev_completion.is_mobile_search_completed() or is_search_all:
+    def __get_mobile_session(self):
+        """ A second session of this account, without the profile and workspace the first browser has open """
+        watchdog = Watchdog(self.watchdog.command_timeout, self.watchdog.phase_budget) if self.watchdog else None
+        session = Rewards(
+            self.email, self.password, debug=self.debug, headless=self.headless, cookies=False,
+            driver_factory=self.driver_factory, nosandbox=self.nosandbox, google_trends_geo=self.google_trends_geo,
+            messengers=self.messengers, shared_browser=self.shared_browser, watchdog=watchdog, supervisor=self.supervisor,
+            metrics=self.metrics, profiler=self.profiler, endpoints=self.endpoints, run_log=self.run_log,
+            selectors=self.selectors, answer_cache=self.answer_cache, promotion_catalog=self.promotion_catalog,
+            search_transport=self.search_transport, rate_limiter=self.rate_limiter, task_planner=self.task_planner
+        )
+        session.search_hist = self.search_hist
+        session.checkpoint = self.checkpoint
+        session.screenshot_path = self.screenshot_path
+        return session
+
+    def run_mobile_session(self):
+        """ Mobile search in a browser of its own, the thread of a session from __get_mobile_session """
+        try:
+            with self.__phase('mobile launch'):
+                self.__get_driver(self.driver_factory.MOBILE_DEVICE)
             self.__complete_mobile_search()
-        
-    def complete_search_type(self, search_type, prev_completion, search_hist):
-        self.search_hist = search_hist
+        finally:
+            if self.watchdog:
+                self.watchdog.stop()
+            try:
+                self.driver.quit()
+            except Exception:  # never launched, or killed by the watchdog
+                pass
+
+    def __start_mobile_session(self):
+        session = self.__get_mobile_session()
+        stopped = threading.Event()
+
+        def run():
+            # paced, the first browser has just signed in
+            if not stopped.wait(self.concurrency.stagger):
+                session.run_mobile_session()
+        thread = SessionThread(run, name=f'{self.email} mobile')
+        thread.start()
+        return session, thread, stopped
+
+    def __join_mobile_session(self, session, thread, stopped, is_aborted=False):
+        if is_aborted:
+            stopped.set()
+        self.__sys_out("Waiting for mobile search", 1)
+        try:
+            thread.join_and_raise()
+        finally:
+            self.completion.mobile_search = session.completion.mobile_search
 
-        if (search_type in ('mobile', 'remaining', 'all')) and (not prev_completion.is_mobile_search_completed()):
-            device_type = self.driver_factory.MOBILE_DEVICE
+    def __defer_task(self, task):
+        self.metrics.increment('tasks_deferred')
+        self.__sys_out(f"Deferring {task.replace('_', ' ')} to the next run, not enough time left before the daily reset", 1, True)
+
+    def complete_remaining_searches(self, search_type, prev_completion):
+        is_search_all = search_type == 'all'
+        tasks = [task for task in TaskPlanner.ORDER if is_search_all or not getattr(prev_completion, task)]
+        complete_task = {
+            'edge_search': self.__complete_edge_search,
+            'web_search': self.__complete_web_search,
+            'punchcard': self.__complete_punchcard,
+            'offers': self.__complete_offers,
+            'mobile_search': self.__complete_mobile_search,
+        }
+
+        mobile_session = None
+        if (
+            'mobile_search' in tasks and self.concurrency.is_concurrent
+            and self.__is_mobile_search_after_web_device(search_type, prev_completion)
+        ):
+            tasks.remove('mobile_search')
+            if self.task_planner.fits('mobile_search', self.concurrency.stagger):
+                mobile_session = self.__start_mobile_session()
+            else:
+                self.__defer_task('mobile_search')
+
+        # the mobile search waits a while after the web device tasks
+        mobile_delay = self.MOBILE_SEARCH_DELAY if 'mobile_search' in tasks and len(tasks) > 1 else 0
+        is_web_device_used = False
+        try:
+            for task in self.task_planner.order(tasks, mobile_delay):
+                delay = self.MOBILE_SEARCH_DELAY if task == 'mobile_search' and is_web_device_used else 0
+                if not self.task_planner.fits(task, delay):
+                    self.__defer_task(task)
+                    continue
+                if delay:
+                    time.sleep(delay)
+                complete_task[task]()
+                is_web_device_used = is_web_device_used or task != 'mobile_search'
+        except BaseException:
+            # don't launch the mobile browser for a run that is ending, but let one already searching finish
+            if mobile_session:
+                self.__join_mobile_session(*mobile_session, is_aborted=True)
+            raise
+
+        if mobile_session:
+            self.__join_mobile_session(*mobile_session)
+
+    @classmethod
+    def get_launch_device(cls, search_type, prev_completion, concurrency):
+        """ Device type of the first browser of a run, known before the run i.e to pre-warm it """
+        # mobile search gets a browser of its own, this one does the web device tasks
+        if concurrency.is_concurrent and cls.__is_mobile_search_after_web_device(search_type, prev_completion):
+            return ChromeDriverFactory.WEB_DEVICE
+        elif (search_type in ('mobile', 'remaining', 'all')) and (not prev_completion.is_mobile_search_completed()):
+            return ChromeDriverFactory.MOBILE_DEVICE
         else:
-            device_type = self.driver_factory.WEB_DEVICE
+            return ChromeDriverFactory.WEB_DEVICE
 
-        self.__get_driver(device_type)
-        init_points = self.__get_available_points()
+    def complete_search_type(self, search_type, prev_completion, search_hist):
+        self.search_hist = search_hist
+        self.checkpoint = prev_completion.checkpoint
+
+        self.__launch(self.get_launch_device(search_type, prev_completion, self.concurrency))
+        with self.__phase('initial points'):
+            init_points = self.__get_available_points()
+            if self.session_store:
+                self.__save_session()
 
         if search_type in ('remaining', 'all'):
             self.complete_remaining_searches(search_type, prev_completion)
@@ -1421,8 +1721,13 @@ class Rewards:
         elif search_type == 'both':
             self.complete_both_searches()
 
-        self.__print_stats(init_points)
+        if self.on_tail:
+            self.on_tail()
+        with self.__phase('stats'):
+            self.__print_stats(init_points)
         self.driver.quit()
+        if self.supervisor:
+            self.supervisor.reap()
 
 
 class RewardStats:
@@ -0,0 +1,189 @@
+"""
+Structured run log.
+
+Rewards records typed LogRecords instead of formatted strings, the last CAPACITY records of each account
+are kept in a ring buffer (dumped to error.log when a run fails).
+Records are formatted and written by a LogSink thread, off the WebDriver hot path:
+to stdout (cronBing.log when run by cron) and optionally a rotating, gzip compressed log file.
+"""
+import os
+import sys
+import gzip
+import queue
+import shutil
+import logging
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+
+class LogRecord:
+    MESSAGE = 'message'
+    PROGRESS = 'progress'
+
+    __TAB_LEN = 8
+    __PROGRESS_BAR_LEN = 30
+
+    __slots__ = ('timestamp', 'account', 'kind', 'lvl', 'msg', 'end', 'flush', 'current_progress', 'complete_progress')
+
+    def __init__(self, account, kind, lvl, msg=None, end=False, flush=False, current_progress=None, complete_progress=None):
+        self.timestamp = time.time()
+        self.account = account
+        self.kind = kind
+        self.lvl = lvl
+        self.msg = msg
+        self.end = end
+        self.flush = flush
+        self.current_progress = current_progress
+        self.complete_progress = complete_progress
+
+    def __get_prefix(self):
+        prefix = " " * (self.__TAB_LEN * (self.lvl - 1) - (self.lvl - 1))
+        if not self.end:
+            return prefix + ">" * self.lvl + " "
+        else:
+            return prefix + " " * int(self.__TAB_LEN / 2) + "<" * self.lvl + " "
+
+    def format(self):
+        """ The line as printed, without the carriage return of progress bars """
+        if self.kind == self.PROGRESS:
+            ratio = float(self.current_progress) / self.complete_progress if self.complete_progress else 0
+            current_bars = max(0, min(int(ratio * self.__PROGRESS_BAR_LEN), self.__PROGRESS_BAR_LEN))
+            needed_bars = self.__PROGRESS_BAR_LEN - current_bars
+            return "{0}Progress: [{1}] {2}/{3} ({4}%)".format(
+                self.__get_prefix(), "#" * current_bars + " " * needed_bars,
+                self.current_progress, self.complete_progress, int(ratio * 100)
+            )
+        #to avoid UnicodeEncodeErrors
+        msg = self.msg.encode('ascii', 'ignore').decode('ascii')
+        return "{0}{1}{2}".format(self.__get_prefix(), msg, "\n" if self.lvl == 1 and self.end else "")
+
+
+class RunLog:
+    """ Bounded log of one account's run """
+    CAPACITY = 500
+
+    def __init__(self, account, sink=None, capacity=CAPACITY):
+        self.account = account
+        self.records = deque(maxlen=capacity)
+        self.sink = sink
+
+    def __emit(self, record):
+        if self.sink:
+            self.sink.put(record)
+        else:
+            LogSink.write_console(record)
+
+    def message(self, msg, lvl, end=False, flush=False):
+        record = LogRecord(self.account, LogRecord.MESSAGE, lvl, msg, end, flush)
+        self.records.append(record)
+        self.__emit(record)
+
+    def progress(self, current_progress, complete_progress, lvl):
+        record = LogRecord(self.account, LogRecord.PROGRESS, lvl, current_progress=current_progress, complete_progress=complete_progress)
+        # a progress bar is redrawn in place, only its latest state is kept
+        if self.records and self.records[-1].kind == LogRecord.PROGRESS:
+            self.records[-1] = record
+        else:
+            self.records.append(record)
+        self.__emit(record)
+
+    def get_lines(self):
+        return [record.format() for record in self.records]
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def get_rotating_handler(path, max_bytes=5 * 1024 ** 2, backup_count=5):
+    """ Size based rotation, rotated files are gzip compressed: error.log.1.gz, error.log.2.gz, ... """
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+    handler.namer = lambda name: name + '.gz'
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def get_error_logger(path):
+    logger = logging.getLogger(f'bing_rewards.error.{os.path.abspath(path)}')
+    if not logger.handlers:
+        handler = get_rotating_handler(path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+    return logger
+
+
+class LogSink:
+    """
+    Formats and writes records on its own thread.
+    put() never blocks the caller, records are dropped (and counted) if the sink falls QUEUE_SIZE records behind
+    """
+    QUEUE_SIZE = 10000
+
+    def __init__(self, log_file=None):
+        self.__queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self.dropped = 0
+        self.__thread = None
+        self.__file_logger = None
+        if log_file:
+            self.__file_logger = logging.getLogger('bing_rewards.run')
+            for handler in self.__file_logger.handlers[:]:
+                self.__file_logger.removeHandler(handler)
+            handler = get_rotating_handler(log_file)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(account)s %(message)s'))
+            self.__file_logger.addHandler(handler)
+            self.__file_logger.setLevel(logging.INFO)
+            self.__file_logger.propagate = False
+
+    @staticmethod
+    def write_console(record):
+        if record.kind == LogRecord.PROGRESS:
+            sys.stdout.write("\r" + record.format())
+            sys.stdout.flush()
+        else:
+            if record.flush:  # because of progress bar
+                print("")
+            print(record.format())
+
+    def __write_file(self, record):
+        # progress bars are only logged once complete
+        if record.kind == LogRecord.PROGRESS and record.current_progress != record.complete_progress:
+            return
+        self.__file_logger.info(record.format().strip('\n'), extra={'account': record.account})
+
+    def __run(self):
+        while True:
+            record = self.__queue.get()
+            if record is None:
+                break
+            self.write_console(record)
+            if self.__file_logger:
+                self.__write_file(record)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__run, name='log-sink', daemon=True)
+        self.__thread.start()
+        return self
+
+    def put(self, record):
+        try:
+            self.__queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """ Flushes the pending records """
+        if self.__thread:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__thread = None
+        if self.dropped:
+            print(f'\n{self.dropped} log records dropped')
+        if self.__file_logger:
+            for handler in self.__file_logger.handlers:
+                handler.close()
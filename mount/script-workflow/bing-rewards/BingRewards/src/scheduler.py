@@ -0,0 +1,148 @@
+"""
+Resident scheduler, an alternative to running BingRewards.py from cron.
+
+Every account runs once per Microsoft Rewards day: shortly after the daily reset HistLog models,
+at its own offset within a window so that accounts are spread out and the number of browsers on the host stays flat.
+Runs happen in-process, so there is no interpreter/import cold start per run.
+Clock and sleep are injectable.
+"""
+import heapq
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from src.log import HistLog
+
+
+class Scheduler:
+    RETRY_DELAY = timedelta(hours=1)
+    # upper bound on a single sleep, so wall clock jumps (suspend, DST, ntp) are caught up with quickly
+    MAX_SLEEP = 60
+
+    def __init__(self, accounts, run_account, run_path, search_path, search_type, window=timedelta(minutes=30), max_concurrent=1, clock=datetime.now, sleep=time.sleep):
+        """
+        accounts: [(email, password), ...]
+        run_account: called as run_account(email, password) on a worker thread
+        run_path, search_path: run.json and search.json, to tell whether an account is already done today
+        window: accounts are spread evenly over this long after each reset
+        max_concurrent: most accounts running, i.e browsers open, at once
+        clock: returns the current local time as a naive datetime
+        """
+        self.accounts = accounts
+        self.run_account = run_account
+        self.run_path = run_path
+        self.search_path = search_path
+        self.search_type = search_type
+        self.window = window
+        self.clock = clock
+        self.sleep = sleep
+
+        self.__slots = threading.BoundedSemaphore(max_concurrent)
+        self.__lock = threading.Lock()
+        # (next run, account index)
+        self.__queue = []
+        self.__offsets = self.__get_offsets()
+        self.__stopped = threading.Event()
+        # threads of the accounts running, joined on shutdown so that their runs clean up
+        self.__threads = set()
+
+    def __get_offsets(self):
+        """ One slot of the window per account, with a random start within the slot """
+        slot = self.window / max(len(self.accounts), 1)
+        return [slot * i + slot * random.random() for i in range(len(self.accounts))]
+
+    def __get_hist_log(self, email):
+        return HistLog(email, self.run_path, self.search_path, self.clock())
+
+    def __is_completed_today(self, email):
+        hist_log = self.__get_hist_log(email)
+        return hist_log.is_already_ran_today() and hist_log.get_completion().is_search_type_completed(self.search_type)
+
+    def __get_next_run(self, index, completed):
+        email = self.accounts[index][0]
+        now = self.clock()
+        next_run = self.__get_hist_log(email).get_next_reset() + self.__offsets[index]
+        if not completed:
+            next_run = min(next_run, now + self.RETRY_DELAY)
+        return next_run
+
+    def __push(self, next_run, index):
+        with self.__lock:
+            heapq.heappush(self.__queue, (next_run, index))
+        print(f'\nNext run of {self.accounts[index][0]}: {next_run:%a, %b %d %Y %I:%M%p}')
+
+    def get_schedule(self):
+        with self.__lock:
+            return [(next_run, self.accounts[index][0]) for next_run, index in sorted(self.__queue)]
+
+    def peek_next(self, within=timedelta(0)):
+        """ Email of the account due next, if it is due within `within` """
+        with self.__lock:
+            if self.__queue and self.__queue[0][0] <= self.clock() + within:
+                return self.accounts[self.__queue[0][1]][0]
+            return None
+
+    def __run(self, index):
+        email, password = self.accounts[index]
+        completed = False
+        try:
+            self.run_account(email, password)
+            completed = self.__is_completed_today(email)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.__slots.release()
+            with self.__lock:
+                self.__threads.discard(threading.current_thread())
+            # an account that isn't pushed back never runs again
+            try:
+                next_run = self.__get_next_run(index, completed)
+            except Exception:
+                traceback.print_exc()
+                next_run = HistLog.get_reset_after(self.clock()) + self.__offsets[index]
+            self.__push(next_run, index)
+
+    def __pop_due(self):
+        with self.__lock:
+            if self.__queue and self.__queue[0][0] <= self.clock():
+                return heapq.heappop(self.__queue)[1]
+            return None
+
+    def __get_sleep_seconds(self):
+        with self.__lock:
+            if not self.__queue:
+                return self.MAX_SLEEP
+            seconds = (self.__queue[0][0] - self.clock()).total_seconds()
+        return min(max(seconds, 0), self.MAX_SLEEP)
+
+    def run_forever(self):
+        now = self.clock()
+        # accounts not done yet today run right away, still spread over the window
+        for index, (email, _) in enumerate(self.accounts):
+            if self.__is_completed_today(email):
+                self.__push(self.__get_next_run(index, True), index)
+            else:
+                self.__push(now + self.__offsets[index], index)
+
+        while not self.__stopped.is_set():
+            index = self.__pop_due()
+            if index is None:
+                self.sleep(self.__get_sleep_seconds())
+                continue
+            # waits here while max_concurrent accounts are running
+            self.__slots.acquire()
+            thread = threading.Thread(target=self.__run, args=(index,), name=self.accounts[index][0])
+            with self.__lock:
+                self.__threads.add(thread)
+            thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+
+    def join(self):
+        """ Waits for the accounts running to finish, no new run starts once stopped """
+        with self.__lock:
+            threads = list(self.__threads)
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,106 @@
+"""
+Search progress read from the bing results page instead of the rewards dashboard.
+
+After each search the results page asks the rewards service for the account's points (the flyout in the page header).
+A hook installed in every new document records the points balance of those responses,
+so the points a query earned are known without opening the dashboard in another tab.
+The dashboard is still read when a search phase starts, whenever the page shows no points earned,
+and to verify the page's count once it says the phase is complete.
+"""
+from selenium.common.exceptions import WebDriverException
+
+# rewards service responses of the results page, i.e /rewardsapp/ncheader
+REWARDS_URL_PATTERN = '/rewardsapp/'
+
+# records the last points balance of the rewards responses in window.__rewardsBalance
+_BALANCE_HOOK_JS = r"""
+(() => {
+    const pattern = %s;
+    const keys = ['availablePoints', 'balance', 'RewardsBalance'];
+    function findBalance(value, depth) {
+        if (!value || typeof value !== 'object' || depth > 4) return null;
+        for (const key of keys) {
+            if (typeof value[key] === 'number') return value[key];
+        }
+        for (const child of Object.values(value)) {
+            const balance = findBalance(child, depth + 1);
+            if (balance !== null) return balance;
+        }
+        return null;
+    }
+    function record(url, text) {
+        if (!String(url).includes(pattern)) return;
+        try {
+            const balance = findBalance(JSON.parse(text), 0);
+            if (balance !== null) window.__rewardsBalance = balance;
+        } catch (e) {}  // not json
+    }
+    const fetch = window.fetch;
+    window.fetch = function (input, init) {
+        return fetch.apply(this, arguments).then((resp) => {
+            resp.clone().text().then((text) => record(resp.url, text), () => {});
+            return resp;
+        });
+    };
+    const open = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.addEventListener('load', () => record(url, this.responseText));
+        return open.apply(this, arguments);
+    };
+})();
+""" % repr(REWARDS_URL_PATTERN)
+
+# the hooked balance, else the header's points counter
+_READ_BALANCE_JS = r"""
+if (typeof window.__rewardsBalance === 'number') return window.__rewardsBalance;
+const counter = document.getElementById('id_rc');
+if (!counter) return null;
+const balance = parseInt(counter.textContent.replace(/[^0-9]/g, ''), 10);
+return isNaN(balance) ? null : balance;
+"""
+
+
+def install_balance_hook(driver):
+    """ Hooks the documents the driver loads from now on. False if the driver can't, the header counter is read instead """
+    try:
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _BALANCE_HOOK_JS})
+        return True
+    except (WebDriverException, AttributeError):  # not a chromium driver
+        return False
+
+
+def read_balance(driver):
+    """ Points balance shown by the current page, None if it shows none """
+    try:
+        balance = driver.execute_script(_READ_BALANCE_JS)
+    except WebDriverException:
+        return None
+    return balance if isinstance(balance, int) else None
+
+
+class SearchProgress:
+    """ Progress of one search counter, read from the dashboard then moved along by the points the page shows earned """
+    def __init__(self, current_progress, complete_progress, balance):
+        self.current_progress = current_progress
+        self.complete_progress = complete_progress
+        self.__balance = balance
+        # whether current_progress is the dashboard's, not estimated
+        self.is_verified = True
+
+    @property
+    def is_complete(self):
+        return self.current_progress >= self.complete_progress
+
+    def update(self, balance):
+        """
+        Adds the points earned since the last balance.
+        False if the page shows none earned (not updated yet, or the search stalled): the dashboard has to be read
+        """
+        if balance is None or self.__balance is None or balance <= self.__balance:
+            return False
+        # other tasks of the account may earn points meanwhile, a phase the page says complete is verified on the dashboard
+        earned = balance - self.__balance
+        self.current_progress = min(self.complete_progress, self.current_progress + earned)
+        self.__balance = balance
+        self.is_verified = False
+        return True
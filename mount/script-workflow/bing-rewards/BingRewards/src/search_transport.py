@@ -0,0 +1,72 @@
+"""
+How search queries are submitted, per device type.
+
+FORM types each query into the bing search box: wait for it, clear it, send the keys, dismiss banners and alerts.
+URL navigates straight to the results page of the query, a single WebDriver command per query.
+With a batch size above 1, the results pages of all but the last query of a batch are requested from within the page,
+spaced out like a user would, in the same script call, then the last one is navigated to.
+
+    transport = SearchTransport(web=SearchTransport.URL, batch_size=3)
+
+A URL transport that doesn't make progress falls back to FORM for the rest of the search.
+A batch is awaited in one WebDriver command, so it never holds more queries than fit in the script timeout
+and the watchdog's command timeout.
+"""
+from urllib.parse import urlencode
+from src.driver import DriverFactory
+
+# awaited by execute_script, the results pages are fetched with the session cookies one after another
+_FETCH_SEARCHES_JS = r"""
+const [urls, minDelay, maxDelay] = arguments;
+return (async () => {
+    for (const url of urls) {
+        await fetch(url, {credentials: 'include'});
+        await new Promise((resolve) => setTimeout(resolve, 1000 * (minDelay + Math.random() * (maxDelay - minDelay))));
+    }
+    return urls.length;
+})();
+"""
+
+
+class SearchTransport:
+    FORM = 'form'
+    URL = 'url'
+
+    # bing's own value for a query typed in the search box
+    FORM_CODE = 'QBLH'
+    # most points a search earns, batches never hold more queries than the counter can still need
+    MAX_POINTS_PER_SEARCH = 5
+    # Selenium's default script timeout
+    SCRIPT_TIMEOUT = 30
+    # allowance for fetching one results page
+    FETCH_SECONDS = 2
+
+    def __init__(self, web=FORM, mobile=FORM, batch_size=1):
+        self.transports = {DriverFactory.WEB_DEVICE: web, DriverFactory.MOBILE_DEVICE: mobile}
+        self.batch_size = max(1, batch_size)
+
+    def get(self, device):
+        """ FORM or URL, for the device type of a driver """
+        return self.transports.get(device, self.FORM)
+
+    def get_batch_size(self, remaining_points, max_delay, command_timeout=None):
+        """
+        Queries to submit at once, without overshooting what the counter still has to give,
+        and whose fetches, up to max_delay seconds apart, fit in the script and command timeouts
+        """
+        timeout = min(self.SCRIPT_TIMEOUT, command_timeout or self.SCRIPT_TIMEOUT)
+        # all but the last query are fetched within the script
+        fitting = 1 + int(timeout // (max_delay + self.FETCH_SECONDS))
+        return max(1, min(self.batch_size, fitting, -(-remaining_points // self.MAX_POINTS_PER_SEARCH)))
+
+    @classmethod
+    def get_search_url(cls, bing_url, query):
+        return bing_url.rstrip('/') + '/search?' + urlencode({'q': query, 'form': cls.FORM_CODE})
+
+    @classmethod
+    def submit(cls, driver, bing_url, queries, min_delay, max_delay):
+        """ Results pages of the queries, the last one is left open """
+        urls = [cls.get_search_url(bing_url, query) for query in queries]
+        if len(urls) > 1:
+            driver.execute_script(_FETCH_SEARCHES_JS, urls[:-1], min_delay, max_delay)
+        driver.get(urls[-1])
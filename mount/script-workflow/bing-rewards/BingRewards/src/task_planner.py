@@ -0,0 +1,82 @@
+"""
+Order of the remaining tasks of a run, by the points they earn per second and the time left until the daily reset.
+
+With time to spare, the tasks run in the usual order: edge search, web search, punch card, offers, then mobile search.
+When the reset is too close for all of them, the tasks earning the most points per browser second run first,
+and a task that can't earn its points before the reset is deferred to the next run instead of holding a browser.
+Searches earn per query, so they only need a little time to be worth starting.
+
+Expected points and seconds are the phase averages of past runs (src.metrics_store), or DEFAULTS.
+
+    planner = TaskPlanner(hist_log.get_next_reset(), store.get_totals(MetricsStore.PHASE, since=since))
+    for task in planner.order(tasks):
+        if planner.fits(task): ...
+"""
+from datetime import datetime, timedelta
+from src.preflight import SEARCH_TYPE_TASKS
+
+
+class TaskPlanner:
+    ORDER = SEARCH_TYPE_TASKS['remaining']
+    # task: (phase of its metrics, points, seconds) of a typical run
+    DEFAULTS = {
+        'edge_search': ('Edge search', 12, 40),
+        'web_search': ('Web search', 150, 200),
+        'punchcard': ('punch card', 10, 60),
+        'offers': ('Offers', 30, 150),
+        'mobile_search': ('Mobile search', 100, 150),
+    }
+    DIVISIBLE = ('edge_search', 'web_search', 'mobile_search')
+    # least time left to start a search
+    MIN_SECONDS = 30
+    # runs of a phase before its averages replace the defaults
+    MIN_RUNS = 3
+    # past runs the averages are taken from
+    HISTORY = timedelta(days=30)
+    # kept free before the reset, for the stats and clock differences
+    MARGIN = timedelta(minutes=1)
+
+    def __init__(self, deadline=None, history=None, clock=datetime.now):
+        """
+        deadline: local time of the next daily reset, see HistLog.get_next_reset. Nothing is deferred if None
+        history: MetricsStore.get_totals by phase
+        clock: returns the current local time as a naive datetime
+        """
+        self.deadline = deadline
+        self.clock = clock
+        # task: (points, seconds)
+        self.expected = {task: self.__get_expected(task, history or {}) for task in self.DEFAULTS}
+
+    def __get_expected(self, task, history):
+        phase, points, seconds = self.DEFAULTS[task]
+        totals = history.get(phase, {})
+        runs = totals.get('runs', 0)
+        if runs >= self.MIN_RUNS and totals.get('duration'):
+            return totals.get('points', 0) / runs, totals['duration'] / runs
+        return points, seconds
+
+    def get_points_per_second(self, task):
+        points, seconds = self.expected[task]
+        return points / seconds if seconds else 0
+
+    def get_seconds_left(self):
+        """ Until the reset, less the margin. None without a deadline """
+        if self.deadline is None:
+            return None
+        return (self.deadline - self.MARGIN - self.clock()).total_seconds()
+
+    def order(self, tasks, extra_seconds=0):
+        """ The tasks in the usual order if they all fit before the reset, else the most points per second first """
+        tasks = [task for task in self.ORDER if task in tasks]
+        seconds_left = self.get_seconds_left()
+        if seconds_left is None or sum(self.expected[task][1] for task in tasks) + extra_seconds <= seconds_left:
+            return tasks
+        return sorted(tasks, key=self.get_points_per_second, reverse=True)
+
+    def fits(self, task, extra_seconds=0):
+        """ Whether the task, after extra_seconds of waiting, can still earn its points before the reset """
+        seconds_left = self.get_seconds_left()
+        if seconds_left is None:
+            return True
+        needed = self.MIN_SECONDS if task in self.DIVISIBLE else self.expected[task][1]
+        return needed + extra_seconds <= seconds_left
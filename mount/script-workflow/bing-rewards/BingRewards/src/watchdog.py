@@ -0,0 +1,123 @@
+"""
+Bounds WebDriver calls, a hung chromedriver or renderer otherwise blocks a run forever.
+
+Every command gets a deadline and every phase a wall-clock budget.
+On expiry, the browser process tree is killed, which unblocks the pending call,
+and every further command raises WatchdogExpired so Rewards can relaunch, re-login and resume the phase
+"""
+import concurrent.futures
+import threading
+import time
+from contextlib import contextmanager
+from src.processes import get_driver_pids, get_shared_browser_pids, kill_process_tree
+
+
+class WatchdogExpired(Exception):
+    pass
+
+
+class Watchdog:
+    __POLL_INTERVAL = 1
+
+    def __init__(self, command_timeout=None, phase_budget=None):
+        self.command_timeout = command_timeout
+        self.phase_budget = phase_budget
+        # reason of expiry, reset when a new driver is watched
+        self.expired = None
+        self.__driver = None
+        self.__command = None
+        self.__phase = None
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        threading.Thread(target=self.__monitor, daemon=True).start()
+
+    def watch(self, driver):
+        """ Routes every command of the driver through the watchdog """
+        self.__driver = driver
+        self.expired = None
+
+        # Selenium: every command goes through the remote driver's execute()
+        if hasattr(driver, 'wrapped_driver'):
+            web_driver = driver.wrapped_driver
+            execute = web_driver.execute
+
+            def watched_execute(driver_command, params=None):
+                return self.__call(driver_command, execute, driver_command, params)
+            web_driver.execute = watched_execute
+
+        # CDP: commands are futures on a browser shared with other accounts, bound the wait instead of killing it
+        else:
+            run = driver.run
+
+            def watched_run(coroutine, timeout=None):
+                return self.__call(coroutine.__qualname__, run, coroutine, timeout or self.__get_run_timeout())
+            driver.run = watched_run
+
+    def __get_run_timeout(self):
+        """ The command timeout, else what is left of the phase budget (-pb without -ct) """
+        if self.command_timeout:
+            return self.command_timeout
+        with self.__lock:
+            phase = self.__phase
+        if phase:
+            return max(phase[1] - time.monotonic(), 0)
+        return None
+
+    def __call(self, command, func, *args):
+        if self.expired:
+            raise WatchdogExpired(self.expired)
+        with self.__lock:
+            self.__command = (command, time.monotonic() + self.command_timeout) if self.command_timeout else None
+        try:
+            return func(*args)
+        except concurrent.futures.TimeoutError as e:
+            with self.__lock:
+                phase = self.__phase
+            if self.command_timeout or not phase:
+                self.expired = f'WebDriver command {command} exceeded {self.command_timeout}s'
+            else:
+                self.expired = f'{phase[0]} exceeded its {self.phase_budget}s budget'
+            raise WatchdogExpired(self.expired) from e
+        except Exception as e:
+            # whatever the killed browser made the command raise
+            if self.expired:
+                raise WatchdogExpired(self.expired) from e
+            raise
+        finally:
+            with self.__lock:
+                self.__command = None
+
+    @contextmanager
+    def phase(self, description):
+        with self.__lock:
+            self.__phase = (description, time.monotonic() + self.phase_budget) if self.phase_budget else None
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.__phase = None
+
+    def __monitor(self):
+        while not self.__stopped.wait(self.__POLL_INTERVAL):
+            now = time.monotonic()
+            with self.__lock:
+                command, phase = self.__command, self.__phase
+            if self.expired:
+                continue
+            if command and now > command[1]:
+                self.__expire(f'WebDriver command {command[0]} exceeded {self.command_timeout}s')
+            elif phase and now > phase[1]:
+                self.__expire(f'{phase[0]} exceeded its {self.phase_budget}s budget')
+
+    def __expire(self, reason):
+        self.expired = reason
+        print(f'\nWatchdog: {reason}, killing browser processes')
+        if self.__driver is not None:
+            # a shared CDP browser keeps running for the other accounts, its pending call is bounded by command_timeout
+            shared_pids = get_shared_browser_pids(self.__driver)
+            for pid in get_driver_pids(self.__driver):
+                if pid not in shared_pids:
+                    kill_process_tree(pid)
+
+    def stop(self):
+        self.__stopped.set()
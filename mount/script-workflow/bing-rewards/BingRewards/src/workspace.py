@@ -0,0 +1,152 @@
+"""
+Per account workspace, so accounts running at the same time don't share
+the browser profile (--cookies), the error screenshot sent by Telegram, or the patched chromedriver binary.
+
+workspaces/<account>/
+    profile/    browser user-data-dir, optionally kept on tmpfs during the run and synced back to disk
+    artifacts/  error.png
+    tmp/        browser disk cache, driver copy
+"""
+import hashlib
+import os
+import re
+import shutil
+
+
+class Workspace:
+    ROOT_DIR = "workspaces"
+    SCREENSHOT_FILE = "error.png"
+
+    # caches inside a Chrome profile, safe to delete and not worth syncing
+    __PROFILE_CACHE_DIRS = (
+        'Cache', 'Code Cache', 'GPUCache', 'DawnCache', 'GrShaderCache', 'ShaderCache',
+        os.path.join('Service Worker', 'CacheStorage'), os.path.join('Service Worker', 'ScriptCache'),
+    )
+
+    def __init__(self, email, root_dir=ROOT_DIR, tmpfs_dir=None, cache_size_mb=None):
+        """
+        tmpfs_dir: i.e /dev/shm, the profile then lives in memory during the run and is synced to disk afterwards
+        cache_size_mb: cap on the browser disk cache, and size above which profile caches are compacted
+        """
+        # readable, and unique: emails differing only in case or punctuation sanitize to the same name
+        legacy_name = re.sub(r'[^a-zA-Z0-9]+', '_', email).strip('_').lower()
+        self.name = f'{legacy_name}_{hashlib.sha1(email.encode()).hexdigest()[:8]}'
+        self.dir = os.path.join(root_dir, self.name)
+        legacy_dir = os.path.join(root_dir, legacy_name)
+        if os.path.isdir(legacy_dir) and not os.path.exists(self.dir):
+            os.rename(legacy_dir, self.dir)
+        self.cache_size_mb = cache_size_mb
+
+        self.disk_profile_dir = os.path.abspath(os.path.join(self.dir, 'profile'))
+        if tmpfs_dir:
+            self.profile_dir = os.path.abspath(os.path.join(tmpfs_dir, 'bing-rewards', self.name, 'profile'))
+        else:
+            self.profile_dir = self.disk_profile_dir
+        self.artifacts_dir = os.path.abspath(os.path.join(self.dir, 'artifacts'))
+        self.temp_dir = os.path.abspath(os.path.join(self.dir, 'tmp'))
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.drivers_dir = os.path.join(self.temp_dir, 'drivers')
+
+        for directory in (self.disk_profile_dir, self.profile_dir, self.artifacts_dir, self.cache_dir, self.drivers_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def screenshot_path(self):
+        return os.path.join(self.artifacts_dir, self.SCREENSHOT_FILE)
+
+    @property
+    def is_profile_on_tmpfs(self):
+        return self.profile_dir != self.disk_profile_dir
+
+    # symlinks of a running Chrome, left dangling when it is killed
+    __PROFILE_LOCK_PREFIX = 'Singleton'
+
+    def __ignore_caches(self, src, names):
+        return [name for name in names if name.startswith(self.__PROFILE_LOCK_PREFIX) or any(
+            os.path.join(src, name).endswith(os.sep + cache_dir) for cache_dir in self.__PROFILE_CACHE_DIRS
+        )]
+
+    def __sync(self, src, dst):
+        """
+        Makes dst a copy of src, but for the caches and locks: files deleted from src are deleted from dst too.
+        Symlinks are copied as is, they may point nowhere
+        """
+        for dir_path, dir_names, file_names in os.walk(dst):
+            src_dir = os.path.join(src, os.path.relpath(dir_path, dst))
+            ignored = set(self.__ignore_caches(dir_path, dir_names))
+            for dir_name in list(dir_names):
+                path = os.path.join(dir_path, dir_name)
+                if dir_name in ignored:
+                    dir_names.remove(dir_name)
+                elif os.path.islink(path):
+                    os.remove(path)
+                    dir_names.remove(dir_name)
+                elif not os.path.isdir(os.path.join(src_dir, dir_name)):
+                    shutil.rmtree(path, ignore_errors=True)
+                    dir_names.remove(dir_name)
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                # symlinks are re-created by copytree, which fails on existing ones
+                if os.path.islink(path) or file_name.startswith(self.__PROFILE_LOCK_PREFIX) or not os.path.lexists(os.path.join(src_dir, file_name)):
+                    os.remove(path)
+        shutil.copytree(src, dst, symlinks=True, ignore=self.__ignore_caches, dirs_exist_ok=True)
+
+    def open(self):
+        """ Prepares the workspace for a run """
+        # a screenshot from a previous run must not be sent along with this run's messages
+        if os.path.exists(self.screenshot_path):
+            os.remove(self.screenshot_path)
+        if self.is_profile_on_tmpfs:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            self.__sync(self.disk_profile_dir, self.profile_dir)
+
+    def close(self):
+        """ Syncs the tmpfs profile back to disk and frees its memory, keeps profile caches bounded """
+        if self.is_profile_on_tmpfs:
+            self.__sync(self.profile_dir, self.disk_profile_dir)
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.compact()
+
+    def get_driver_path(self, driver_path):
+        """
+        Per workspace copy of the shared downloaded driver,
+        undetected_chromedriver patches the binary in place when it starts
+        """
+        workspace_driver_path = os.path.join(self.drivers_dir, os.path.basename(driver_path))
+        if not os.path.exists(workspace_driver_path) or os.path.getmtime(workspace_driver_path) < os.path.getmtime(driver_path):
+            shutil.copy2(driver_path, workspace_driver_path)
+        return workspace_driver_path
+
+    @staticmethod
+    def __get_dir_size(directory):
+        size = 0
+        for dir_path, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                try:
+                    size += os.path.getsize(os.path.join(dir_path, file_name))
+                except OSError:
+                    pass
+        return size
+
+    def get_profile_cache_dirs(self):
+        cache_dirs = [self.cache_dir]
+        for profile_dir in {self.profile_dir, self.disk_profile_dir}:
+            for dir_path, dir_names, _ in os.walk(profile_dir):
+                for dir_name in dir_names:
+                    path = os.path.join(dir_path, dir_name)
+                    if any(path.endswith(os.sep + cache_dir) for cache_dir in self.__PROFILE_CACHE_DIRS):
+                        cache_dirs.append(path)
+        return cache_dirs
+
+    def compact(self):
+        """ Deletes the profile caches once they grow over cache_size_mb """
+        if not self.cache_size_mb:
+            return
+        cache_dirs = self.get_profile_cache_dirs()
+        cache_size = sum(self.__get_dir_size(cache_dir) for cache_dir in cache_dirs)
+        if cache_size <= self.cache_size_mb * 1024 ** 2:
+            return
+        for cache_dir in cache_dirs:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        print(f'Compacted {cache_size / 1024 ** 2:.0f}MB of browser caches for workspace {self.name}')
@@ -1,9 +1,13 @@
 #!/bin/bash
 CONFIG=/config/config.json
 log=/bing-rewards/BingRewards/logs/error.log
-cronLog=/bing-rewards/BingRewards/logs/cronBing.log
+runLog=/bing-rewards/BingRewards/logs/bing_rewards.log
 echo "$UPDATE /bin/bash /bing-rewards/update.sh > \$logfile 2>&1" >> /etc/cron.d/bing.cron
-echo "$SCH /bin/bash /bing-rewards/script.sh > \$logfile 2>&1" >> /etc/cron.d/bing.cron
+# SCHEDULER=1 runs the bot as a resident scheduler instead of a cron job + script.sh
+if test -z "$SCHEDULER";
+then
+	echo "$SCH /bin/bash /bing-rewards/script.sh > \$logfile 2>&1" >> /etc/cron.d/bing.cron
+fi
 set -x
 service cron start
 crontab /etc/cron.d/bing.cron
@@ -26,5 +30,10 @@ else
 	touch /bing-rewards/BingRewards/logs/error.log
 fi
 cd /bing-rewards/BingRewards
+if test -n "$SCHEDULER";
+then
+	# runs for the container's lifetime: the run log goes to a rotated file, other output to the container's log
+	/usr/local/bin/python /bing-rewards/BingRewards/BingRewards.py -nsb -sch -lf $runLog 2>&1 &
+fi
 "$@"
 tail -f /bing-rewards/BingRewards/logs/cronBing.log